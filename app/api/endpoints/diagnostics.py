@@ -0,0 +1,47 @@
+import hmac
+import time
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.diagnostics import ProfilerBusyError, loop_monitor, sampling_profiler
+
+router = APIRouter()
+
+
+def check_diagnostics_token(request: Request) -> None:
+    # Profiles expose code paths and stalls expose stacks, and profiling slows the worker down,
+    # so these endpoints stay off until a deployment configures a shared token
+    if not settings.DIAGNOSTICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Diagnostics are disabled; set DIAGNOSTICS_TOKEN to enable them.")
+    if not hmac.compare_digest(request.headers.get("X-Diagnostics-Token", ""), settings.DIAGNOSTICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Missing or invalid X-Diagnostics-Token header.")
+
+@router.get(
+    "/loop",
+    summary="Event loop lag monitor status",
+    description="Reports the largest loop lag seen by this worker and its recent stalls, each with the stack that was blocking the loop when the watchdog caught it."
+)
+async def get_loop_status(request: Request):
+    check_diagnostics_token(request)
+    return loop_monitor.status()
+
+@router.get(
+    "/profile",
+    response_class=PlainTextResponse,
+    summary="Profile this worker",
+    description="Samples the stacks of the worker that receives the request for `seconds` and returns them in the collapsed-stack format (`frame;frame;frame count` per line), ready for flamegraph.pl or speedscope. By default only the event loop thread is sampled; `threads=all` includes worker threads."
+)
+async def profile_worker(
+    request: Request,
+    seconds: float = Query(10.0, gt=0, le=settings.PROFILER_MAX_SECONDS, description="How long to sample."),
+    interval_ms: float = Query(5.0, ge=settings.PROFILER_MIN_INTERVAL_MS, le=1000, description="Time between samples."),
+    threads: str = Query("loop", pattern="^(loop|all)$", description="'loop' for the event loop thread, 'all' for every thread."),
+):
+    check_diagnostics_token(request)
+    try:
+        stacks = await sampling_profiler.profile(seconds, interval_ms / 1000, all_threads=threads == "all")
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+    return PlainTextResponse(stacks, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
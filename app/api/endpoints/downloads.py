@@ -0,0 +1,72 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from typing import List
+
+from app.core.config import settings
+from app.core.serialization import FastJSONResponse
+from app.core.sse import SSE_HEADERS, format_sse
+from app.schemas.download_schemas import DownloadJobRequest, DownloadJobStatus
+from app.services.download_jobs import download_scheduler
+
+router = APIRouter()
+
+@router.post(
+    "/",
+    response_model=DownloadJobStatus,
+    status_code=202,
+    summary="Queue a model download",
+    description="Queues a background download job. Requesting a model that is already queued, running or paused returns the existing job."
+)
+async def create_download_job(request_body: DownloadJobRequest):
+    job, _ = await download_scheduler.submit(request_body.model_id, revision=request_body.revision, priority=request_body.priority)
+    return job.snapshot()
+
+@router.get(
+    "/",
+    response_model=List[DownloadJobStatus],
+    summary="List download jobs",
+    description="Lists active and recently finished download jobs, newest first."
+)
+async def list_download_jobs():
+    snapshots = [job.snapshot() for job in await download_scheduler.list()]
+    return FastJSONResponse(snapshots) if settings.FAST_SERIALIZATION else snapshots
+
+@router.get(
+    "/{job_id}",
+    response_model=DownloadJobStatus,
+    summary="Get download job status"
+)
+async def get_download_job(job_id: str):
+    return (await download_scheduler.get(job_id)).snapshot()
+
+@router.post("/{job_id}/cancel", response_model=DownloadJobStatus, summary="Cancel a download job")
+async def cancel_download_job(job_id: str):
+    return (await download_scheduler.cancel(job_id)).snapshot()
+
+@router.post(
+    "/{job_id}/pause",
+    response_model=DownloadJobStatus,
+    summary="Pause a download job",
+    description="Stops the job but keeps partially downloaded files so that resuming continues where it stopped."
+)
+async def pause_download_job(job_id: str):
+    return (await download_scheduler.pause(job_id)).snapshot()
+
+@router.post("/{job_id}/resume", response_model=DownloadJobStatus, summary="Resume a paused or failed download job")
+async def resume_download_job(job_id: str):
+    return (await download_scheduler.resume(job_id)).snapshot()
+
+@router.get(
+    "/{job_id}/events",
+    summary="Stream download progress",
+    description="Server-Sent Events stream of job snapshots (bytes, bytes/sec, ETA). Ends with a `done` event once the job finishes."
+)
+async def stream_download_job_events(job_id: str):
+    await download_scheduler.get(job_id) # 404 before the stream starts
+
+    async def event_stream():
+        async for snapshot in download_scheduler.events(job_id):
+            finished = snapshot["state"] in ("completed", "failed", "cancelled")
+            yield format_sse(snapshot, event="done" if finished else "progress")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
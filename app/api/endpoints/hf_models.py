@@ -1,8 +1,19 @@
+import csv
+import io
 from fastapi import APIRouter, HTTPException, Query, Path
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
-from app.services.huggingface_service import get_hf_models, download_hf_model
-from app.schemas.model_schemas import HFModelResponse, HFModelDownloadStatus
+from app.core.config import settings
+from app.core.serialization import FastJSONResponse, dumps_bytes
+from app.core.shared_store import shared_store
+from app.services.huggingface_service import (
+    get_hf_models, get_hf_models_cache_stats, iter_hf_model_batch, iter_hf_model_pages, model_download_path
+)
+from app.services.download_jobs import download_scheduler
+from app.services.model_catalog import CatalogSyncBusyError, model_catalog, start_catalog_sync
+from app.services.model_suggest import model_suggester
+from app.schemas.model_schemas import HFModelBatchRequest, HFModelResponse, HFModelDownloadStatus, HFModelSuggestResponse
 
 router = APIRouter()
 
@@ -17,7 +28,10 @@ async def list_huggingface_models(
     limit: int = Query(12, ge=1, le=100, description="Number of models to return per page."), # Defaulting to 12 for a 3/4 column layout
     page: int = Query(1, ge=1, description="Page number of the results."),
     sort_by: Optional[str] = Query('downloads', description="Field to sort by (e.g., 'downloads', 'likes', 'lastModified')."),
-    direction: Optional[str] = Query('desc', description="Sort direction: 'asc' or 'desc'.")
+    direction: Optional[str] = Query('desc', description="Sort direction: 'asc' or 'desc'."),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from a previous response. Fetches the page that follows it."),
+    tag: Optional[List[str]] = Query(None, description="Only return models carrying this tag (e.g. 'gguf'). Repeat to require several tags."),
+    pipeline_tag: Optional[str] = Query(None, description="Only return models for this pipeline (e.g. 'text-generation').")
 ):
     """
     Retrieves a list of Hugging Face models, allowing for searching, pagination, and sorting.
@@ -28,26 +42,189 @@ async def list_huggingface_models(
         limit=limit,
         page=page,
         sort_by=sort_by,
-        direction=direction
+        direction=direction,
+        cursor=cursor,
+        tags=tag,
+        pipeline_tag=pipeline_tag
     )
+    if settings.FAST_SERIALIZATION:
+        # Items come from transform_hub_model or the catalog, already shaped like HFModel; skip revalidating them
+        return FastJSONResponse(models_data)
     return models_data
 
+# Column order of CSV exports; `tags` is joined with "|"
+EXPORT_CSV_FIELDS = ["id", "name", "creator", "description", "downloads", "likes", "lastModified", "private", "tags"]
+
+def _csv_chunk(models: List[dict], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_CSV_FIELDS)
+    for model in models:
+        writer.writerow(["|".join(model.get("tags") or []) if field == "tags" else model.get(field) for field in EXPORT_CSV_FIELDS])
+    return buffer.getvalue().encode()
+
+@router.get(
+    "/export",
+    summary="Export a model listing",
+    description=(
+        "Streams every model matching the query (same search, filters and sort as the listing endpoint) as NDJSON, "
+        "one model per line, or as CSV. Rows are written page by page as they arrive from the Hub (or the local "
+        "catalog), so memory stays flat however many models are exported. If the upstream fails after the stream "
+        "has started, NDJSON ends with an `{\"error\"}` line and CSV with a `# error:` line."
+    ),
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}}
+)
+async def export_huggingface_models(
+    search: Optional[str] = Query(None, description="Search term for models (e.g., 'bert', 'gpt2')."),
+    sort_by: Optional[str] = Query('downloads', description="Field to sort by (e.g., 'downloads', 'likes', 'lastModified')."),
+    direction: Optional[str] = Query('desc', description="Sort direction: 'asc' or 'desc'."),
+    tag: Optional[List[str]] = Query(None, description="Only export models carrying this tag. Repeat to require several tags."),
+    pipeline_tag: Optional[str] = Query(None, description="Only export models for this pipeline (e.g. 'text-generation')."),
+    max_results: Optional[int] = Query(None, ge=1, le=settings.HF_EXPORT_MAX_MODELS, description="Stop after this many models."),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="'ndjson' or 'csv'.")
+):
+    pages = iter_hf_model_pages(
+        search=search, sort_by=sort_by, direction=direction, tags=tag, pipeline_tag=pipeline_tag,
+        max_results=max_results or settings.HF_EXPORT_MAX_MODELS
+    )
+    # Wait for the first page so an unreachable Hub is still reported with an error status
+    try:
+        first_page = await pages.__anext__()
+    except StopAsyncIteration:
+        first_page = []
+    except Exception as e:
+        await pages.aclose()
+        print(f"Error exporting Hugging Face models: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error exporting Hugging Face models: {str(e)}")
+
+    as_csv = format == "csv"
+
+    def encode(models: List[dict], header: bool = False) -> bytes:
+        if as_csv:
+            return _csv_chunk(models, header)
+        return b"".join(dumps_bytes(model) + b"\n" for model in models)
+
+    async def export_stream():
+        try:
+            yield encode(first_page, header=True)
+            async for page in pages:
+                yield encode(page)
+        except Exception as e:
+            print(f"Error exporting Hugging Face models: {str(e)}")
+            message = f"Export stopped early: {str(e)}"
+            yield f"# error: {message}\n".encode() if as_csv else dumps_bytes({"error": message}) + b"\n"
+        finally:
+            await pages.aclose() # Cancels the prefetched page when the client goes away
+
+    extension, media_type = ("csv", "text/csv") if as_csv else ("ndjson", "application/x-ndjson")
+    return StreamingResponse(export_stream(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="hf-models.{extension}"'})
+
+@router.get(
+    "/suggest",
+    response_model=HFModelSuggestResponse,
+    summary="Search-as-you-type model suggestions",
+    description=(
+        "Prefix matches over the most downloaded models (by full ID, name or author) and over authors, "
+        "ranked by downloads. Answered from an in-memory index that is refreshed in the background, "
+        "so it never waits on the Hub."
+    )
+)
+async def suggest_huggingface_models(
+    q: str = Query("", description="Prefix typed so far, e.g. 'meta-llama/lla' or 'lla'."),
+    limit: int = Query(10, ge=1, le=settings.HF_SUGGEST_MAX_LIMIT, description="Maximum number of models and of authors to return.")
+):
+    return model_suggester.suggest(q, limit)
+
+@router.get(
+    "/suggest/status",
+    summary="Suggest index status",
+    description="Reports whether the suggest index is built, where it was loaded from and how many models it holds."
+)
+async def hf_models_suggest_status():
+    return model_suggester.status()
+
+@router.post(
+    "/batch",
+    summary="Look up many models at once",
+    description=(
+        "Fetches metadata for a list of model IDs concurrently (`HF_BATCH_CONCURRENCY` Hub requests at a time, "
+        "recently fetched models come from a short-lived cache). Results are streamed as NDJSON in completion order, "
+        "one `{\"id\", \"model\"}` or `{\"id\", \"error\": {\"status\", \"detail\"}}` line per distinct ID."
+    ),
+    responses={200: {"content": {"application/x-ndjson": {}}}}
+)
+async def batch_huggingface_models(request_body: HFModelBatchRequest):
+    if len(request_body.ids) > settings.HF_BATCH_MAX_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {settings.HF_BATCH_MAX_IDS} model IDs per batch.")
+
+    async def ndjson_stream():
+        results = iter_hf_model_batch(request_body.ids)
+        try:
+            async for result in results:
+                yield dumps_bytes(result) + b"\n"
+        finally:
+            await results.aclose() # Cancels outstanding lookups when the client goes away
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+@router.get(
+    "/cache-stats",
+    summary="Hugging Face listing cache statistics",
+    description="Returns hit/miss/eviction counters for the in-process cache in front of the model listing endpoint."
+)
+async def hf_models_cache_stats():
+    return get_hf_models_cache_stats()
+
+@router.get(
+    "/catalog",
+    summary="Local model catalog status",
+    description="Reports whether the local catalog snapshot is loaded, how many models it holds and when it was last synced."
+)
+async def hf_models_catalog_status():
+    return model_catalog.status()
+
+@router.post(
+    "/catalog/sync",
+    status_code=202,
+    summary="Trigger a local model catalog sync",
+    description="Starts a background sync of Hub model metadata into the local catalog snapshot."
+)
+async def hf_models_catalog_sync():
+    try:
+        await start_catalog_sync(model_catalog, shared_store)
+    except CatalogSyncBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_catalog.status()
+
 @router.post(
     "/{model_id:path}/download", # Uses :path to allow slashes in model_id
     response_model=HFModelDownloadStatus,
-    summary="Download a Hugging Face model (simulation)",
-    description="Triggers a simulated download process for the specified model ID."
+    status_code=202,
+    summary="Download a Hugging Face model",
+    description="Queues a background job that downloads every file of the model repository into the server's model directory. Track it under /api/v1/downloads/{job_id}."
 )
 async def download_huggingface_model(
-    model_id: str = Path(..., description="ID of the model to download (e.g., 'bert-base-uncased' or 'google/flan-t5-small').", example="gpt2")
+    model_id: str = Path(..., description="ID of the model to download (e.g., 'bert-base-uncased' or 'google/flan-t5-small').", examples=["gpt2"]),
+    revision: str = Query("main", description="Branch, tag or commit to download."),
+    priority: int = Query(0, description="Higher priorities start first.")
 ):
     """
-    Simulates the download of a specified Hugging Face model.
+    Queues the download of a specified Hugging Face model and returns immediately.
     The `model_id` can be a simple name or a namespaced name like `org/model-name`.
+    Requesting a model that is already being downloaded returns the existing job.
     """
-    # The service layer is expected to raise HTTPException on errors.
-    download_status = await download_hf_model(model_id=model_id)
-    return download_status
+    job, created = await download_scheduler.submit(model_id, revision=revision, priority=priority)
+    message = (f"Download of {model_id} queued as job {job.job_id}." if created
+               else f"Download of {model_id} is already {job.state.value} as job {job.job_id}.")
+    return {
+        "message": message,
+        "model_id": model_id,
+        "download_path": model_download_path(model_id, revision),
+        "job_id": job.job_id,
+        "status": job.state.value
+    }
 
 # Example of how model_id:path works:
 # If you POST to /api/v1/hf-models/username/model-name/download
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Response
+
+from app.core.metrics import cache_collector, metrics, singleflight_collector
+from app.services.huggingface_service import (
+    hf_model_info_cache, hf_model_info_flight, hf_models_cache, hf_models_flight,
+)
+from app.services.ollama_router import ollama_router
+from app.services.ollama_service import ollama_tags_flight
+
+router = APIRouter()
+
+# Cache and single-flight counters are read when scraped, so lookups themselves pay nothing extra.
+# Only caches read through `get_or_fetch` count hits and misses; plain key-value stores such as the
+# page-cursor map and Ollama model version snapshots would always report zero, so they are left out.
+metrics.add_collector(cache_collector({
+    "hf_models": hf_models_cache,
+    "hf_model_info": hf_model_info_cache,
+    "ollama_loaded_models": ollama_router.loaded_models,
+}))
+metrics.add_collector(singleflight_collector([hf_models_flight, hf_model_info_flight, ollama_tags_flight]))
+
+@router.get(
+    "/metrics",
+    include_in_schema=False,
+    summary="Prometheus metrics",
+    description="Request latency and counts per route, in-flight requests, upstream call timing and errors, and cache hit ratios, in the Prometheus text format."
+)
+async def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
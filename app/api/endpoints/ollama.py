@@ -1,14 +1,35 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.services.ollama_service import test_ollama_connection, get_local_ollama_models, pull_model_ollama
+import json
+import time
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from app.core.config import settings
+from app.core.serialization import FastJSONResponse
+from app.core.sse import SSE_HEADERS, format_sse
+from app.services.ollama_service import (
+    test_ollama_connection, pull_model_ollama, stream_pull_ollama, stream_ollama_generation, ollama_tags_flight,
+    get_versioned_local_ollama_models, diff_ollama_models, get_ollama_models_at_version
+)
+from app.services.ollama_pulls import ollama_pull_manager
+from app.services.ollama_fleet import ollama_fleet
+from app.services.ollama_router import HostLease, ollama_router
 from app.schemas.ollama_schemas import (
     OllamaConnectionRequest,
     OllamaConnectionResponse,
     OllamaLocalModelsResponse, # New
+    OllamaLocalModelsDelta,
     OllamaPullRequest,         # New
-    OllamaPullResponse         # New
+    OllamaPullResponse,        # New
+    OllamaPullStatus,
+    OllamaHost,
+    OllamaHostRegistration,
+    OllamaFleetInventory,
+    OllamaChatRequest,
+    OllamaGenerateRequest,
+    OllamaRouterStatus
 )
 from app.schemas.model_schemas import HFModel # For OllamaLocalModelInfo structure, though it's defined in ollama_schemas
-from typing import List # For List[OllamaLocalModelInfo]
+from typing import List, Optional, Union # For List[OllamaLocalModelInfo]
 
 router = APIRouter()
 
@@ -46,21 +67,46 @@ async def test_ollama_api_connection(
 
 @router.get(
     "/local-models",
-    response_model=OllamaLocalModelsResponse, # Uses the new schema
+    response_model=Union[OllamaLocalModelsResponse, OllamaLocalModelsDelta], # Uses the new schema
     summary="List locally available Ollama models",
-    description="Fetches a list of models currently available in the specified local Ollama instance from its /api/tags endpoint."
+    description=(
+        "Fetches a list of models currently available in the specified local Ollama instance from its /api/tags endpoint. "
+        "The response carries a `version` (also the `ETag`) derived from the model names and digests: a request with a "
+        "matching `If-None-Match` gets `304 Not Modified`, and `since=<version>` returns only the models added, removed "
+        "or changed since that version (or the full list if that version is no longer known)."
+    ),
+    responses={304: {"description": "The model list still has the version given in If-None-Match."}}
 )
 async def list_local_ollama_models(
-    ollama_url: str = Query(..., description="Base URL of the Ollama API server (e.g., http://localhost:11434).")
+    request: Request,
+    ollama_url: str = Query(..., description="Base URL of the Ollama API server (e.g., http://localhost:11434)."),
+    since: Optional[str] = Query(None, description="A previous `version`; returns only the differences from it.")
 ):
     """
     Retrieves a list of locally downloaded models from an Ollama instance.
     - **ollama_url**: The base URL of the Ollama API.
+    - **since**: Version from a previous response, to receive a diff instead of the full list.
     """
     try:
-        models_list = await get_local_ollama_models(ollama_url=ollama_url)
-        # The service returns List[OllamaLocalModelInfo], which matches the schema's 'models' field.
-        return OllamaLocalModelsResponse(models=models_list)
+        result = await get_versioned_local_ollama_models(ollama_url=ollama_url)
+        if result is None:
+            # Ollama unreachable: keep the previous behavior (empty list, frontend shows "no models") without an ETag
+            return OllamaLocalModelsResponse(models=[])
+
+        version, snapshot = result
+        etag = f'"{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"} # Browsers revalidate with If-None-Match on every fetch
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        if since:
+            previous = await get_ollama_models_at_version(ollama_url, since)
+            if previous is not None:
+                delta = OllamaLocalModelsDelta(version=version, since=since, **diff_ollama_models(previous, snapshot["models"]))
+                return Response(content=delta.model_dump_json(), media_type="application/json", headers=headers)
+
+        # Serialized once per version; an unchanged list is sent as the cached bytes
+        return Response(content=snapshot["body"], media_type="application/json", headers=headers)
     except HTTPException as e:
         raise e # Re-raise if service layer raised it
     except Exception as e:
@@ -69,27 +115,230 @@ async def list_local_ollama_models(
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred while listing local Ollama models: {str(e)}")
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match
+    return "*" in candidates or etag in (candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates)
+
+
 @router.post(
     "/pull-model",
     response_model=OllamaPullResponse, # Uses the new schema
     summary="Pull a model into a local Ollama instance",
-    description="Triggers a model pull operation on the specified Ollama instance. This can take a long time."
+    description=(
+        "Triggers a model pull operation on the specified Ollama instance. This can take a long time. "
+        "With `stream: true` the response relays Ollama's progress as NDJSON (or Server-Sent Events when the "
+        "request sends `Accept: text/event-stream`). With `detach: true` the pull runs in the background and "
+        "the response carries a `pull_id` for `/pulls/{pull_id}`."
+    ),
+    responses={200: {"content": {"application/x-ndjson": {}, "text/event-stream": {}}}}
 )
 async def pull_ollama_model_endpoint(
-    request_body: OllamaPullRequest # Contains ollama_url and model_name
+    request_body: OllamaPullRequest, # Contains ollama_url and model_name
+    request: Request
 ):
     """
     Initiates pulling a model to the specified Ollama server.
     - **model_name**: Name of the model to pull (e.g., `mistral:latest`).
     - **ollama_url**: The base URL of the Ollama API where the model should be pulled.
+    - **stream**: Relay progress while the pull runs instead of waiting for it to finish.
+    - **detach**: Start the pull in the background and return immediately.
     """
+    # Holds a slot on the chosen host for as long as the pull runs
+    lease = await ollama_router.acquire(request_body.model_name, request_body.ollama_url)
+
+    if request_body.detach:
+        pull = ollama_pull_manager.start(lease.url, request_body.model_name, on_finish=lease.release)
+        return JSONResponse(status_code=202, content=OllamaPullResponse(
+            status="pulling_started",
+            message=f"Pulling '{pull.model_name}' in the background. Track it at /api/v1/ollama/pulls/{pull.pull_id}.",
+            pull_id=pull.pull_id,
+            ollama_url=lease.url
+        ).model_dump())
+
+    if request_body.stream:
+        updates = stream_pull_ollama(ollama_url=lease.url, model_name=request_body.model_name)
+        if "text/event-stream" in request.headers.get("accept", ""):
+            async def sse_stream():
+                async for update in updates:
+                    yield format_sse(update, event="error" if "error" in update else "progress")
+            return _leased_stream(lease, sse_stream(), "text/event-stream", headers=SSE_HEADERS)
+
+        async def ndjson_stream():
+            async for update in updates:
+                yield json.dumps(update) + "\n"
+        return _leased_stream(lease, ndjson_stream(), "application/x-ndjson")
+
     try:
-        result = await pull_model_ollama(ollama_url=request_body.ollama_url, model_name=request_body.model_name)
+        async with lease:
+            result = await pull_model_ollama(ollama_url=lease.url, model_name=request_body.model_name)
         # Service returns a dict like {"status": "...", "message": "..."}
-        return OllamaPullResponse(status=result["status"], message=result["message"])
+        return OllamaPullResponse(status=result["status"], message=result["message"], ollama_url=lease.url)
     except HTTPException as e:
         raise e # Re-raise if service layer raised it
     except Exception as e:
         print(f"Unexpected error in pull_ollama_model_endpoint: {e}")
         # import traceback; traceback.print_exc();
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred while pulling the Ollama model: {str(e)}")
+
+
+def _leased_stream(lease: HostLease, body, media_type: str, headers: Optional[dict] = None) -> StreamingResponse:
+    """Streams `body` and frees the router slot when it ends, fails or the client goes away."""
+    async def guarded():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            await body.aclose()
+            lease.release()
+
+    headers = {**(headers or {}), "X-Ollama-Host": lease.url}
+    # The background task covers a client that disconnects before the body is ever iterated
+    return StreamingResponse(guarded(), media_type=media_type, headers=headers, background=BackgroundTask(lease.release))
+
+
+@router.get(
+    "/pulls",
+    response_model=List[OllamaPullStatus],
+    summary="List detached Ollama pulls",
+    description="Lists running and recently finished background pulls, newest first."
+)
+async def list_ollama_pulls():
+    snapshots = [pull.snapshot() for pull in ollama_pull_manager.list()]
+    return FastJSONResponse(snapshots) if settings.FAST_SERIALIZATION else snapshots
+
+
+@router.get(
+    "/pulls/{pull_id}",
+    response_model=OllamaPullStatus,
+    summary="Get the status of a detached Ollama pull"
+)
+async def get_ollama_pull(pull_id: str):
+    return ollama_pull_manager.get(pull_id).snapshot()
+
+
+@router.get(
+    "/pulls/{pull_id}/events",
+    summary="Reattach to a detached Ollama pull",
+    description="Server-Sent Events stream of the pull's aggregated progress. Ends with a `done` event when the pull completes or fails."
+)
+async def stream_ollama_pull_events(pull_id: str):
+    ollama_pull_manager.get(pull_id) # 404 before the stream starts
+
+    async def event_stream():
+        async for snapshot in ollama_pull_manager.events(pull_id):
+            yield format_sse(snapshot, event="progress" if snapshot["state"] == "running" else "done")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def _generation_response(kind: str, lease: HostLease, payload: dict, started: float) -> StreamingResponse:
+    async def event_stream():
+        # When the client disconnects Starlette stops iterating (or cancels the response task).
+        # Closing the upstream stream explicitly then drops the request to Ollama, which stops generating.
+        yield format_sse({"host": lease.name, "url": lease.url, "queued_ms": round(lease.queued_seconds * 1000, 1)}, event="route")
+        events = stream_ollama_generation(lease.url, kind, payload, started=started)
+        try:
+            async for event, data in events:
+                if event == "token" and "ttft_ms" in data:
+                    lease.observe(data["ttft_ms"] / 1000) # Time to first token drives the router's latency EWMA
+                yield format_sse(data, event=event)
+        finally:
+            await events.aclose()
+
+    return _leased_stream(lease, event_stream(), "text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post(
+    "/chat",
+    summary="Stream a chat completion from Ollama",
+    description=(
+        "Forwards to Ollama's /api/chat and streams the reply as Server-Sent Events: one `token` event per token "
+        "(the first includes `ttft_ms`), then a `done` event with time to first token, total time, the proxy's "
+        "per-token overhead and Ollama's own stats, or an `error` event. Disconnecting cancels the generation. "
+        "Without `ollama_url` the router picks a registered host (announced in a leading `route` event)."
+    ),
+    responses={200: {"content": {"text/event-stream": {}}}}
+)
+async def ollama_chat(request_body: OllamaChatRequest):
+    started = time.perf_counter()
+    payload = request_body.model_dump(exclude={"ollama_url"}, exclude_none=True)
+    lease = await ollama_router.acquire(request_body.model, request_body.ollama_url)
+    return _generation_response("chat", lease, payload, started)
+
+
+@router.post(
+    "/generate",
+    summary="Stream a completion for a prompt from Ollama",
+    description="Forwards to Ollama's /api/generate. Streams the same `token` / `done` / `error` events as `/chat`.",
+    responses={200: {"content": {"text/event-stream": {}}}}
+)
+async def ollama_generate(request_body: OllamaGenerateRequest):
+    started = time.perf_counter()
+    payload = request_body.model_dump(exclude={"ollama_url"}, exclude_none=True)
+    lease = await ollama_router.acquire(request_body.model, request_body.ollama_url)
+    return _generation_response("generate", lease, payload, started)
+
+@router.get(
+    "/hosts",
+    response_model=List[OllamaHost],
+    summary="List registered Ollama hosts",
+    description="Named Ollama instances used by the fleet endpoints. Seeded from the `OLLAMA_HOSTS` setting."
+)
+async def list_ollama_hosts():
+    await ollama_fleet.refresh()
+    return [OllamaHost(name=name, url=url) for name, url in sorted(ollama_fleet.hosts.items())]
+
+
+@router.put(
+    "/hosts/{name}",
+    response_model=OllamaHost,
+    summary="Register or update a named Ollama host"
+)
+async def register_ollama_host(name: str, request_body: OllamaHostRegistration):
+    return OllamaHost(name=name, url=await ollama_fleet.register(name, request_body.url))
+
+
+@router.delete(
+    "/hosts/{name}",
+    status_code=204,
+    summary="Remove a named Ollama host"
+)
+async def remove_ollama_host(name: str):
+    await ollama_fleet.remove(name)
+
+
+@router.get(
+    "/fleet/models",
+    response_model=OllamaFleetInventory,
+    summary="List models across all registered Ollama hosts",
+    description=(
+        "Queries /api/tags on every registered host concurrently and merges the results by model name and digest. "
+        "Hosts that fail or do not answer within `timeout` seconds are listed with their status and the response "
+        "is marked `partial`."
+    )
+)
+async def list_ollama_fleet_models(
+    timeout: Optional[float] = Query(None, gt=0, le=60, description="Per-host deadline in seconds. Defaults to OLLAMA_FLEET_HOST_TIMEOUT_SECONDS.")
+):
+    return await ollama_fleet.inventory(timeout=timeout)
+
+
+@router.get(
+    "/router",
+    response_model=OllamaRouterStatus,
+    summary="Load of the registered Ollama hosts as seen by the request router"
+)
+async def get_ollama_router_status():
+    return OllamaRouterStatus(hosts=ollama_router.status(), queued=ollama_router.queued)
+
+
+@router.get(
+    "/stats",
+    summary="Ollama request coalescing statistics",
+    description="Counters for the single-flight layer that lets concurrent identical /api/tags calls share one upstream request."
+)
+async def get_ollama_stats():
+    return {"tags_singleflight": ollama_tags_flight.stats()}
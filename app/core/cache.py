@@ -0,0 +1,185 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Hashable, Optional
+
+if TYPE_CHECKING:
+    from app.core.shared_store import SharedCache
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache with time-based freshness and stale-while-revalidate.
+
+    An entry younger than `ttl` seconds is served as a plain hit. Between `ttl` and
+    `ttl + stale_ttl` it is still served immediately, but a single background task is
+    scheduled to refresh it. Older entries are treated as misses and fetched inline.
+    Once `maxsize` entries are stored, the least recently used one is evicted.
+
+    With a `shared` tier (multi-worker mode), local misses are looked up there before fetching,
+    fetched values are written through, and only one worker at a time fetches a given key:
+    the others wait for its result instead of sending the same upstream request.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0, stale_ttl: float = 0.0,
+                 timer: Callable[[], float] = time.monotonic, shared: Optional["SharedCache"] = None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._timer = timer
+        self.shared = shared
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (stored_at, value)
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns a fresh or stale value without fetching. Does not touch the counters."""
+        entry = self._entries.get(key)
+        if entry is None or self._timer() - entry[0] >= self.ttl + self.stale_ttl:
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, age: float = 0.0) -> None:
+        self._entries[key] = (self._timer() - age, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def aget(self, key: Hashable, default: Any = None) -> Any:
+        """Like `get`, but also consults the shared tier on a local miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING and self.shared is not None:
+            entry = await self._load_shared(key)
+            value = entry[1] if entry is not None else _MISSING
+        return default if value is _MISSING else value
+
+    async def aset(self, key: Hashable, value: Any) -> None:
+        """Like `set`, but also writes through to the shared tier."""
+        self.set(key, value)
+        if self.shared is not None:
+            await self.shared.aset(key, value, self.ttl + self.stale_ttl)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the cached value for `key`, calling `fetch()` when there is none.
+        Exceptions raised by an inline fetch propagate and nothing is cached.
+        """
+        entry = self._entries.get(key)
+        if entry is None and self.shared is not None:
+            entry = await self._load_shared(key)
+            if entry is not None:
+                self.shared_hits += 1
+        if entry is not None:
+            age = self._timer() - entry[0]
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._schedule_refresh(key, fetch)
+                return entry[1]
+            del self._entries[key]
+
+        self.misses += 1
+        if self.shared is not None:
+            return await self._fetch_shared(key, fetch)
+        value = await fetch()
+        self.set(key, value)
+        return value
+
+    def _schedule_refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._refreshing:
+            return  # One refresh per key is enough; other readers keep getting the stale value.
+        task = asyncio.get_running_loop().create_task(self._refresh(key, fetch))
+        self._refreshing[key] = task
+
+    async def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            if self.shared is not None:
+                entry = await self._load_shared(key)
+                if entry is not None and self._timer() - entry[0] < self.ttl:
+                    return # Another worker already refreshed it
+                if not await self.shared.aclaim(key):
+                    return # Another worker is refreshing it; a later reader picks up its value
+                try:
+                    value = await fetch()
+                    await self.aset(key, value)
+                finally:
+                    await self.shared.arelease(key)
+            else:
+                value = await fetch()
+                self.set(key, value)
+            self.refreshes += 1
+        except Exception as e:
+            # Keep serving the stale entry until it fully expires; the next reader will retry.
+            self.refresh_errors += 1
+            print(f"Background refresh failed for cache key {key!r}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def _load_shared(self, key: Hashable) -> Optional[tuple]:
+        """Copies a still-servable shared entry into the local cache, keeping its age."""
+        record = await self.shared.aget(key)
+        if record is None:
+            return None
+        stored_at, value = record
+        age = max(time.time() - stored_at, 0.0)
+        if age >= self.ttl + self.stale_ttl:
+            return None
+        self.set(key, value, age=age)
+        return self._entries[key]
+
+    async def _fetch_shared(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        while not await self.shared.aclaim(key):
+            # Another worker is fetching this key; wait for its result rather than asking upstream too.
+            # If it takes longer than its lease, the lease expires and exactly one waiter claims it next.
+            await asyncio.sleep(self.shared.poll_interval)
+            entry = await self._load_shared(key)
+            if entry is not None:
+                self.shared_hits += 1
+                return entry[1]
+        try:
+            value = await fetch()
+            await self.aset(key, value)
+            return value
+        finally:
+            await self.shared.arelease(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "shared_hits": self.shared_hits,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "shared": self.shared is not None,
+        }
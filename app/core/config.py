@@ -1,6 +1,120 @@
 from pydantic_settings import BaseSettings
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
-    MODEL_DOWNLOAD_DIRECTORY: str = "downloaded_models/"
+    MODEL_DOWNLOAD_DIRECTORY: str = "downloaded_models/" # Default for the runtime `model_directory` setting
+
+    # Runtime-editable settings file (app/core/config_store.py), shared by all worker processes
+    CONFIG_STORE_PATH: str = "settings.json"
+    CONFIG_STORE_POLL_SECONDS: float = 1.0 # How quickly a worker sees changes written by another worker
+
+    # Multi-worker mode (`python -m app.server`). With more than one worker, response caches and download
+    # jobs are shared through a SQLite file (app/core/shared_store.py) instead of living in each process.
+    WORKERS: int = 1                                # 0 = one worker per CPU core
+    SHARED_STATE_PATH: Optional[str] = None         # Defaults to <model_directory>/.state/shared.sqlite3; setting it enables sharing
+    SHARED_STATE_BUSY_TIMEOUT_SECONDS: float = 5.0  # How long a write waits for another worker's write to finish
+    SHARED_CACHE_LEASE_SECONDS: float = 15.0        # After this, one waiting worker takes over a slow fetch of the same key
+    SHARED_CACHE_POLL_SECONDS: float = 0.05
+    DOWNLOAD_JOB_STALE_SECONDS: float = 30.0        # Running jobs of a worker silent this long are requeued
+
+    # Static frontend (app/core/static_assets.py), loaded into memory and precompressed at startup
+    STATIC_FRONTEND_DIRECTORY: str = "/app/static_frontend"
+    STATIC_GZIP_LEVEL: int = 9
+    STATIC_BROTLI_QUALITY: int = 11 # Only used when the optional `brotli` package is installed
+    STATIC_COMPRESS_MIN_BYTES: int = 512
+
+    # Encode list endpoints (HF listing, download jobs, Ollama pulls) straight to JSON bytes (orjson when
+    # installed), skipping FastAPI's response_model revalidation of data the services already shape.
+    FAST_SERIALIZATION: bool = False
+
+    # Download engine (app/services/download_engine.py)
+    DOWNLOAD_CHUNK_SIZE: int = 32 * 1024 * 1024        # Size of each HTTP range request for large files
+    DOWNLOAD_BUFFER_SIZE: int = 1024 * 1024            # Read/write/hash buffer; files are never held in memory
+    DOWNLOAD_PARALLEL_THRESHOLD: int = 64 * 1024 * 1024 # Files at least this big are fetched with parallel ranges
+    DOWNLOAD_CONNECTIONS_PER_FILE: int = 8
+    DOWNLOAD_MAX_CONCURRENT_FILES: int = 4
+    DOWNLOAD_MAX_CONNECTIONS: int = 32
+    DOWNLOAD_TIMEOUT_SECONDS: float = 60.0
+    DOWNLOAD_MAX_RETRIES: int = 3
+    DOWNLOAD_BLOB_LOCK_POLL_SECONDS: float = 0.2      # How often a job retries a blob another worker is downloading
+
+    # Download job scheduler (app/services/download_jobs.py)
+    DOWNLOAD_MAX_CONCURRENT_JOBS: int = 2 # All jobs download from HF_ENDPOINT, so this is also the per-upstream limit
+    DOWNLOAD_PROGRESS_INTERVAL_SECONDS: float = 1.0
+    DOWNLOAD_JOB_HISTORY: int = 200 # Finished jobs kept for status lookups
+
+    # Hugging Face Hub API client (app/services/hub_client.py)
+    HF_ENDPOINT: str = "https://huggingface.co"
+    HF_TOKEN: Optional[str] = None
+    HF_HUB_TIMEOUT_SECONDS: float = 15.0
+    HF_HUB_MAX_CONNECTIONS: int = 20
+    HF_HUB_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HF_HUB_HTTP2: bool = True # Only used when the optional `h2` package is installed
+
+    # In-process cache for GET /api/v1/hf-models/ listings
+    HF_MODELS_CACHE_MAX_ENTRIES: int = 512
+    HF_MODELS_CACHE_TTL_SECONDS: float = 60.0
+    HF_MODELS_CACHE_STALE_SECONDS: float = 600.0 # Stale entries are served while one background refresh runs
+    HF_MODEL_INFO_CACHE_MAX_ENTRIES: int = 4096 # Single-model metadata reused by POST /api/v1/hf-models/batch
+    HF_MODEL_INFO_CACHE_TTL_SECONDS: float = 300.0
+    HF_BATCH_MAX_IDS: int = 1000
+    HF_BATCH_CONCURRENCY: int = 16 # Hub requests in flight per batch
+    HF_PAGE_CURSOR_CACHE_MAX_ENTRIES: int = 4096
+    HF_PAGE_CURSOR_CACHE_TTL_SECONDS: float = 600.0
+    # GET /api/v1/hf-models/export
+    HF_EXPORT_PAGE_SIZE: int = 1000      # Models per upstream page (the Hub's maximum); one page is buffered ahead
+    HF_EXPORT_MAX_MODELS: int = 1000000  # Upper bound for `max_results`
+
+    # Ollama (pooled clients per host, see app/services/ollama_clients.py)
+    OLLAMA_TIMEOUT_SECONDS: float = 10.0            # Default per-request timeout (e.g. /api/tags)
+    OLLAMA_CONNECTION_TEST_TIMEOUT_SECONDS: float = 5.0
+    OLLAMA_PULL_TIMEOUT_SECONDS: float = 300.0      # Blocking (non-streamed) pulls
+    OLLAMA_MAX_CONNECTIONS: int = 20                # Per Ollama host
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    OLLAMA_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    OLLAMA_MAX_CLIENTS: int = 64                    # Distinct hosts with a warm pool before the oldest is closed
+    # Named Ollama hosts for the fleet endpoints, e.g. OLLAMA_HOSTS='{"gpu-1": "http://10.0.0.11:11434"}'
+    OLLAMA_HOSTS: Dict[str, str] = {}
+    OLLAMA_FLEET_HOST_TIMEOUT_SECONDS: float = 3.0  # Hosts slower than this are reported as partial
+    OLLAMA_HOSTS_SYNC_SECONDS: float = 2.0          # Multi-worker mode: how often hosts registered on other workers are picked up
+    # Versioned /local-models responses (ETag and ?since=<version> diffs)
+    OLLAMA_MODEL_VERSIONS_MAX_ENTRIES: int = 256    # (host, version) snapshots kept for diffs and cached bodies
+    OLLAMA_MODEL_VERSIONS_TTL_SECONDS: float = 3600.0
+    OLLAMA_PULL_READ_TIMEOUT_SECONDS: float = 300.0 # Max silence between progress lines of a streamed pull
+    # Load-aware routing across OLLAMA_HOSTS (app/services/ollama_router.py)
+    OLLAMA_ROUTER_MAX_IN_FLIGHT_PER_HOST: int = 4     # Further requests queue until a slot frees up
+    OLLAMA_ROUTER_QUEUE_TIMEOUT_SECONDS: float = 30.0 # 503 when no host frees up in time
+    OLLAMA_ROUTER_PS_TTL_SECONDS: float = 2.0         # How long /api/ps (loaded models) answers are reused
+    OLLAMA_ROUTER_PS_TIMEOUT_SECONDS: float = 0.5
+    OLLAMA_ROUTER_EWMA_ALPHA: float = 0.3             # Weight of the newest latency sample
+    OLLAMA_GENERATE_READ_TIMEOUT_SECONDS: float = 300.0 # Max silence while streaming chat/generate (covers model load)
+    OLLAMA_PULL_HISTORY: int = 100                  # Finished detached pulls kept for status lookups
+
+    # Local catalog snapshot (app/services/model_catalog.py). When enabled and synced,
+    # GET /api/v1/hf-models/ is answered from SQLite instead of the Hub.
+    HF_CATALOG_ENABLED: bool = False
+    HF_CATALOG_PATH: Optional[str] = None # Defaults to <model_directory>/.catalog/hf_models.sqlite3
+    HF_CATALOG_SYNC_INTERVAL_SECONDS: float = 6 * 3600
+    HF_CATALOG_MAX_MODELS: int = 100000
+    HF_CATALOG_SYNC_PAGE_SIZE: int = 1000
+    HF_CATALOG_MMAP_BYTES: int = 256 * 1024 * 1024
+
+    # In-memory prefix index behind GET /api/v1/hf-models/suggest (app/services/model_suggest.py)
+    HF_SUGGEST_ENABLED: bool = True
+    HF_SUGGEST_MAX_MODELS: int = 20000                # Most downloaded models kept in the index
+    HF_SUGGEST_MAX_LIMIT: int = 20                    # Largest `limit`; also the depth precomputed for 1-2 letter prefixes
+    HF_SUGGEST_REFRESH_INTERVAL_SECONDS: float = 900.0
+    HF_SUGGEST_REFRESH_MODELS: int = 1000             # Head of the download ranking re-read on each incremental refresh
+
+    # Prometheus metrics at GET /metrics (app/core/metrics.py). Counters are per worker process.
+    METRICS_ENABLED: bool = True
+
+    # Event loop stall detection and the on-demand profiler (app/core/diagnostics.py, /api/v1/diagnostics)
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_SECONDS: float = 0.1
+    LOOP_STALL_THRESHOLD_SECONDS: float = 0.25     # Blocking longer than this is logged with the blocking stack
+    PROFILER_MAX_SECONDS: float = 60.0
+    PROFILER_MIN_INTERVAL_MS: float = 5.0          # Faster sampling contends for the GIL with the worker being measured
+    DIAGNOSTICS_TOKEN: Optional[str] = None        # /api/v1/diagnostics is disabled until set; requests send it in X-Diagnostics-Token
 
 settings = Settings()
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError: # Windows; writes are still atomic, but concurrent writers from several processes may race
+    FCNTL_AVAILABLE = False
+
+# Runtime-editable settings and their defaults. Environment-driven settings stay in `app.core.config`.
+DEFAULT_CONFIG = {"model_directory": settings.MODEL_DOWNLOAD_DIRECTORY}
+
+# Called as listener(key, old_value, new_value) for every changed key
+ConfigListener = Callable[[str, Any, Any], None]
+
+
+class ConfigStore:
+    """
+    Runtime settings persisted in a JSON file (`CONFIG_STORE_PATH`) and cached in memory.
+
+    Lookups are plain dict reads. Writes re-read the file under an exclusive lock, apply the change,
+    write a temporary file and `os.replace` it over the original, so readers (including other uvicorn
+    workers) only ever see a complete file. Each worker notices writes from other workers with `watch`,
+    which compares the file's stat signature every `CONFIG_STORE_POLL_SECONDS` and reloads only when it
+    changed. Listeners are notified of every changed key, whether the change was local or came from the file.
+    """
+
+    def __init__(self, path: Optional[str] = None, defaults: Optional[Dict[str, Any]] = None):
+        self.path = path or settings.CONFIG_STORE_PATH
+        self.defaults = dict(DEFAULT_CONFIG if defaults is None else defaults)
+        self._values: Dict[str, Any] = {}
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._listeners: List[ConfigListener] = []
+        self._lock = threading.Lock() # Serializes this process's writes and reloads
+        self._values = self._read()[0]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._values:
+            return self._values[key]
+        return self.defaults.get(key, default)
+
+    def all(self) -> Dict[str, Any]:
+        return {**self.defaults, **self._values}
+
+    def add_listener(self, listener: ConfigListener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: ConfigListener) -> None:
+        self._listeners.remove(listener)
+
+    def update(self, values: Dict[str, Any]) -> bool:
+        """Sets several keys and persists them. Blocking; use `aupdate` from async code."""
+        with self._lock:
+            try:
+                with self._file_lock():
+                    current, _ = self._read() # Keep keys written meanwhile by other workers
+                    merged = {**current, **values}
+                    self._write(merged)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Error saving settings to {self.path}: {e}")
+                return False
+            changes = self._swap(merged)
+        self._notify(changes)
+        return True
+
+    def set(self, key: str, value: Any) -> bool:
+        return self.update({key: value})
+
+    async def aupdate(self, values: Dict[str, Any]) -> bool:
+        # File locking, fsync and rename happen in a worker thread, never on the event loop
+        return await asyncio.to_thread(self.update, values)
+
+    async def aset(self, key: str, value: Any) -> bool:
+        return await self.aupdate({key: value})
+
+    def reload(self) -> bool:
+        """Re-reads the file if it changed since it was last read or written. Returns True on a reload."""
+        with self._lock:
+            if self._stat_signature() == self._signature:
+                return False
+            values, signature = self._read()
+            changes = self._swap(values, signature)
+        self._notify(changes)
+        return True
+
+    async def watch(self, interval: Optional[float] = None) -> None:
+        """Background job started from the app lifespan; picks up writes made by other processes."""
+        interval = interval or settings.CONFIG_STORE_POLL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            if self._stat_signature() != self._signature: # A stat per interval; the file is only read when it changed
+                await asyncio.to_thread(self.reload)
+
+    def _read(self) -> Tuple[Dict[str, Any], Optional[Tuple[int, int, int]]]:
+        signature = self._stat_signature()
+        if signature is None:
+            return {}, None
+        try:
+            with open(self.path, "r") as f:
+                values = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Could not read settings from {self.path}, using defaults: {e}")
+            return {}, signature
+        return (values if isinstance(values, dict) else {}), signature
+
+    def _write(self, values: Dict[str, Any]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(values, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._signature = self._stat_signature()
+
+    def _file_lock(self):
+        return _FileLock(self.path + ".lock") if FCNTL_AVAILABLE else _NullLock()
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        # os.replace gives every write a new inode, so this changes even when mtime granularity is coarse
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _swap(self, values: Dict[str, Any], signature: Any = ...) -> List[Tuple[str, Any, Any]]:
+        old = self.all()
+        self._values = values
+        if signature is not ...:
+            self._signature = signature
+        new = self.all()
+        return [(key, old.get(key), new.get(key)) for key in sorted(old.keys() | new.keys()) if old.get(key) != new.get(key)]
+
+    def _notify(self, changes: List[Tuple[str, Any, Any]]) -> None:
+        for key, old, new in changes:
+            for listener in list(self._listeners):
+                try:
+                    listener(key, old, new)
+                except Exception as e:
+                    print(f"Settings listener for '{key}' failed: {e}")
+
+
+class _FileLock:
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.file = open(self.path, "a")
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.file.close()
+
+
+class _NullLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+config_store = ConfigStore()
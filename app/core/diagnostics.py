@@ -0,0 +1,163 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as TallyCounter, deque
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+loop_lag = metrics.histogram("event_loop_lag_seconds", "How late the loop monitor's periodic wake-up ran.",
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)).labels()
+loop_stalls = metrics.counter("event_loop_stalls", "Times the event loop was blocked longer than the stall threshold.").labels()
+
+
+class LoopLagMonitor:
+    """
+    Detects synchronous work that blocks the event loop.
+
+    A task on the loop wakes up every `interval` seconds and records how late it ran (`event_loop_lag_seconds`).
+    A watchdog thread checks the task's last wake-up; once the loop has been silent for longer than `threshold`,
+    it captures the loop thread's current stack, i.e. the callback that is blocking it, and logs it.
+    When the loop comes back, the full stall duration is logged and kept with the stack in `recent_stalls`.
+    Both sides are cheap: one timer callback per interval on the loop, one clock read per interval in the thread.
+    """
+
+    def __init__(self, interval: Optional[float] = None, threshold: Optional[float] = None, history: int = 20):
+        self.interval = interval or settings.LOOP_MONITOR_INTERVAL_SECONDS
+        self.threshold = threshold or settings.LOOP_STALL_THRESHOLD_SECONDS
+        self.recent_stalls: deque = deque(maxlen=history)
+        self.max_lag = 0.0
+        self._beat = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._stall: Optional[dict] = None # Stall the watchdog is currently reporting
+        self._stopped = threading.Event()
+
+    async def run(self) -> None:
+        """Background job started from the app lifespan."""
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._beat = time.perf_counter()
+        watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                expected = time.perf_counter() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.perf_counter()
+                self._beat = now
+                self._record(max(now - expected, 0.0))
+        finally:
+            self._stopped.set()
+            await asyncio.to_thread(watchdog.join)
+
+    def _record(self, lag: float) -> None:
+        loop_lag.observe(lag)
+        self.max_lag = max(self.max_lag, lag)
+        stall, self._stall = self._stall, None
+        if stall is not None:
+            stall["duration_seconds"] = round(lag, 4)
+        if lag < self.threshold:
+            return
+        loop_stalls.inc()
+        if stall is None: # Ended between two watchdog checks; the duration is known but the stack is not
+            self.recent_stalls.append({"started_at": time.time() - lag, "duration_seconds": round(lag, 4), "stack": None})
+        print(f"Event loop was blocked for {lag:.3f}s (threshold {self.threshold:.3f}s)")
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            beat = self._beat
+            late = time.perf_counter() - beat - self.interval
+            if late < self.threshold or self._stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else None
+            if self._beat != beat: # The loop woke up meanwhile, so the stack may not be the blocking one
+                continue
+            self._stall = {"started_at": time.time() - late, "duration_seconds": None, "stack": stack}
+            self.recent_stalls.append(self._stall)
+            print(f"Event loop blocked for over {late:.3f}s, currently in:\n{stack}")
+
+    def status(self) -> dict:
+        return {
+            "running": self._loop_thread_id is not None and not self._stopped.is_set(),
+            "interval_seconds": self.interval,
+            "threshold_seconds": self.threshold,
+            "max_lag_seconds": round(self.max_lag, 4),
+            "recent_stalls": list(self.recent_stalls),
+        }
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is still running."""
+
+
+class SamplingProfiler:
+    """
+    Time-boxed sampling profiler for the live process. A worker thread reads every thread's current frame
+    (`sys._current_frames()`) every `interval` seconds, so the profiled code runs unmodified and the cost
+    is paid only while a profile is being taken. The result is in the collapsed-stack format
+    (`root;caller;callee <samples>` per line) read by flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self):
+        self._running = False
+        self._labels: Dict[object, str] = {} # Code object -> frame label, reused across samples
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def profile(self, seconds: float, interval: float, all_threads: bool = False) -> str:
+        """Samples the event loop thread (or every thread) for `seconds` and returns collapsed stacks."""
+        if self._running:
+            raise ProfilerBusyError("A profile is already being taken.")
+        self._running = True
+        try:
+            loop_thread_id = threading.get_ident()
+            stacks = await asyncio.to_thread(self._sample, None if all_threads else loop_thread_id, seconds, interval)
+        finally:
+            self._running = False
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def _sample(self, thread_id: Optional[int], seconds: float, interval: float) -> TallyCounter:
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: TallyCounter = TallyCounter()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_thread or (thread_id is not None and ident != thread_id):
+                    continue
+                stack = self._collapse(frame)
+                if thread_id is None:
+                    stack = f"{names.get(ident, ident)};{stack}"
+                stacks[stack] += 1
+            time.sleep(interval)
+        return stacks
+
+    def _collapse(self, frame) -> str:
+        labels: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            labels.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+
+def _short_path(filename: str) -> str:
+    # Trim the install prefix so frames read as `app/...` or `starlette/...`
+    for prefix in sorted((p for p in sys.path if p), key=len, reverse=True):
+        if filename.startswith(prefix.rstrip(os.sep) + os.sep):
+            return filename[len(prefix.rstrip(os.sep)) + 1:]
+    return filename
+
+
+loop_monitor = LoopLagMonitor()
+sampling_profiler = SamplingProfiler()
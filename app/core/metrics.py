@@ -0,0 +1,341 @@
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from starlette.routing import Match, Router
+
+# Latency buckets in seconds, from sub-millisecond cache hits to multi-minute pulls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# (name suffix, labels, value) samples produced by a metric or collector at scrape time
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _Metric:
+    """
+    Base for labelled metrics. Children (one per label combination) are created on first use and cached,
+    so the hot path is a dict lookup plus an integer/float update. Metrics are only updated from the event
+    loop thread, which makes plain attribute updates safe without locks.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            yield "_total", dict(zip(self.labelnames, values)), child.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            yield "", dict(zip(self.labelnames, values)), child.value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Preallocated; the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            labels = dict(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield "_sum", labels, child.sum
+            yield "_count", labels, child.count
+
+
+class MetricsRegistry:
+    """Holds the process's metrics and renders them in the Prometheus text exposition format (0.0.4)."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        # Collectors run at scrape time, for values that already live elsewhere (cache and single-flight counters)
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]) -> None:
+        """`collector()` yields (name, type, help, samples) families."""
+        self._collectors.append(collector)
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        families = [(metric.name, metric.kind, metric.help_text, metric.samples()) for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter("http_requests", "HTTP requests served, by route template and status code.",
+                                ("method", "route", "status"))
+http_request_duration = metrics.histogram("http_request_duration_seconds",
+                                          "Time from request start until the last response byte was sent.",
+                                          ("method", "route"))
+http_requests_in_flight = metrics.gauge("http_requests_in_flight", "Requests currently being handled.", ("method", "route"))
+upstream_request_duration = metrics.histogram("upstream_request_duration_seconds",
+                                              "Duration of calls to the Hub and Ollama, by target and host.",
+                                              ("target", "host"))
+http_exceptions = metrics.counter("http_exceptions", "Unhandled exceptions raised by request handlers, by type.",
+                                  ("route", "type"))
+upstream_errors = metrics.counter("upstream_errors", "Failed calls to the Hub and Ollama, by exception type.",
+                                  ("target", "host", "type"))
+
+
+class track_upstream:
+    """
+    Times one upstream call, e.g. `with track_upstream("hub_list", host): ...`. `host` must come from a
+    bounded set (configured endpoints, registered host names), never from request input. Exceptions raised
+    inside the block are counted in `upstream_errors` by type and re-raised; failures that are handled
+    without an exception (an error status relayed to a stream) are reported with `fail()`.
+    """
+    __slots__ = ("target", "host", "started", "error")
+
+    def __init__(self, target: str, host: str):
+        self.target = target
+        self.host = host
+        self.error = None
+
+    def __enter__(self) -> "track_upstream":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        upstream_request_duration.labels(self.target, self.host).observe(time.perf_counter() - self.started)
+        # A consumer going away (closed generator, cancelled request) is not an upstream failure
+        if exc_type is not None and not issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            upstream_errors.labels(self.target, self.host, exc_type.__name__).inc()
+        elif self.error is not None:
+            upstream_errors.labels(self.target, self.host, self.error).inc()
+
+    def fail(self, error_type: str) -> None:
+        self.error = error_type
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts, latency and in-flight requests per route template
+    (e.g. `/api/v1/downloads/{job_id}`), so label cardinality stays bounded. Latency covers the whole
+    response, including streamed bodies.
+    """
+
+    def __init__(self, app, router: Router):
+        self.app = app
+        self.router = router
+        self._routes: List[Tuple[str, object]] = []
+        self._routes_seen = -1
+        # (method, path) -> template; most traffic repeats a few paths, so this skips the route scan.
+        # Cleared when full, which keeps memory bounded when paths carry IDs.
+        self._templates: Dict[Tuple[str, str], str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_template(scope)
+        in_flight = http_requests_in_flight.labels(method, route)
+        in_flight.inc()
+        status = 500 # Reported if the app fails before starting a response
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            http_exceptions.labels(route, type(e).__name__).inc()
+            raise
+        finally:
+            in_flight.dec()
+            http_request_duration.labels(method, route).observe(time.perf_counter() - started)
+            http_requests.labels(method, route, str(status)).inc()
+
+    def _route_template(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        template = self._templates.get(key)
+        if template is None:
+            template = self._match_template(scope)
+            if len(self._templates) >= 4096:
+                self._templates.clear()
+            self._templates[key] = template
+        return template
+
+    def _match_template(self, scope) -> str:
+        partial = None
+        for template, route in self._route_table():
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return template
+            if match == Match.PARTIAL and partial is None:
+                partial = template # Path matches but the method does not (405)
+        return partial or "unmatched"
+
+    def _route_table(self) -> List[Tuple[str, object]]:
+        # Flattened (template, route) pairs. Newer FastAPI versions keep included routers as one entry
+        # whose routes only know their path relative to the router, so their full-path contexts are used.
+        if self._routes_seen != len(self.router.routes):
+            routes = []
+            for route in self.router.routes:
+                if hasattr(route, "effective_route_contexts"):
+                    routes.extend((context.path, context) for context in route.effective_route_contexts())
+                else:
+                    routes.append((getattr(route, "path", "") or "/", route))
+            self._routes, self._routes_seen = routes, len(self.router.routes)
+            self._templates.clear()
+        return self._routes
+
+
+def cache_collector(caches: Dict[str, object]):
+    """Exports the counters `TTLCache.stats()` already keeps, so cache lookups pay nothing extra."""
+    def collect():
+        stats = {name: cache.stats() for name, cache in caches.items()}
+        return [
+            ("cache_lookups", "counter", "Cache lookups by result (stale hits are served while refreshing).", [
+                ("_total", {"cache": name, "result": result}, values[key])
+                for name, values in stats.items()
+                for result, key in (("hit", "hits"), ("stale_hit", "stale_hits"), ("miss", "misses"))
+            ]),
+            ("cache_shared_hits", "counter", "Local misses answered by the shared multi-worker tier.",
+             [("_total", {"cache": name}, values["shared_hits"]) for name, values in stats.items()]),
+            ("cache_hit_ratio", "gauge", "Share of lookups served from the cache, stale hits included.",
+             [("", {"cache": name}, values["hit_ratio"]) for name, values in stats.items()]),
+            ("cache_entries", "gauge", "Entries currently cached in this process.",
+             [("", {"cache": name}, values["size"]) for name, values in stats.items()]),
+            ("cache_evictions", "counter", "Entries evicted to stay within the cache size.",
+             [("_total", {"cache": name}, values["evictions"]) for name, values in stats.items()]),
+            ("cache_refresh_errors", "counter", "Background refreshes of stale entries that failed.",
+             [("_total", {"cache": name}, values["refresh_errors"]) for name, values in stats.items()]),
+        ]
+    return collect
+
+
+def singleflight_collector(flights: Iterable[object]):
+    """Exports `SingleFlight.stats()` counters."""
+    flights = list(flights)
+
+    def collect():
+        stats = {flight.name: flight.stats() for flight in flights}
+        return [
+            ("singleflight_calls", "counter", "Calls into a single-flight group.",
+             [("_total", {"name": name}, values["calls"]) for name, values in stats.items()]),
+            ("singleflight_coalesced", "counter", "Calls that joined an identical call already in flight.",
+             [("_total", {"name": name}, values["coalesced"]) for name, values in stats.items()]),
+            ("singleflight_errors", "counter", "Shared calls that raised.",
+             [("_total", {"name": name}, values["errors"]) for name, values in stats.items()]),
+            ("singleflight_in_flight", "gauge", "Distinct calls currently running.",
+             [("", {"name": name}, values["in_flight"]) for name, values in stats.items()]),
+        ]
+    return collect
@@ -0,0 +1,30 @@
+import json
+from typing import Any
+
+from starlette.responses import Response
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def dumps_bytes(content: Any) -> bytes:
+    """Compact UTF-8 JSON, via orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response that encodes its content as-is.
+    Returning it from an endpoint bypasses `response_model` validation and serialization, so it is
+    only for content whose shape the service already guarantees (see `FAST_SERIALIZATION`).
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Hashable, Iterator, Optional, Tuple
+
+from app.core.config import settings
+from app.core.config_store import config_store
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS download_jobs (
+    job_id TEXT PRIMARY KEY,
+    model_id TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    sequence INTEGER NOT NULL,
+    owner TEXT,
+    control TEXT,
+    snapshot TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_download_jobs_state ON download_jobs (state);
+CREATE TABLE IF NOT EXISTS ollama_hosts (
+    name TEXT PRIMARY KEY,
+    url TEXT -- NULL: removed at runtime, even if OLLAMA_HOSTS seeds it
+) WITHOUT ROWID;
+"""
+
+
+def default_shared_state_path() -> str:
+    return settings.SHARED_STATE_PATH or os.path.join(config_store.get("model_directory"), ".state", "shared.sqlite3")
+
+
+def shared_state_enabled() -> bool:
+    return settings.WORKERS != 1 or bool(settings.SHARED_STATE_PATH)
+
+
+class SharedStore:
+    """
+    SQLite file shared by all worker processes on a host (WAL mode, so readers never block the writer).
+
+    Holds the second tier of the response caches (`SharedCache`), short leases that let one worker
+    do a piece of upstream work while the others wait for its result, the download job table and the
+    Ollama hosts registered at runtime.
+    Connections are per thread. Nothing here is called on the event loop: a write can wait up to
+    SHARED_STATE_BUSY_TIMEOUT_SECONDS for another worker's lock regardless of table size. Cache and
+    lease calls go through `asyncio.to_thread`; the download scheduler uses its own database thread.
+    """
+
+    def __init__(self, path: Optional[str] = None, worker_id: Optional[str] = None):
+        self.path = path or default_shared_state_path()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Autocommit; multi-statement updates use `transaction()`
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                         timeout=settings.SHARED_STATE_BUSY_TIMEOUT_SECONDS)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(_SCHEMA)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction that takes the database lock up front, so read-then-write sequences are atomic."""
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def try_lease(self, name: str, ttl: float) -> bool:
+        """Takes (or renews) the named lease for `ttl` seconds. False while another worker holds it."""
+        now = time.time()
+        cursor = self.connection().execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at < ? OR leases.owner = excluded.owner",
+            (name, self.worker_id, now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, name: str) -> None:
+        self.connection().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.worker_id))
+
+    def cache(self, namespace: str) -> "SharedCache":
+        return SharedCache(self, namespace)
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class SharedCache:
+    """
+    One namespace of the cross-process cache. Keys are JSON-encoded (tuples become lists) and values
+    must be JSON-serializable. Entries carry their wall-clock store time so each worker can apply its
+    own TTL rules; rows past `expires_at` are purged from time to time by writers.
+    """
+
+    def __init__(self, store: SharedStore, namespace: str):
+        self.store = store
+        self.namespace = namespace
+        self.lease_seconds = settings.SHARED_CACHE_LEASE_SECONDS
+        self.poll_interval = settings.SHARED_CACHE_POLL_SECONDS
+        self._writes = 0
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"), default=str)
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        """Returns (stored_at, value) or None."""
+        row = self.store.connection().execute(
+            "SELECT stored_at, value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, self._key(key), time.time()),
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        now = time.time()
+        connection = self.store.connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, self._key(key), json.dumps(value, separators=(",", ":")), now, now + ttl),
+        )
+        self._writes += 1
+        if self._writes % 256 == 0:
+            connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def claim(self, key: Hashable) -> bool:
+        return self.store.try_lease(f"cache:{self.namespace}:{self._key(key)}", self.lease_seconds)
+
+    def release(self, key: Hashable) -> None:
+        self.store.release_lease(f"cache:{self.namespace}:{self._key(key)}")
+
+    async def aget(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: Hashable, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    async def aclaim(self, key: Hashable) -> bool:
+        return await asyncio.to_thread(self.claim, key)
+
+    async def arelease(self, key: Hashable) -> None:
+        await asyncio.to_thread(self.release, key)
+
+
+# None in single-worker mode, where all caches and job state stay in process memory
+shared_store: Optional[SharedStore] = SharedStore() if shared_state_enabled() else None
+
+
+def shared_cache(namespace: str) -> Optional[SharedCache]:
+    return shared_store.cache(namespace) if shared_store is not None else None
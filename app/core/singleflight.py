@@ -0,0 +1,50 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for `key` is in flight, further callers
+    with the same key await that call's result instead of starting their own.
+
+    Nothing is cached once the call finishes; this only collapses thundering herds (e.g. 200
+    clients hitting the landing page right as its cache entry expires) into one upstream request.
+    The shared call runs as its own task, so one caller being cancelled does not cancel it for
+    the others. Exceptions are shared with every waiter of that call.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0      # Total calls to `do`
+        self.executions = 0 # Calls that actually ran `fn`
+        self.coalesced = 0  # Calls that joined an in-flight execution
+        self.errors = 0     # Executions that raised
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._calls.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.get_running_loop().create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "coalesced_ratio": self.coalesced / self.calls if self.calls else 0.0,
+        }
@@ -0,0 +1,14 @@
+import json
+from typing import Any, Optional
+
+# Headers for text/event-stream responses. `X-Accel-Buffering: no` stops nginx-style
+# proxies from buffering the stream so events reach the browser as they are sent.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """Encodes one Server-Sent Event. `data` is JSON-encoded unless it is already a string."""
+    payload = data if isinstance(data, str) else json.dumps(data, separators=(",", ":"))
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,207 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache" # Cacheable, but revalidated with If-None-Match on every use
+
+# Text-like types worth compressing; images and icons are already compressed or tiny
+_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "image/x-icon",
+                       "image/vnd.microsoft.icon")
+# References in HTML that get rewritten to fingerprinted names
+_HTML_REFERENCE = re.compile(r'''(?P<attr>(?:href|src)=")(?P<path>[^"#?:]+)(?P<end>")''')
+
+
+@dataclass
+class StaticAsset:
+    path: str # URL path relative to the mount, e.g. "script.js"
+    content_type: str
+    digest: str # Hex SHA-256 of the identity body
+    bodies: Dict[str, bytes] = field(default_factory=dict) # Content-Encoding ("identity", "gzip", "br") -> body
+
+    @property
+    def fingerprinted_path(self) -> str:
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}.{self.digest[:10]}{ext}"
+
+    def etag(self, encoding: str) -> str:
+        # Strong validators must differ per encoding since the bytes differ
+        suffix = "" if encoding == "identity" else f"-{encoding}"
+        return f'"{self.digest[:20]}{suffix}"'
+
+
+class StaticAssetTable:
+    """
+    The frontend directory loaded once into memory, with gzip (and brotli, if installed)
+    variants computed up front and a content fingerprint per file.
+
+    Requests are answered from this table: no stat, open or read per request, and no
+    on-the-fly compression. Each file is reachable under its own name (revalidated via
+    strong ETag) and under `name.<fingerprint>.ext`, which is cached as immutable since
+    its content can never change. HTML pages reference the fingerprinted names, so
+    browsers only re-download script.js / style.css after they actually change.
+    """
+
+    def __init__(self, directory: str, gzip_level: Optional[int] = None, brotli_quality: Optional[int] = None,
+                 min_compress_bytes: Optional[int] = None):
+        self.directory = directory
+        self.gzip_level = gzip_level or settings.STATIC_GZIP_LEVEL
+        self.brotli_quality = brotli_quality or settings.STATIC_BROTLI_QUALITY
+        self.min_compress_bytes = min_compress_bytes if min_compress_bytes is not None else settings.STATIC_COMPRESS_MIN_BYTES
+        self.assets: Dict[str, StaticAsset] = {}
+        self.fingerprinted: Dict[str, StaticAsset] = {}
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(self.assets)
+
+    def load(self) -> "StaticAssetTable":
+        if not os.path.isdir(self.directory):
+            raise RuntimeError(f"Static frontend directory '{self.directory}' does not exist")
+        raw: Dict[str, bytes] = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                with open(full_path, "rb") as f:
+                    raw[os.path.relpath(full_path, self.directory).replace(os.sep, "/")] = f.read()
+
+        assets = {path: self._build(path, body) for path, body in raw.items() if not path.endswith(".html")}
+        # HTML is built last so it can point at the fingerprinted names of everything else
+        for path, body in raw.items():
+            if path.endswith(".html"):
+                assets[path] = self._build(path, self._rewrite_references(path, body, assets))
+
+        self.assets = assets
+        self.fingerprinted = {asset.fingerprinted_path: asset for asset in assets.values()}
+        return self
+
+    def lookup(self, path: str) -> Tuple[Optional[StaticAsset], bool]:
+        """Returns (asset, immutable) for a URL path relative to the mount."""
+        path = path.lstrip("/")
+        if path == "" or path.endswith("/"):
+            path += "index.html"
+        asset = self.fingerprinted.get(path)
+        if asset is not None:
+            return asset, True
+        return self.assets.get(path), False
+
+    def _build(self, path: str, body: bytes) -> StaticAsset:
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        asset = StaticAsset(path=path, content_type=content_type, digest=hashlib.sha256(body).hexdigest())
+        asset.bodies["identity"] = body
+        if len(body) >= self.min_compress_bytes and content_type.startswith(_COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0) # mtime=0 keeps the bytes reproducible
+            if len(compressed) < len(body):
+                asset.bodies["gzip"] = compressed
+            if BROTLI_AVAILABLE:
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+                if len(compressed) < len(body):
+                    asset.bodies["br"] = compressed
+        return asset
+
+    def _rewrite_references(self, html_path: str, body: bytes, assets: Dict[str, StaticAsset]) -> bytes:
+        base = os.path.dirname(html_path)
+
+        def replace(match: "re.Match") -> str:
+            reference = match.group("path")
+            target = os.path.normpath(os.path.join(base, reference)).replace(os.sep, "/")
+            asset = assets.get(target)
+            if asset is None:
+                return match.group(0)
+            stem, ext = os.path.splitext(reference)
+            return f"{match.group('attr')}{stem}.{asset.digest[:10]}{ext}{match.group('end')}"
+
+        return _HTML_REFERENCE.sub(replace, body.decode("utf-8")).encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available) -> str:
+    """Picks "br", "gzip" or "identity" from an Accept-Encoding header, honouring q-values (q=0 refuses)."""
+    if not accept_encoding:
+        return "identity"
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+    wildcard = weights.get("*", 0.0)
+    # Highest client weight wins; on a tie prefer brotli, then gzip (smaller bodies)
+    candidates = [
+        (weights.get(encoding, wildcard), preference, encoding)
+        for preference, encoding in ((2, "br"), (1, "gzip"))
+        if encoding in available and weights.get(encoding, wildcard) > 0
+    ]
+    return max(candidates)[2] if candidates else "identity"
+
+
+class StaticAssets:
+    """ASGI app serving a `StaticAssetTable`; a drop-in for `StaticFiles(directory=..., html=True)`."""
+
+    def __init__(self, directory: Optional[str] = None, table: Optional[StaticAssetTable] = None):
+        self.table = table or StaticAssetTable(directory or settings.STATIC_FRONTEND_DIRECTORY)
+
+    def load(self) -> None:
+        self.table.load()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        response = self.get_response(scope)
+        await response(scope, receive, send)
+
+    def get_response(self, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            return PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        if not self.table.is_loaded:
+            self.table.load() # Normally done at startup; this covers apps started without the lifespan
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        asset, immutable = self.table.lookup(path)
+        if asset is None:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding"), asset.bodies)
+        etag = asset.etag(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))):
+            return Response(status_code=304, headers=headers)
+
+        body = asset.bodies[encoding]
+        if scope["method"] == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=headers, media_type=asset.content_type)
+        return Response(content=body, headers=headers, media_type=asset.content_type)
@@ -1,15 +1,77 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.endpoints import hf_models as hf_models_router
 from app.api.endpoints import ollama as ollama_router # Added Ollama router import
+from app.api.endpoints import downloads as downloads_router
+from app.api.endpoints import metrics as metrics_router
+from app.api.endpoints import diagnostics as diagnostics_router
 from app.core.config import settings
+from app.core.config_store import config_store
+from app.core.diagnostics import loop_monitor
+from app.core.metrics import MetricsMiddleware
+from app.core.shared_store import shared_store
+from app.core.static_assets import StaticAssets
+from app.services.hub_client import hub_client
+from app.services.download_engine import download_engine
+from app.services.download_jobs import download_scheduler
+from app.services.model_store import model_store
+from app.services.ollama_fleet import ollama_fleet
+from app.services.ollama_pulls import ollama_pull_manager
+from app.services.ollama_clients import ollama_clients
+from app.services.model_catalog import model_catalog, run_catalog_sync_loop
+from app.services.model_suggest import model_suggester, run_suggest_refresh_loop
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Read, fingerprint and compress the frontend once, before the first request
+    static_frontend.load()
+    # Pick up settings changes written by other worker processes
+    background_tasks = [asyncio.create_task(config_store.watch())]
+    if settings.LOOP_MONITOR_ENABLED:
+        # Logs callbacks that block the loop longer than LOOP_STALL_THRESHOLD_SECONDS, with their stack
+        background_tasks.append(asyncio.create_task(loop_monitor.run()))
+    if settings.HF_CATALOG_ENABLED:
+        # Serve from the last snapshot right away; the sync loop refreshes it when it is missing or old.
+        model_catalog.load()
+        background_tasks.append(asyncio.create_task(run_catalog_sync_loop(model_catalog, store=shared_store)))
+    if download_scheduler.store is not None:
+        # Multi-worker mode: publish job progress, follow pause/cancel requests and run jobs queued by other workers
+        background_tasks.append(asyncio.create_task(download_scheduler.run_sync_loop()))
+    if ollama_fleet.store is not None:
+        # Multi-worker mode: pick up Ollama hosts registered or removed on other workers
+        background_tasks.append(asyncio.create_task(ollama_fleet.run_sync_loop()))
+    if settings.HF_SUGGEST_ENABLED:
+        # Build the search-as-you-type index in the background; /suggest reports `ready: false` until then
+        catalog = model_catalog if settings.HF_CATALOG_ENABLED else None
+        background_tasks.append(asyncio.create_task(run_suggest_refresh_loop(model_suggester, catalog)))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    # Running downloads go back to "queued"; their partial files let them resume later
+    await download_scheduler.shutdown()
+    await ollama_pull_manager.shutdown()
+    # Close pooled upstream connections on shutdown
+    await hub_client.aclose()
+    await download_engine.aclose()
+    await ollama_clients.aclose()
+    model_store.close()
+    if shared_store is not None:
+        shared_store.close()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Hugging Face Model Browser API",
     version="0.1.0",
-    description="API for browsing, searching, and (simulating) downloading Hugging Face models."
+    description="API for browsing, searching, and downloading Hugging Face models.",
+    lifespan=lifespan
 )
 
 # CORS (Cross-Origin Resource Sharing) Middleware
@@ -22,6 +84,11 @@ app.add_middleware(
     allow_headers=["*"], # Allows all headers.
 )
 
+# Per-route latency, status codes and in-flight requests for GET /metrics.
+# Added last so it is the outermost middleware and times everything below it.
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, router=app.router)
+
 # Include the Hugging Face models router
 # The prefix /api/v1/hf-models matches the frontend's expected base URL
 app.include_router(
@@ -30,6 +97,13 @@ app.include_router(
     tags=["Hugging Face Models"]
 )
 
+# Include the download jobs router
+app.include_router(
+    downloads_router.router,
+    prefix="/api/v1/downloads",
+    tags=["Downloads"]
+)
+
 # Include the Ollama router
 app.include_router(
     ollama_router.router,
@@ -37,11 +111,25 @@ app.include_router(
     tags=["Ollama Management"]
 )
 
+# Loop stall history and the on-demand sampling profiler
+app.include_router(
+    diagnostics_router.router,
+    prefix="/api/v1/diagnostics",
+    tags=["Diagnostics"]
+)
+
+# Prometheus scrape endpoint, at the conventional path outside /api/v1
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router.router, tags=["Metrics"])
+
 # Serve static frontend files (HTML, CSS, JS, Icons)
 # This must come AFTER API router inclusions to ensure API paths are prioritized.
-# The `html=True` argument makes it serve `index.html` for the root path ("/").
-# The `directory` path is absolute within the Docker container, based on WORKDIR and COPY instructions.
-app.mount("/", StaticFiles(directory="/app/static_frontend", html=True), name="static_root")
+# Files are served from memory, precompressed (gzip, plus brotli when installed), with strong ETags.
+# `index.html` is served for "/" and references fingerprinted `script.<hash>.js` / `style.<hash>.css`
+# URLs that are cached as immutable. The directory is STATIC_FRONTEND_DIRECTORY (absolute within
+# the Docker container, based on WORKDIR and COPY instructions).
+static_frontend = StaticAssets()
+app.mount("/", static_frontend, name="static_root")
 
 
 if __name__ == "__main__":
@@ -51,7 +139,7 @@ if __name__ == "__main__":
     # The host "0.0.0.0" makes it accessible on the network.
     # reload=True enables auto-reloading on code changes.
     print(f"Starting Uvicorn server. API will be at http://localhost:8000")
-    print(f"Default model download directory from settings: {settings.MODEL_DOWNLOAD_DIRECTORY}")
+    print(f"Model download directory from settings: {config_store.get('model_directory')}")
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
 
 # Note: The previous Tkinter application code has been removed from this file
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class DownloadJobRequest(BaseModel):
+    model_id: str = Field(..., description="Hugging Face repo ID, e.g. 'google/flan-t5-small'.")
+    revision: str = Field("main", description="Branch, tag or commit to download.")
+    priority: int = Field(0, description="Higher priorities start first.")
+
+
+class DownloadJobStatus(BaseModel):
+    job_id: str
+    model_id: str
+    revision: str
+    priority: int
+    state: str # "queued", "running", "paused", "completed", "failed" or "cancelled"
+    total_bytes: int
+    downloaded_bytes: int
+    files_total: int
+    files_completed: int
+    bytes_per_second: float
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    download_path: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
@@ -20,22 +20,46 @@ class HFModel(BaseModel):
 
 class HFModelResponse(BaseModel):
     items: List[HFModel]
-    total: int # In our current service, this is the count of items in the current batch, not the overall total available.
+    total: int = Field(..., description="Total number of matching models. Estimated from the pages seen so far unless the Hub reports a count.")
+    total_is_estimate: bool = Field(True, description="False when `total` is the exact count reported by the Hub.")
     page: int
     limit: int
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page; pass it back as `cursor`. Null on the last page.")
+    has_more: bool = Field(False, description="Whether another page follows this one.")
+
+
+class HFAuthorSuggestion(BaseModel):
+    author: str
+    downloads: int = Field(..., description="Total downloads of the author's indexed models.")
+    models: int = Field(..., description="Number of the author's models in the index.")
+
+
+class HFModelSuggestResponse(BaseModel):
+    query: str
+    ready: bool = Field(..., description="False until the suggest index has been built; items are empty meanwhile.")
+    items: List[HFModel] = Field(..., description="Models whose ID, name or author starts with the query, most downloaded first.")
+    authors: List[HFAuthorSuggestion] = Field(..., description="Authors starting with the query, by total downloads.")
+
+
+class HFModelBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, description="Model IDs to look up, e.g. ['gpt2', 'google/flan-t5-small'].")
 
 
 class HFModelDownloadStatus(BaseModel):
     message: str
     model_id: str = Field(..., alias="modelId") # Assuming frontend might expect modelId
     download_path: Optional[str] = Field(None, alias="downloadPath")
+    job_id: Optional[str] = Field(None, alias="jobId")
+    status: Optional[str] = None # State of the download job, e.g. "queued" or "running"
 
     class Config:
         populate_by_name = True # Allows using alias
         json_schema_extra = {
             "example": {
-                "message": "Download simulation started for gpt2. Check server logs.",
+                "message": "Download of gpt2 queued as job 3f2a9c1d7e4b.",
                 "modelId": "gpt2",
-                "downloadPath": "downloaded_models/gpt2"
+                "downloadPath": "downloaded_models/gpt2",
+                "jobId": "3f2a9c1d7e4b",
+                "status": "queued"
             }
         }
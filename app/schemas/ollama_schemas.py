@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl # HttpUrl for URL validation
-from typing import Optional, List # Added List
+from typing import Any, Dict, Optional, List # Added List
 
 class OllamaURL(BaseModel): # Helper for more specific URL validation
     # Using str for now as HttpUrl can be strict; service layer handles prepending http if needed.
@@ -30,12 +30,111 @@ class OllamaLocalModelInfo(BaseModel):
 
 class OllamaLocalModelsResponse(BaseModel):
     models: List[OllamaLocalModelInfo]
+    version: Optional[str] = None # Hash of the model names and digests; also sent as the ETag
+
+class OllamaLocalModelsDelta(BaseModel):
+    # Returned for ?since=<version> when that version is still known
+    version: str
+    since: str
+    added: List[OllamaLocalModelInfo]
+    removed: List[str] # Model names
+    changed: List[OllamaLocalModelInfo] # Same name, different digest
 
 class OllamaPullRequest(BaseModel):
     model_name: str
     # ollama_url is included here as per the plan to specify which Ollama instance to use for the pull.
-    ollama_url: str
+    # When omitted, the load-aware router picks one of the registered hosts (OLLAMA_HOSTS).
+    ollama_url: Optional[str] = None
+    # stream=True relays Ollama's progress as NDJSON (or SSE with `Accept: text/event-stream`).
+    stream: bool = False
+    # detach=True starts the pull in the background and returns a pull_id to poll or reattach to.
+    detach: bool = False
 
 class OllamaPullResponse(BaseModel):
     status: str  # e.g., "success", "failure", "pulling_started"
     message: str # Detailed message
+    pull_id: Optional[str] = None # Set for detached pulls
+    ollama_url: Optional[str] = None # Host the pull ran on (chosen by the router when not given)
+
+class OllamaPullLayer(BaseModel):
+    digest: str
+    total: int = 0
+    completed: int = 0
+
+class OllamaPullStatus(BaseModel):
+    pull_id: str
+    model_name: str
+    ollama_url: str
+    state: str # "running", "completed" or "failed"
+    status: Optional[str] = None # Last status line reported by Ollama
+    completed_bytes: int = 0
+    total_bytes: int = 0
+    layers: List[OllamaPullLayer] = []
+    error: Optional[str] = None
+    started_at: float
+    finished_at: Optional[float] = None
+
+
+# Fleet of named Ollama hosts
+
+class OllamaHost(BaseModel):
+    name: str
+    url: str
+
+class OllamaHostRegistration(BaseModel):
+    url: str
+
+class OllamaFleetHostStatus(BaseModel):
+    name: str
+    url: str
+    status: str # "ok", "error" or "timeout"
+    latency_ms: Optional[float] = None
+    model_count: int = 0
+    error: Optional[str] = None
+
+class OllamaFleetModel(BaseModel):
+    name: str
+    digest: Optional[str] = None
+    size: Optional[int] = None
+    hosts: List[str] # Names of the hosts that have this exact model (name and digest)
+
+class OllamaFleetInventory(BaseModel):
+    models: List[OllamaFleetModel]
+    hosts: List[OllamaFleetHostStatus]
+    partial: bool # True when at least one host failed or missed the deadline
+
+
+# Chat / generate proxy (streamed to the browser as Server-Sent Events)
+
+class OllamaChatMessage(BaseModel):
+    role: str # "system", "user" or "assistant"
+    content: str
+    images: Optional[List[str]] = None # Base64-encoded images for multimodal models
+
+class OllamaChatRequest(BaseModel):
+    ollama_url: Optional[str] = None # None lets the router pick a registered host
+    model: str
+    messages: List[OllamaChatMessage]
+    options: Optional[Dict[str, Any]] = None # Passed through to Ollama (temperature, num_ctx, ...)
+    keep_alive: Optional[str] = None
+
+class OllamaGenerateRequest(BaseModel):
+    ollama_url: Optional[str] = None
+    model: str
+    prompt: str
+    system: Optional[str] = None
+    options: Optional[Dict[str, Any]] = None
+    keep_alive: Optional[str] = None
+
+class OllamaRouterHostStatus(BaseModel):
+    name: str
+    url: str
+    in_flight: int
+    max_in_flight: int
+    served: int
+    ewma_latency_ms: Optional[float] = None
+    loaded_models: Optional[List[str]] = None # Last /api/ps answer, if still cached
+
+class OllamaRouterStatus(BaseModel):
+    hosts: List[OllamaRouterHostStatus]
+    queued: int # Requests waiting for a free slot
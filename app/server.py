@@ -0,0 +1,29 @@
+import argparse
+import os
+
+import uvicorn
+
+from app.core.config import settings
+
+
+def worker_count(workers: int) -> int:
+    """`0` means one worker per CPU core."""
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the API with one or more uvicorn worker processes.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WORKERS, help="Worker processes; 0 = one per CPU core (default: WORKERS).")
+    args = parser.parse_args(argv)
+
+    workers = worker_count(args.workers)
+    # Workers read WORKERS from the environment to decide whether caches and jobs go through the shared store
+    os.environ["WORKERS"] = str(workers)
+    print(f"Starting {workers} worker(s) on http://{args.host}:{args.port}")
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
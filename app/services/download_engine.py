@@ -0,0 +1,373 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import List, NamedTuple, Optional
+from urllib.parse import quote
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import track_upstream
+
+
+class DownloadError(Exception):
+    """Raised when a repository or file cannot be downloaded or fails verification."""
+
+
+class RepoFile(NamedTuple):
+    path: str               # Path inside the repo (the Hub's `rfilename`)
+    size: Optional[int]
+    sha256: Optional[str]   # Only known for LFS files
+
+
+class RepoRevision(NamedTuple):
+    commit: Optional[str]   # Commit SHA the revision resolved to
+    files: List[RepoFile]
+
+
+@dataclass
+class DownloadProgress:
+    """Live counters for one repo download. Updated in place by the engine; read by callers."""
+    total_bytes: int = 0
+    downloaded_bytes: int = 0
+    files_total: int = 0
+    files_completed: int = 0
+    current_files: List[str] = field(default_factory=list)
+
+
+class _PartialState:
+    """
+    Sidecar (`<file>.incomplete.json`) recording which byte ranges of a partial file are on disk,
+    so a restarted download only fetches the missing ranges.
+    """
+
+    def __init__(self, path: str, url: str, size: int, chunk_size: int):
+        self.path = path
+        self.url = url
+        self.size = size
+        self.chunk_size = chunk_size
+        self.done = set()
+        self._save_lock = threading.Lock() # Chunks finish concurrently and save from worker threads
+
+    @classmethod
+    def load(cls, path: str, url: str, size: int, chunk_size: int) -> "_PartialState":
+        state = cls(path, url, size, chunk_size)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("size") == size and data.get("chunk_size") == chunk_size:
+                state.done = set(data.get("done", []))
+        except (IOError, ValueError):
+            pass
+        return state
+
+    def save(self, done: List[int]) -> None:
+        """Writes `done` (a snapshot taken on the event loop, since `self.done` keeps changing there)."""
+        tmp_path = f"{self.path}.tmp"
+        with self._save_lock:
+            with open(tmp_path, "w") as f:
+                json.dump({"url": self.url, "size": self.size, "chunk_size": self.chunk_size, "done": done}, f)
+            os.replace(tmp_path, self.path)
+
+
+class _OrderedHasher:
+    """
+    SHA-256 over a file whose chunks complete out of order.
+    Chunks are hashed as soon as they extend the contiguous prefix, reading them back
+    (still in the page cache) in fixed-size buffers, so hashing overlaps the download.
+    """
+
+    def __init__(self, fd: int, chunk_size: int, chunk_count: int, size: int, buffer_size: int):
+        self.fd = fd
+        self.chunk_size = chunk_size
+        self.chunk_count = chunk_count
+        self.size = size
+        self.buffer_size = buffer_size
+        self.hasher = hashlib.sha256()
+        self.next_chunk = 0
+        self._lock = asyncio.Lock()
+
+    async def advance(self, done: set) -> None:
+        async with self._lock:
+            while self.next_chunk < self.chunk_count and self.next_chunk in done:
+                start = self.next_chunk * self.chunk_size
+                end = min(start + self.chunk_size, self.size)
+                await asyncio.to_thread(self._hash_range, start, end)
+                self.next_chunk += 1
+
+    def _hash_range(self, start: int, end: int) -> None:
+        offset = start
+        while offset < end:
+            data = os.pread(self.fd, min(self.buffer_size, end - offset), offset)
+            if not data:
+                raise DownloadError(f"Unexpected end of partial file at offset {offset}")
+            self.hasher.update(data)
+            offset += len(data)
+
+    def hexdigest(self) -> str:
+        return self.hasher.hexdigest()
+
+
+class DownloadEngine:
+    """
+    Downloads whole Hub repositories to disk.
+
+    Files above `DOWNLOAD_PARALLEL_THRESHOLD` are fetched with concurrent HTTP range
+    requests written in place with `os.pwrite`; smaller files (or servers without range
+    support) are streamed sequentially. Data always moves in `DOWNLOAD_BUFFER_SIZE` pieces,
+    is hashed while it is written, and partial files resume after restarts.
+    """
+
+    def __init__(self, endpoint: Optional[str] = None, token: Optional[str] = None):
+        self.endpoint = (endpoint or settings.HF_ENDPOINT).rstrip("/")
+        self.token = token if token is not None else settings.HF_TOKEN
+        self.chunk_size = settings.DOWNLOAD_CHUNK_SIZE
+        self.buffer_size = settings.DOWNLOAD_BUFFER_SIZE
+        self.parallel_threshold = settings.DOWNLOAD_PARALLEL_THRESHOLD
+        self.connections_per_file = settings.DOWNLOAD_CONNECTIONS_PER_FILE
+        self.max_concurrent_files = settings.DOWNLOAD_MAX_CONCURRENT_FILES
+        self.max_retries = settings.DOWNLOAD_MAX_RETRIES
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                follow_redirects=True, # resolve/ URLs redirect to the CDN; httpx drops Authorization cross-origin
+                timeout=httpx.Timeout(settings.DOWNLOAD_TIMEOUT_SECONDS, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=settings.DOWNLOAD_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.DOWNLOAD_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def file_url(self, repo_id: str, revision: str, path: str) -> str:
+        return f"{self.endpoint}/{repo_id}/resolve/{quote(revision, safe='')}/{quote(path)}"
+
+    async def list_repo_files(self, repo_id: str, revision: str = "main") -> List[RepoFile]:
+        return (await self.get_repo_revision(repo_id, revision)).files
+
+    async def get_repo_revision(self, repo_id: str, revision: str = "main") -> "RepoRevision":
+        """Resolves `revision` to a commit and lists the files (with sizes and LFS hashes) at that commit."""
+        url = f"{self.endpoint}/api/models/{repo_id}/revision/{quote(revision, safe='')}"
+        with track_upstream("hub_revision", httpx.URL(self.endpoint).host):
+            response = await self.client.get(url, params={"blobs": "true"})
+        if response.status_code in (401, 403, 404):
+            raise DownloadError(f"Repository '{repo_id}' (revision '{revision}') not found or not accessible (HTTP {response.status_code}).")
+        response.raise_for_status()
+
+        data = response.json()
+        files = []
+        for sibling in data.get("siblings", []):
+            lfs = sibling.get("lfs") or {}
+            files.append(RepoFile(
+                path=sibling["rfilename"],
+                size=lfs.get("size", sibling.get("size")),
+                sha256=lfs.get("sha256"),
+            ))
+        return RepoRevision(commit=data.get("sha"), files=files)
+
+    async def download_repo(self, repo_id: str, dest_dir: str, revision: str = "main",
+                            progress: Optional[DownloadProgress] = None) -> dict:
+        """
+        Downloads every file of `repo_id` at `revision` into `dest_dir`, keeping the repo layout.
+        Files already present with the expected size are skipped.
+        """
+        progress = progress or DownloadProgress()
+        files = await self.list_repo_files(repo_id, revision)
+        progress.files_total = len(files)
+        progress.total_bytes = sum(f.size or 0 for f in files)
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_files)
+        results = {}
+
+        async def fetch(repo_file: RepoFile):
+            async with semaphore:
+                dest_path = safe_join(dest_dir, repo_file.path)
+                progress.current_files.append(repo_file.path)
+                try:
+                    results[repo_file.path] = await self.download_file(
+                        self.file_url(repo_id, revision, repo_file.path), dest_path,
+                        size=repo_file.size, expected_sha256=repo_file.sha256, progress=progress,
+                    )
+                finally:
+                    progress.current_files.remove(repo_file.path)
+                progress.files_completed += 1
+
+        await gather_or_cancel([fetch(f) for f in files])
+        return {
+            "repo_id": repo_id,
+            "revision": revision,
+            "path": dest_dir,
+            "files": len(files),
+            "bytes": progress.total_bytes,
+            "sha256": results,
+        }
+
+    async def download_file(self, url: str, dest_path: str, size: Optional[int] = None,
+                            expected_sha256: Optional[str] = None,
+                            progress: Optional[DownloadProgress] = None) -> str:
+        """
+        Downloads `url` to `dest_path` and returns its SHA-256 hex digest. A file already at `dest_path`
+        with the expected size is kept if it also matches `expected_sha256` (when given); otherwise it is replaced.
+        """
+        progress = progress or DownloadProgress()
+        if size is not None and os.path.isfile(dest_path) and os.path.getsize(dest_path) == size:
+            digest = await asyncio.to_thread(hash_file, dest_path, self.buffer_size)
+            if not expected_sha256 or digest == expected_sha256.lower():
+                progress.downloaded_bytes += size
+                return digest
+
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        partial_path = f"{dest_path}.incomplete"
+
+        with track_upstream("hub_file_head", httpx.URL(url).host):
+            head = await self.client.head(url)
+            head.raise_for_status()
+        download_url = str(head.url) # Final (CDN) location, so range requests skip the redirect
+        if size is None and "content-length" in head.headers:
+            size = int(head.headers["content-length"])
+        accepts_ranges = head.headers.get("accept-ranges", "").lower() == "bytes"
+
+        if size is not None and size >= self.parallel_threshold and accepts_ranges:
+            digest = await self._download_ranges(download_url, partial_path, size, progress)
+        else:
+            digest = await self._download_stream(download_url, partial_path, accepts_ranges, progress)
+
+        if expected_sha256 and digest != expected_sha256.lower():
+            _remove_partial(partial_path)
+            raise DownloadError(f"SHA-256 mismatch for {url}: expected {expected_sha256}, got {digest}")
+        os.replace(partial_path, dest_path)
+        return digest
+
+    async def _download_stream(self, url: str, partial_path: str, accepts_ranges: bool,
+                               progress: DownloadProgress) -> str:
+        hasher = hashlib.sha256()
+        offset = os.path.getsize(partial_path) if accepts_ranges and os.path.exists(partial_path) else 0
+        if offset:
+            # Resume: re-hash what is already on disk, then append the rest
+            await asyncio.to_thread(hash_file, partial_path, self.buffer_size, hasher)
+            progress.downloaded_bytes += offset
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 416: # Partial file is already complete
+                return hasher.hexdigest()
+            response.raise_for_status()
+            if offset and response.status_code != 206:
+                offset = 0 # Server ignored the range; start over
+                hasher = hashlib.sha256()
+            with open(partial_path, "r+b" if offset else "wb") as f:
+                f.seek(offset)
+                async for data in response.aiter_bytes(self.buffer_size):
+                    hasher.update(data)
+                    await asyncio.to_thread(f.write, data)
+                    progress.downloaded_bytes += len(data)
+        return hasher.hexdigest()
+
+    async def _download_ranges(self, url: str, partial_path: str, size: int,
+                               progress: DownloadProgress) -> str:
+        chunk_count = (size + self.chunk_size - 1) // self.chunk_size
+        state = _PartialState.load(f"{partial_path}.json", url, size, self.chunk_size)
+        if not os.path.exists(partial_path):
+            state.done.clear()
+
+        fd = os.open(partial_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            hasher = _OrderedHasher(fd, self.chunk_size, chunk_count, size, self.buffer_size)
+            progress.downloaded_bytes += sum(min(self.chunk_size, size - i * self.chunk_size) for i in state.done)
+            await hasher.advance(state.done)
+
+            semaphore = asyncio.Semaphore(self.connections_per_file)
+
+            async def fetch_chunk(index: int):
+                async with semaphore:
+                    await self._fetch_range(url, fd, index * self.chunk_size,
+                                            min((index + 1) * self.chunk_size, size) - 1, progress)
+                state.done.add(index)
+                await asyncio.to_thread(state.save, sorted(state.done))
+                await hasher.advance(state.done)
+
+            # Let in-flight ranges finish when one fails so their progress is recorded for the resume
+            outcomes = await asyncio.gather(
+                *(fetch_chunk(i) for i in range(chunk_count) if i not in state.done), return_exceptions=True
+            )
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+            await hasher.advance(state.done)
+            digest = hasher.hexdigest()
+        finally:
+            os.close(fd)
+
+        os.remove(state.path)
+        return digest
+
+    async def _fetch_range(self, url: str, fd: int, start: int, end: int, progress: DownloadProgress) -> None:
+        offset = start
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.client.stream("GET", url, headers={"Range": f"bytes={offset}-{end}"}) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise DownloadError(f"Server ignored range request for {url} (HTTP {response.status_code})")
+                    async for data in response.aiter_bytes(self.buffer_size):
+                        await asyncio.to_thread(os.pwrite, fd, data, offset)
+                        offset += len(data)
+                        progress.downloaded_bytes += len(data)
+                if offset != end + 1:
+                    raise DownloadError(f"Short read for {url} bytes {start}-{end}")
+                return
+            except (httpx.TransportError, httpx.HTTPStatusError, DownloadError) as e:
+                if attempt == self.max_retries:
+                    raise DownloadError(f"Failed to download {url} bytes {start}-{end}: {e}") from e
+                await asyncio.sleep(min(2 ** attempt, 10)) # Retry only the bytes still missing
+
+
+async def gather_or_cancel(coroutines) -> None:
+    """Runs coroutines concurrently; on the first failure, cancels the rest and re-raises."""
+    tasks = [asyncio.ensure_future(c) for c in coroutines]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def hash_file(path: str, buffer_size: int, hasher=None) -> str:
+    hasher = hasher or hashlib.sha256()
+    with open(path, "rb") as f:
+        while data := f.read(buffer_size):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _remove_partial(partial_path: str) -> None:
+    for path in (partial_path, f"{partial_path}.json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def safe_join(base_dir: str, repo_path: str) -> str:
+    dest_path = os.path.normpath(os.path.join(base_dir, repo_path))
+    if os.path.commonpath([os.path.abspath(base_dir), os.path.abspath(dest_path)]) != os.path.abspath(base_dir):
+        raise DownloadError(f"Refusing to write outside the download directory: {repo_path}")
+    return dest_path
+
+
+# Shared engine for the API process; closed from the FastAPI lifespan in app.main.
+download_engine = DownloadEngine()
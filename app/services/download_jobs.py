@@ -0,0 +1,461 @@
+import asyncio
+import itertools
+import json
+import sqlite3
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.shared_store import SharedStore, shared_store
+from app.services.download_engine import DownloadProgress
+
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    PAUSED = "paused"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+ACTIVE_STATES = (JobState.QUEUED, JobState.RUNNING, JobState.PAUSED)
+TERMINAL_STATES = (JobState.COMPLETED, JobState.FAILED, JobState.CANCELLED)
+
+
+@dataclass
+class DownloadJob:
+    model_id: str
+    revision: str = "main"
+    priority: int = 0
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    state: JobState = JobState.QUEUED
+    progress: DownloadProgress = field(default_factory=DownloadProgress)
+    error: Optional[str] = None
+    download_path: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    sequence: int = 0 # FIFO tie-breaker between jobs of equal priority
+    _samples: deque = field(default_factory=lambda: deque(maxlen=20), repr=False)
+
+    def transfer_rate(self) -> Tuple[float, Optional[float]]:
+        """Returns (bytes/sec over the last few seconds, ETA in seconds or None)."""
+        now = time.monotonic()
+        downloaded = self.progress.downloaded_bytes
+        if not self._samples or now - self._samples[-1][0] >= 0.5:
+            self._samples.append((now, downloaded))
+        while len(self._samples) > 2 and now - self._samples[0][0] > 10:
+            self._samples.popleft()
+
+        first_time, first_bytes = self._samples[0]
+        elapsed = now - first_time
+        rate = (downloaded - first_bytes) / elapsed if elapsed > 0 else 0.0
+        if self.state != JobState.RUNNING:
+            rate = 0.0
+        remaining = max(self.progress.total_bytes - downloaded, 0)
+        eta = remaining / rate if rate > 0 else None
+        return rate, eta
+
+    def snapshot(self) -> dict:
+        rate, eta = self.transfer_rate()
+        return {
+            "job_id": self.job_id,
+            "model_id": self.model_id,
+            "revision": self.revision,
+            "priority": self.priority,
+            "state": self.state.value,
+            "total_bytes": self.progress.total_bytes,
+            "downloaded_bytes": self.progress.downloaded_bytes,
+            "files_total": self.progress.files_total,
+            "files_completed": self.progress.files_completed,
+            "bytes_per_second": round(rate, 1),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "error": self.error,
+            "download_path": self.download_path,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+JobRunner = Callable[[DownloadJob], Awaitable[dict]]
+
+
+async def _default_runner(job: DownloadJob) -> dict:
+    from app.services.huggingface_service import download_hf_model # Imported lazily to avoid a cycle
+    return await download_hf_model(job.model_id, revision=job.revision, progress=job.progress)
+
+
+class DownloadScheduler:
+    """
+    Runs model downloads as background jobs.
+
+    At most `max_concurrent` jobs run at once. Every job downloads from `HF_ENDPOINT`, so this is also the
+    limit per upstream. Queued jobs start in priority order (highest first, then FIFO). Submitting
+    a model/revision that is already queued, running or paused returns the existing job.
+    Pausing cancels the running task; the engine's partial files let `resume` pick up where it stopped.
+
+    With a `store` (multi-worker mode) the `download_jobs` table is the source of truth and the limits
+    apply across all workers. Workers claim queued jobs inside a write transaction, publish progress of
+    the jobs they run from `run_sync_loop`, and act on pause/cancel requests other workers record in the
+    job's `control` column. `self.jobs` then also holds read-only views of jobs running elsewhere. Jobs of
+    a worker that stops publishing for `DOWNLOAD_JOB_STALE_SECONDS` go back to the queue.
+    """
+
+    def __init__(self, runner: Optional[JobRunner] = None, max_concurrent: Optional[int] = None,
+                 history: Optional[int] = None,
+                 store: Optional[SharedStore] = None):
+        self.runner = runner or _default_runner
+        self.max_concurrent = max_concurrent or settings.DOWNLOAD_MAX_CONCURRENT_JOBS
+        self.history = history or settings.DOWNLOAD_JOB_HISTORY
+        self.store = store
+        self.jobs: Dict[str, DownloadJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Shared tables order jobs by submission time across workers; a local counter is enough otherwise
+        self._sequence = itertools.count() if store is None else iter(time.time_ns, None)
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="download-jobs-db") if store is not None else None
+
+    async def submit(self, model_id: str, revision: str = "main", priority: int = 0) -> Tuple[DownloadJob, bool]:
+        """Queues a download. Returns (job, created); `created` is False for a deduplicated request."""
+        if self.store is not None:
+            return await self._submit_shared(model_id, revision, priority)
+        for job in self.jobs.values():
+            if job.model_id == model_id and job.revision == revision and job.state in ACTIVE_STATES:
+                if priority > job.priority:
+                    job.priority = priority
+                    await self._dispatch()
+                return job, False
+
+        job = DownloadJob(model_id=model_id, revision=revision, priority=priority, sequence=next(self._sequence))
+        self.jobs[job.job_id] = job
+        await self._prune_history()
+        await self._dispatch()
+        return job, True
+
+    async def get(self, job_id: str) -> DownloadJob:
+        if self.store is not None:
+            await self._load_rows("WHERE job_id = ?", (job_id,))
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Download job '{job_id}' not found.")
+        return job
+
+    async def list(self) -> List[DownloadJob]:
+        if self.store is not None:
+            await self._load_rows(prune=True)
+        return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    async def cancel(self, job_id: str) -> DownloadJob:
+        job = await self.get(job_id)
+        if job.state in TERMINAL_STATES:
+            raise HTTPException(status_code=409, detail=f"Download job '{job_id}' is already {job.state.value}.")
+        await self._stop(job, JobState.CANCELLED)
+        return job
+
+    async def pause(self, job_id: str) -> DownloadJob:
+        job = await self.get(job_id)
+        if job.state not in (JobState.QUEUED, JobState.RUNNING):
+            raise HTTPException(status_code=409, detail=f"Download job '{job_id}' is {job.state.value} and cannot be paused.")
+        await self._stop(job, JobState.PAUSED)
+        return job
+
+    async def resume(self, job_id: str) -> DownloadJob:
+        job = await self.get(job_id)
+        if job.state not in (JobState.PAUSED, JobState.FAILED):
+            raise HTTPException(status_code=409, detail=f"Download job '{job_id}' is {job.state.value} and cannot be resumed.")
+        job.state = JobState.QUEUED
+        job.error = None
+        job.finished_at = None
+        job.sequence = next(self._sequence)
+        if self.store is not None:
+            await self._publish(job)
+        await self._dispatch()
+        return job
+
+    async def events(self, job_id: str, interval: Optional[float] = None) -> AsyncIterator[dict]:
+        """Yields job snapshots every `interval` seconds until the job reaches a terminal state."""
+        interval = interval or settings.DOWNLOAD_PROGRESS_INTERVAL_SECONDS
+        job = await self.get(job_id)
+        while True:
+            snapshot = job.snapshot()
+            yield snapshot
+            if job.state in TERMINAL_STATES:
+                return
+            await asyncio.sleep(interval)
+
+    async def run_sync_loop(self, interval: Optional[float] = None) -> None:
+        """
+        Background job started from the app lifespan in multi-worker mode: publishes progress of local
+        jobs, applies pause/cancel requests from other workers and starts jobs queued by them.
+        """
+        interval = interval or settings.DOWNLOAD_PROGRESS_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except sqlite3.Error as e:
+                print(f"Download job sync failed: {e}")
+
+    async def sync(self) -> None:
+        for job_id in list(self._tasks):
+            if job_id in self._tasks and not await self._publish(self.jobs[job_id], if_owned=True):
+                # Another worker requeued and took over the job while this one was unresponsive
+                task = self._tasks.pop(job_id, None)
+                if task is not None:
+                    task.cancel()
+        await self._load_rows(prune=True)
+        await self._dispatch()
+
+    async def shutdown(self) -> None:
+        """
+        Stops running tasks. Their jobs go back to `queued`; partial files are kept for resuming
+        (in multi-worker mode, another worker resumes them).
+        """
+        tasks = list(self._tasks.values())
+        for job_id in list(self._tasks):
+            self.jobs[job_id].state = JobState.QUEUED
+        self._tasks.clear()
+        if self.store is not None:
+            for task in tasks: # Let the runners stop before their jobs become claimable elsewhere
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for job in list(self.jobs.values()):
+                if job.state == JobState.QUEUED:
+                    await self._publish(job, if_owned=True)
+            await self._in_db(self.store.close) # The executor thread's connection
+            self._db_executor.shutdown(wait=False)
+            return
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _stop(self, job: DownloadJob, state: JobState) -> None:
+        if self.store is not None and job.job_id not in self._tasks and not await self._stop_shared(job, state):
+            return # Running in another worker; it stops the job once it sees the request
+        job.state = state
+        if state in TERMINAL_STATES:
+            job.finished_at = time.time()
+        task = self._tasks.pop(job.job_id, None)
+        if task is not None:
+            task.cancel()
+        if self.store is not None:
+            await self._publish(job)
+        await self._dispatch()
+
+    async def _dispatch(self) -> None:
+        if self.store is not None:
+            await self._dispatch_shared()
+            return
+        queued = sorted(
+            (job for job in self.jobs.values() if job.state == JobState.QUEUED),
+            key=lambda job: (-job.priority, job.sequence),
+        )
+        for job in queued:
+            if len(self._tasks) >= self.max_concurrent:
+                break
+            job.state = JobState.RUNNING
+            job.started_at = job.started_at or time.time()
+            self._tasks[job.job_id] = asyncio.get_running_loop().create_task(self._run(job))
+
+    async def _run(self, job: DownloadJob) -> None:
+        job.progress.downloaded_bytes = 0 # Re-counted by the engine, including bytes already on disk
+        job.progress.files_completed = 0
+        try:
+            result = await self.runner(job)
+            job.download_path = result.get("download_path")
+            job.state = JobState.COMPLETED
+        except asyncio.CancelledError:
+            return # Paused, cancelled or shutting down; `_stop` / `shutdown` already set the state
+        except HTTPException as e:
+            job.state = JobState.FAILED
+            job.error = str(e.detail)
+        except Exception as e:
+            print(f"Download job {job.job_id} for {job.model_id} failed: {e}")
+            job.state = JobState.FAILED
+            job.error = str(e)
+        job.finished_at = time.time()
+        self._tasks.pop(job.job_id, None)
+        if self.store is not None:
+            await self._publish(job)
+        await self._dispatch()
+
+    async def _prune_history(self) -> None:
+        if self.store is not None:
+            await self._in_db(
+                self._execute,
+                "DELETE FROM download_jobs WHERE job_id IN (SELECT job_id FROM download_jobs WHERE state IN (?, ?, ?) "
+                "ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                tuple(state.value for state in TERMINAL_STATES) + (self.history,),
+            )
+            return
+        finished = [job for job in self.jobs.values() if job.state in TERMINAL_STATES]
+        excess = len(finished) - self.history
+        if excess > 0:
+            for job in sorted(finished, key=lambda job: job.finished_at or 0)[:excess]:
+                del self.jobs[job.job_id]
+
+    # Shared job table (multi-worker mode)
+    #
+    # SQLite calls run on `_db_executor`, never on the event loop: a write transaction waits up to
+    # SHARED_STATE_BUSY_TIMEOUT_SECONDS for other workers' locks. The executor has a single thread so
+    # statements run in the order they were issued; a progress snapshot built before a job finished can
+    # then never overwrite the final state. The `_*_rows` methods run there and touch no job objects;
+    # statements are built on the loop (`_publish_statement`) and results are applied back on the loop.
+
+    def _in_db(self, function: Callable, *args) -> Awaitable:
+        return asyncio.get_running_loop().run_in_executor(self._db_executor, function, *args)
+
+    def _execute(self, sql: str, params: tuple) -> int:
+        return self.store.connection().execute(sql, params).rowcount
+
+    async def _submit_shared(self, model_id: str, revision: str, priority: int) -> Tuple[DownloadJob, bool]:
+        job = DownloadJob(model_id=model_id, revision=revision, priority=priority, sequence=next(self._sequence))
+        job_id, created = await self._in_db(
+            self._submit_rows, job.job_id, model_id, revision, priority, self._publish_statement(job)
+        )
+        if created:
+            self.jobs[job_id] = job
+        await self._load_rows("WHERE job_id = ?", (job_id,))
+        await self._prune_history()
+        await self._dispatch()
+        return self.jobs[job_id], created
+
+    def _submit_rows(self, job_id: str, model_id: str, revision: str, priority: int, insert: tuple) -> Tuple[str, bool]:
+        with self.store.transaction() as db:
+            row = db.execute(
+                f"SELECT job_id, priority FROM download_jobs WHERE model_id = ? AND revision = ? AND state IN ({_placeholders(ACTIVE_STATES)})",
+                (model_id, revision) + tuple(state.value for state in ACTIVE_STATES),
+            ).fetchone()
+            if row is not None:
+                if priority > row[1]:
+                    db.execute("UPDATE download_jobs SET priority = ? WHERE job_id = ?", (priority, row[0]))
+                return row[0], False
+            db.execute(*insert)
+            return job_id, True
+
+    async def _stop_shared(self, job: DownloadJob, state: JobState) -> bool:
+        """Records a stop of a job this worker does not run. Returns True if it can be applied right here."""
+        finished_at = job.finished_at
+        job.state = state # Shown until the owner's next published snapshot if it runs elsewhere
+        if state in TERMINAL_STATES:
+            job.finished_at = time.time()
+        applied = await self._in_db(self._stop_rows, job.job_id, state, self._publish_statement(job))
+        if not applied:
+            job.finished_at = finished_at
+        return applied
+
+    def _stop_rows(self, job_id: str, state: JobState, update: tuple) -> bool:
+        with self.store.transaction() as db:
+            row = db.execute("SELECT state, owner FROM download_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is not None and row[0] == JobState.RUNNING.value and row[1] != self.store.worker_id:
+                db.execute("UPDATE download_jobs SET control = ? WHERE job_id = ?", (state.value, job_id))
+                return False
+            # Still queued (nobody can claim it while this transaction holds the lock) or already stopped
+            db.execute(*update)
+        return True
+
+    async def _dispatch_shared(self) -> None:
+        claimed = await self._in_db(self._claim_rows)
+        if not claimed:
+            return
+
+        await self._load_rows(f"WHERE job_id IN ({_placeholders(claimed)})", tuple(claimed))
+        jobs = [self.jobs[job_id] for job_id in claimed]
+        for job in jobs:
+            job.started_at = job.started_at or time.time()
+            self._tasks[job.job_id] = asyncio.get_running_loop().create_task(self._run(job))
+        # Issued before any of the new tasks can publish, so the executor applies them first
+        statements = [self._publish_statement(job) for job in jobs]
+        await self._in_db(lambda: [self._execute(*statement) for statement in statements])
+
+    def _claim_rows(self) -> List[str]:
+        now = time.time()
+        claimed = []
+        with self.store.transaction() as db:
+            # Jobs of workers that stopped publishing (crashed or killed) go back to the queue
+            db.execute(
+                "UPDATE download_jobs SET state = ?, owner = NULL WHERE state = ? AND owner != ? AND updated_at < ?",
+                (JobState.QUEUED.value, JobState.RUNNING.value, self.store.worker_id, now - settings.DOWNLOAD_JOB_STALE_SECONDS),
+            )
+            running = db.execute(
+                "SELECT COUNT(*) FROM download_jobs WHERE state = ?", (JobState.RUNNING.value,)
+            ).fetchone()[0]
+            queued = db.execute(
+                "SELECT job_id FROM download_jobs WHERE state = ? ORDER BY priority DESC, sequence",
+                (JobState.QUEUED.value,),
+            ).fetchall()
+            for (job_id,) in queued:
+                if running >= self.max_concurrent:
+                    break
+                running += 1
+                db.execute(
+                    "UPDATE download_jobs SET state = ?, owner = ?, control = NULL, updated_at = ? WHERE job_id = ?",
+                    (JobState.RUNNING.value, self.store.worker_id, now, job_id),
+                )
+                claimed.append(job_id)
+        return claimed
+
+    async def _publish(self, job: DownloadJob, if_owned: bool = False) -> bool:
+        """Writes the job's state and snapshot; with `if_owned`, only while this worker still owns the row."""
+        return await self._in_db(self._execute, *self._publish_statement(job, if_owned)) > 0
+
+    def _publish_statement(self, job: DownloadJob, if_owned: bool = False) -> tuple:
+        """Upsert of the job's row. Leaves `control` alone unless the job stopped."""
+        owner = self.store.worker_id if job.job_id in self._tasks else None
+        clear_control = job.state != JobState.RUNNING
+        sql = (
+            "INSERT INTO download_jobs (job_id, model_id, revision, priority, state, sequence, owner, snapshot, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (job_id) DO UPDATE SET "
+            "priority = excluded.priority, state = excluded.state, sequence = excluded.sequence, owner = excluded.owner, "
+            "snapshot = excluded.snapshot, updated_at = excluded.updated_at"
+            + (", control = NULL" if clear_control else "")
+            + (" WHERE download_jobs.owner = ?" if if_owned else "")
+        )
+        params = (job.job_id, job.model_id, job.revision, job.priority, job.state.value, job.sequence,
+                  owner, json.dumps(job.snapshot()), time.time())
+        return sql, params + ((self.store.worker_id,) if if_owned else ())
+
+    async def _load_rows(self, where: str = "", params: tuple = (), prune: bool = False) -> None:
+        """Refreshes `self.jobs` from the shared table; applies stop requests to jobs running here."""
+        rows = await self._in_db(lambda: self.store.connection().execute(
+            f"SELECT job_id, sequence, state, control, snapshot FROM download_jobs {where}", params
+        ).fetchall())
+        seen = set()
+        for job_id, sequence, state, control, snapshot_json in rows:
+            seen.add(job_id)
+            job = self.jobs.get(job_id)
+            if job_id in self._tasks:
+                if control in (JobState.PAUSED.value, JobState.CANCELLED.value):
+                    await self._stop(job, JobState(control))
+                continue
+            snapshot = json.loads(snapshot_json)
+            if job is None:
+                job = self.jobs[job_id] = DownloadJob(model_id=snapshot["model_id"], job_id=job_id)
+            job.revision = snapshot["revision"]
+            job.priority = snapshot["priority"]
+            job.sequence = sequence
+            job.state = JobState(state)
+            job.progress.total_bytes = snapshot["total_bytes"]
+            job.progress.downloaded_bytes = snapshot["downloaded_bytes"]
+            job.progress.files_total = snapshot["files_total"]
+            job.progress.files_completed = snapshot["files_completed"]
+            for name in ("error", "download_path", "created_at", "started_at", "finished_at"):
+                setattr(job, name, snapshot[name])
+        if prune: # Pruned by another worker
+            for job_id in [job_id for job_id in self.jobs if job_id not in seen and job_id not in self._tasks]:
+                del self.jobs[job_id]
+
+
+def _placeholders(values) -> str:
+    return ", ".join("?" for _ in values)
+
+
+download_scheduler = DownloadScheduler(store=shared_store)
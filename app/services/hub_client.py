@@ -0,0 +1,129 @@
+import httpx
+from typing import List, NamedTuple, Optional
+from urllib.parse import quote
+from app.core.config import settings
+from app.core.metrics import track_upstream
+
+try:
+    import h2  # noqa: F401 - only needed so httpx can negotiate HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HubPage(NamedTuple):
+    items: List[dict]
+    next_cursor: Optional[str] # Opaque cursor from the `Link: <...>; rel="next"` header, None on the last page
+    total: Optional[int]       # From `X-Total-Count` when the Hub sends it
+
+
+class HubClient:
+    """
+    Asyncio client for the Hugging Face Hub REST API.
+
+    Replaces calls to the synchronous `huggingface_hub.list_models` iterator inside
+    `async def` handlers, which blocked the event loop for the full Hub round trip.
+    A single pooled `httpx.AsyncClient` is shared by all requests on the worker so
+    connections stay warm (keep-alive, HTTP/2 when `h2` is installed).
+    """
+
+    def __init__(self, endpoint: str = None, token: Optional[str] = None):
+        self.endpoint = (endpoint or settings.HF_ENDPOINT).rstrip("/")
+        self.token = token if token is not None else settings.HF_TOKEN
+        self.host = httpx.URL(self.endpoint).host # Label for upstream metrics
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.endpoint,
+                headers=headers,
+                http2=settings.HF_HUB_HTTP2 and HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(settings.HF_HUB_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=settings.HF_HUB_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HF_HUB_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def list_models(self, search: Optional[str] = None, sort: Optional[str] = None,
+                          direction: Optional[int] = None, limit: Optional[int] = None,
+                          full: bool = True) -> List[dict]:
+        """
+        Calls `GET /api/models` and returns the raw JSON model records of the first page.
+        Raises `httpx.HTTPStatusError` / `httpx.RequestError` on failure.
+        """
+        page = await self.list_models_page(search=search, sort=sort, direction=direction, limit=limit, full=full)
+        return page.items
+
+    async def list_models_page(self, search: Optional[str] = None, sort: Optional[str] = None,
+                               direction: Optional[int] = None, limit: Optional[int] = None,
+                               full: bool = True, cursor: Optional[str] = None,
+                               tags: Optional[List[str]] = None, pipeline_tag: Optional[str] = None) -> HubPage:
+        """
+        Fetches a single page of `GET /api/models`, optionally continuing from `cursor`.
+        The Hub paginates with a `Link` header; its `cursor` parameter is returned as `next_cursor`.
+        """
+        params = {}
+        if search:
+            params["search"] = search
+        if sort:
+            params["sort"] = sort
+        if direction is not None:
+            params["direction"] = direction
+        if limit is not None:
+            params["limit"] = limit
+        if full:
+            params["full"] = "true"
+        if cursor:
+            params["cursor"] = cursor
+        if pipeline_tag:
+            params["pipeline_tag"] = pipeline_tag
+        if tags:
+            params["filter"] = list(tags) # Repeated `filter=` params are AND-ed by the Hub
+
+        with track_upstream("hub_list", self.host):
+            response = await self.client.get("/api/models", params=params)
+            response.raise_for_status()
+        return HubPage(
+            items=response.json(),
+            next_cursor=_next_cursor(response),
+            total=_total_count(response),
+        )
+
+    async def get_model(self, model_id: str) -> dict:
+        """
+        Calls `GET /api/models/{model_id}` and returns the model's JSON record.
+        Raises `httpx.HTTPStatusError` (e.g. 404 for unknown or private repos) / `httpx.RequestError`.
+        """
+        with track_upstream("hub_model", self.host):
+            response = await self.client.get(f"/api/models/{quote(model_id, safe='/')}")
+            response.raise_for_status()
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _next_cursor(response: httpx.Response) -> Optional[str]:
+    next_url = response.links.get("next", {}).get("url")
+    if not next_url:
+        return None
+    return httpx.URL(next_url).params.get("cursor")
+
+
+def _total_count(response: httpx.Response) -> Optional[int]:
+    try:
+        return int(response.headers["X-Total-Count"])
+    except (KeyError, ValueError):
+        return None
+
+
+# Shared client for the process; closed from the FastAPI lifespan in app.main.
+hub_client = HubClient()
@@ -1,92 +1,331 @@
 # Full content for app/services/huggingface_service.py
+import asyncio
 import os
+import httpx
+from typing import AsyncIterator, List, Optional
 from fastapi import HTTPException
 from app.core.config import settings
-from huggingface_hub import list_models # Keep this
-from huggingface_hub.hf_api import ModelInfo # Keep this
-import datetime
+from app.core.config_store import config_store
+from app.core.cache import TTLCache
+from app.core.shared_store import shared_cache
+from app.core.singleflight import SingleFlight
+from app.services.hub_client import hub_client
+from app.services.model_catalog import model_catalog
+from app.services.download_engine import DownloadError, DownloadProgress, download_engine
+from app.services.model_store import model_store
 
-async def get_hf_models(search: str = None, limit: int = 10, page: int = 1, sort_by: str = 'downloads', direction: str = 'desc') -> dict:
+# Listing responses keyed by the normalized query. Identical pages (e.g. debounced
+# keystrokes from the frontend search box) are served from memory instead of the Hub.
+hf_models_cache = TTLCache(
+    maxsize=settings.HF_MODELS_CACHE_MAX_ENTRIES,
+    ttl=settings.HF_MODELS_CACHE_TTL_SECONDS,
+    stale_ttl=settings.HF_MODELS_CACHE_STALE_SECONDS,
+    shared=shared_cache("hf_models"), # Shared by all workers in multi-worker mode
+)
+
+# Hub pagination cursors, keyed by (search, sort, direction, limit, page). Lets page N be
+# fetched with a single upstream request once the pages before it have been seen.
+# The reverse entries, keyed by (search, sort, direction, limit, "cursor", cursor), give the page
+# a cursor we handed out starts, so requests that pass `cursor` know where they are.
+page_cursor_cache = TTLCache(
+    maxsize=settings.HF_PAGE_CURSOR_CACHE_MAX_ENTRIES,
+    ttl=settings.HF_PAGE_CURSOR_CACHE_TTL_SECONDS,
+    shared=shared_cache("hf_page_cursors"),
+)
+
+# Single-model metadata for batch lookups; short-lived so watch lists re-checked in a loop stay cheap
+hf_model_info_cache = TTLCache(
+    maxsize=settings.HF_MODEL_INFO_CACHE_MAX_ENTRIES,
+    ttl=settings.HF_MODEL_INFO_CACHE_TTL_SECONDS,
+    shared=shared_cache("hf_model_info"),
+)
+hf_model_info_flight = SingleFlight("hf_model_info")
+
+# Concurrent identical listing requests that miss the cache share one Hub request (or catalog query)
+hf_models_flight = SingleFlight("hf_models")
+
+def _normalize_list_query(search: str, limit: int, page: int, sort_by: str, direction: str,
+                          tags: list = None, pipeline_tag: str = None) -> tuple:
+    search_term = search.strip().lower() if search and search.strip() else None # Hub search is case-insensitive
+    sort_field = sort_by if sort_by in ['downloads', 'likes', 'lastModified'] else 'lastModified'
+    sort_direction = -1 if direction == 'desc' else 1
+    tag_filter = tuple(sorted({tag.strip() for tag in tags or [] if tag and tag.strip()}))
+    pipeline_filter = pipeline_tag.strip() if pipeline_tag and pipeline_tag.strip() else None
+    return (search_term, sort_field, sort_direction, page, limit, tag_filter, pipeline_filter)
+
+async def get_hf_models(search: str = None, limit: int = 10, page: int = 1, sort_by: str = 'downloads', direction: str = 'desc',
+                        cursor: str = None, tags: list = None, pipeline_tag: str = None) -> dict:
+    """
+    Returns one page of Hub models.
+    With the local catalog enabled and synced, the page is answered from the SQLite snapshot.
+    Otherwise it is served from `hf_models_cache` when possible; stale pages are returned
+    immediately while a background task refreshes them.
+    `cursor` is the `next_cursor` of a previous response; when given it takes precedence over `page` lookups.
+    """
+    query = _normalize_list_query(search, limit, page, sort_by, direction, tags, pipeline_tag)
+    if settings.HF_CATALOG_ENABLED and model_catalog.is_ready and cursor is None:
+        return await hf_models_flight.do(("catalog",) + query, lambda: _query_catalog(*query))
+    return await hf_models_cache.get_or_fetch(
+        query + (cursor,),
+        lambda: hf_models_flight.do(("hub",) + query + (cursor,), lambda: _fetch_hf_models(*query, cursor=cursor)),
+    )
+
+async def _query_catalog(search_term, sort_field: str, sort_direction: int, page: int, limit: int, tag_filter: tuple, pipeline_filter) -> dict:
     try:
-        sort_field = sort_by if sort_by in ['downloads', 'likes', 'lastModified'] else 'lastModified'
-        sort_direction = -1 if direction == 'desc' else 1
-
-        # The fetch_api_limit logic was changed in the prompt compared to previous version.
-        # Previous was: api_fetch_limit = page * limit
-        # New prompt for this step has: fetch_api_limit = min((page + 1) * limit, 200)
-        # This change makes sense to potentially fetch one page ahead for 'total' calculation or lookahead.
-        # Let's stick to what's in the prompt for this step.
-        fetch_api_limit = min((page + 1) * limit, 200)
-
-        search_term_for_api = search if search and search.strip() else None
-
-        model_infos_iterator = list_models(
-            search=search_term_for_api, # MODIFIED: direct search string
-            sort=sort_field,
-            direction=sort_direction,
-            limit=fetch_api_limit,
-            full=True,
-            cardData=False
+        result = await model_catalog.aquery(
+            search=search_term, sort_field=sort_field, sort_direction=sort_direction,
+            page=page, limit=limit, tags=list(tag_filter), pipeline_tag=pipeline_filter
+        )
+    except Exception as e:
+        print(f"Error querying local model catalog: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error querying local model catalog: {str(e)}")
+
+    has_more = page * limit < result["total"]
+    return {
+        "items": result["items"],
+        "total": result["total"],
+        "total_is_estimate": False,
+        "page": page,
+        "limit": limit,
+        "next_cursor": None, # Local pages are addressed by `page`; cursors only exist for Hub pagination
+        "has_more": has_more
+    }
+
+async def iter_hf_model_pages(search: str = None, sort_by: str = 'downloads', direction: str = 'desc', tags: list = None,
+                              pipeline_tag: str = None, max_results: Optional[int] = None,
+                              page_size: Optional[int] = None) -> AsyncIterator[List[dict]]:
+    """
+    Yields the whole listing for a query as successive pages of `HFModel`-shaped dicts, with the same filters and
+    sort as `get_hf_models`, stopping after `max_results` models. Bypasses the listing cache: exports are read once.
+    From the Hub, the next page is requested while the caller handles the current one, so at most two pages
+    are held in memory; from the local catalog, pages are read one keyset query at a time from a single snapshot.
+    Hub errors propagate as `httpx` exceptions.
+    """
+    page_size = page_size or settings.HF_EXPORT_PAGE_SIZE
+    if max_results is not None:
+        page_size = min(page_size, max_results)
+    search_term, sort_field, sort_direction, _, limit, tag_filter, pipeline_filter = _normalize_list_query(
+        search, page_size, 1, sort_by, direction, tags, pipeline_tag
+    )
+    remaining = max_results
+
+    if settings.HF_CATALOG_ENABLED and model_catalog.is_ready:
+        pages = model_catalog.iter_pages(
+            search=search_term, sort_field=sort_field, sort_direction=sort_direction,
+            limit=limit, tags=list(tag_filter), pipeline_tag=pipeline_filter
         )
+        try:
+            while remaining is None or remaining > 0:
+                items = await asyncio.to_thread(next, pages, None)
+                if items is None:
+                    return
+                if remaining is not None:
+                    items = items[:remaining]
+                    remaining -= len(items)
+                yield items
+        finally:
+            await asyncio.to_thread(pages.close)
+        return
 
-        all_models_fetched_from_api = list(model_infos_iterator)
-
-        start_index = (page - 1) * limit
-        end_index = start_index + limit
-        models_for_current_page = all_models_fetched_from_api[start_index:end_index]
-
-        transformed_models = []
-        for model_info in models_for_current_page:
-            if isinstance(model_info, ModelInfo):
-                tags_list = model_info.tags if model_info.tags else []
-                processed_tags = [str(tag) for tag in tags_list if isinstance(tag, (str, int, float))]
-
-                transformed_models.append({
-                    "id": model_info.modelId,
-                    "name": model_info.modelId,
-                    "creator": model_info.author,
-                    "private": model_info.private,
-                    "downloads": model_info.downloads,
-                    "likes": model_info.likes,
-                    "lastModified": model_info.lastModified.isoformat() if isinstance(model_info.lastModified, datetime.datetime) else str(model_info.lastModified),
-                    "tags": processed_tags,
-                    "description": model_info.pipeline_tag,
-                    "iconUrl": None
-                })
-
-        # The 'total' field in the response.
-        # Based on the prompt: "total: int (Reflecting the count of items in the current response, as per service)"
-        # However, previous service had: "total": len(all_models_fetched_from_api)
-        # The prompt for THIS step says: current_page_item_count = len(transformed_models)
-        # and then "total": current_page_item_count
-        # This means 'total' will be at most 'limit'. This is a change from the previous step's logic for 'total'.
-        # I will follow the prompt for *this specific subtask*.
-        current_page_item_count = len(transformed_models)
+    def fetch(cursor):
+        return asyncio.ensure_future(hub_client.list_models_page(
+            search=search_term, sort=sort_field, direction=sort_direction, limit=limit, full=True,
+            cursor=cursor, tags=list(tag_filter), pipeline_tag=pipeline_filter
+        ))
+
+    pending = fetch(None)
+    try:
+        while pending is not None:
+            hub_page = await pending
+            more_wanted = remaining is None or remaining > len(hub_page.items)
+            pending = fetch(hub_page.next_cursor) if hub_page.next_cursor and more_wanted else None
+            items = [transform_hub_model(model_data) for model_data in hub_page.items if isinstance(model_data, dict)]
+            if remaining is not None:
+                items = items[:remaining]
+                remaining -= len(items)
+            if items:
+                yield items
+    finally:
+        if pending is not None:
+            pending.cancel() # The consumer stopped early (e.g. the client disconnected)
+
+def get_hf_models_cache_stats() -> dict:
+    return {**hf_models_cache.stats(), "singleflight": hf_models_flight.stats()}
+
+def transform_hub_model(model_data: dict) -> dict:
+    """Maps a raw Hub `/api/models` record onto the `HFModel` schema fields."""
+    model_id = model_data.get("id") or model_data.get("modelId")
+    tags_list = model_data.get("tags") or []
+    processed_tags = [str(tag) for tag in tags_list if isinstance(tag, (str, int, float))]
+    last_modified = model_data.get("lastModified")
+
+    return {
+        "id": model_id,
+        "name": model_id,
+        "creator": model_data.get("author"),
+        "private": model_data.get("private"),
+        "downloads": model_data.get("downloads"),
+        "likes": model_data.get("likes"),
+        "lastModified": str(last_modified) if last_modified is not None else None,
+        "tags": processed_tags,
+        "description": model_data.get("pipeline_tag"),
+        "iconUrl": None
+    }
+
+async def _resolve_page_cursor(search_term, sort_field: str, sort_direction: int, page: int, limit: int,
+                               tag_filter: tuple = (), pipeline_filter: str = None):
+    """
+    Returns the Hub cursor that starts `page` (None for page 1).
+    When the cursor is not cached yet, walks forward from the closest known page,
+    one upstream request of `limit` items per step.
+    """
+    query = (search_term, sort_field, sort_direction, limit, tag_filter, pipeline_filter)
+    known_page = page
+    while known_page > 1 and await page_cursor_cache.aget(query + (known_page,)) is None:
+        known_page -= 1
+
+    cursor = await page_cursor_cache.aget(query + (known_page,)) if known_page > 1 else None
+    while known_page < page:
+        hub_page = await hub_client.list_models_page(
+            search=search_term, sort=sort_field, direction=sort_direction, limit=limit, cursor=cursor,
+            tags=list(tag_filter), pipeline_tag=pipeline_filter
+        )
+        if hub_page.next_cursor is None:
+            return None, False # The listing ends before the requested page
+        known_page += 1
+        cursor = hub_page.next_cursor
+        await page_cursor_cache.aset(query + (known_page,), cursor)
+        await page_cursor_cache.aset(query + ("cursor", cursor), known_page)
+    return cursor, True
+
+async def _fetch_hf_models(search_term_for_api, sort_field: str, sort_direction: int, page: int, limit: int,
+                           tag_filter: tuple = (), pipeline_filter: str = None, cursor: str = None) -> dict:
+    try:
+        # Follow the Hub's cursor pagination so page N costs one upstream request of `limit` items
+        # instead of downloading (page + 1) * limit records and slicing them locally.
+        query = (search_term_for_api, sort_field, sort_direction, limit, tag_filter, pipeline_filter)
+        page_exists = True
+        # The page number is only known for page lookups and for cursors we issued; `page` sent
+        # next to any other cursor is the caller's guess and must not be cached.
+        known_page = page
+        if cursor is not None:
+            known_page = await page_cursor_cache.aget(query + ("cursor", cursor))
+        if cursor is None and page > 1:
+            cursor, page_exists = await _resolve_page_cursor(
+                search_term_for_api, sort_field, sort_direction, page, limit, tag_filter, pipeline_filter
+            )
+
+        if not page_exists:
+            models_for_current_page, next_cursor, upstream_total = [], None, None
+        else:
+            hub_page = await hub_client.list_models_page(
+                search=search_term_for_api,
+                sort=sort_field,
+                direction=sort_direction,
+                limit=limit,
+                full=True,
+                cursor=cursor,
+                tags=list(tag_filter),
+                pipeline_tag=pipeline_filter
+            )
+            models_for_current_page, next_cursor, upstream_total = hub_page.items, hub_page.next_cursor, hub_page.total
+            if next_cursor and known_page is not None:
+                await page_cursor_cache.aset(query + (known_page + 1,), next_cursor)
+                await page_cursor_cache.aset(query + ("cursor", next_cursor), known_page + 1)
+
+        transformed_models = [
+            transform_hub_model(model_data) for model_data in models_for_current_page
+            if isinstance(model_data, dict)
+        ]
+
+        # 'total' is the Hub's own count when it sends one. Otherwise it is estimated from
+        # what we have seen so far: every earlier page was full, plus one more if a next page exists.
+        # After an unknown cursor the earlier pages cannot be counted, so this page is a lower bound.
+        if upstream_total is not None:
+            total, total_is_estimate = upstream_total, False
+        else:
+            earlier = (known_page - 1) * limit if known_page is not None else 0
+            total = earlier + len(transformed_models) + (1 if next_cursor else 0)
+            total_is_estimate = next_cursor is not None or not page_exists or known_page is None
 
         return {
             "items": transformed_models,
-            "total": current_page_item_count,
-            "page": page,
-            "limit": limit
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "page": known_page or page,
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
         }
     except Exception as e:
         print(f"Error in get_hf_models (direct search): {str(e)}")
         # import traceback; traceback.print_exc();
         raise HTTPException(status_code=500, detail=f"Error processing Hugging Face models: {str(e)}")
 
-async def download_hf_model(model_id: str) -> dict: # This function remains unchanged
-    download_dir = settings.MODEL_DOWNLOAD_DIRECTORY
+async def get_hf_model_info(model_id: str) -> dict:
+    """
+    Metadata of one model, shaped like `HFModel`. Served from `hf_model_info_cache` when recently fetched;
+    concurrent lookups of the same ID share one Hub request. Hub errors propagate as `httpx` exceptions.
+    """
+    async def fetch():
+        return transform_hub_model(await hub_client.get_model(model_id))
+    return await hf_model_info_cache.get_or_fetch(model_id, lambda: hf_model_info_flight.do(model_id, fetch))
+
+async def iter_hf_model_batch(model_ids: List[str], concurrency: Optional[int] = None) -> AsyncIterator[dict]:
+    """
+    Looks up many model IDs concurrently (at most `concurrency` Hub requests at a time) and yields
+    `{"id", "model"}` or `{"id", "error": {"status", "detail"}}` per ID as soon as each finishes,
+    so one bad ID never fails the batch. Duplicate IDs are looked up once.
+    Pending lookups are cancelled if the consumer stops early (e.g. the client disconnects).
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.HF_BATCH_CONCURRENCY)
+
+    async def lookup(model_id: str) -> dict:
+        async with semaphore:
+            try:
+                return {"id": model_id, "model": await get_hf_model_info(model_id)}
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                detail = "Model not found on the Hugging Face Hub (or it is private)." if status in (401, 404) else f"Hub returned HTTP {status}."
+                return {"id": model_id, "error": {"status": 404 if status == 401 else status, "detail": detail}}
+            except httpx.RequestError as e:
+                return {"id": model_id, "error": {"status": 502, "detail": f"Could not reach the Hugging Face Hub: {str(e)}"}}
+            except Exception as e:
+                print(f"Unexpected error looking up {model_id} on the Hub: {str(e)}")
+                return {"id": model_id, "error": {"status": 500, "detail": f"Unexpected error: {str(e)}"}}
+
+    tasks = [asyncio.ensure_future(lookup(model_id)) for model_id in dict.fromkeys(model_ids)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def model_download_path(model_id: str, revision: str = "main") -> str:
+    return model_store.snapshot_path(model_id, revision)
+
+async def download_hf_model(model_id: str, revision: str = "main", progress: DownloadProgress = None) -> dict:
+    download_dir = config_store.get("model_directory") # Same setting app.utils.download_model uses
     try:
         os.makedirs(download_dir, exist_ok=True)
     except OSError as e:
         print(f"Error creating directory {download_dir}: {e}")
         raise HTTPException(status_code=500, detail=f"Could not create download directory: {str(e)}")
 
-    simulated_file_path = os.path.join(download_dir, model_id.replace("/", "__"))
-    print(f"Simulating download of model {model_id} to {simulated_file_path}")
+    try:
+        # Files land in the content-addressed store; the model directory links to them
+        result = await model_store.download_repo(download_engine, model_id, revision=revision, progress=progress)
+    except DownloadError as e:
+        print(f"Error downloading model {model_id}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    except httpx.HTTPError as e:
+        print(f"HTTP error downloading model {model_id}: {e}")
+        raise HTTPException(status_code=502, detail=f"Error downloading model {model_id}: {str(e)}")
 
+    reused = f", {result['reused_bytes']} bytes already in the store" if result["reused_bytes"] else ""
     return {
-        "message": f"Download simulation for model {model_id} has been logged on the server.",
+        "message": f"Downloaded {result['files']} files ({result['bytes']} bytes{reused}) of model {model_id}.",
         "model_id": model_id,
-        "download_path": simulated_file_path
+        "download_path": result["path"]
     }
@@ -0,0 +1,403 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.config_store import config_store
+from app.core.shared_store import SharedStore
+from app.services.hub_client import HubClient, hub_client
+
+SORT_COLUMNS = {"downloads": "downloads", "likes": "likes", "lastModified": "last_modified"}
+
+_SCHEMA = """
+CREATE TABLE models (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    author TEXT,
+    pipeline_tag TEXT,
+    tags TEXT NOT NULL,
+    downloads INTEGER NOT NULL DEFAULT 0,
+    likes INTEGER NOT NULL DEFAULT 0,
+    last_modified TEXT,
+    private INTEGER
+);
+CREATE TABLE model_tags (
+    tag TEXT NOT NULL,
+    model_rowid INTEGER NOT NULL,
+    PRIMARY KEY (tag, model_rowid)
+) WITHOUT ROWID;
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_INDEXES = """
+CREATE INDEX idx_models_downloads ON models (downloads);
+CREATE INDEX idx_models_likes ON models (likes);
+CREATE INDEX idx_models_last_modified ON models (last_modified);
+CREATE INDEX idx_models_pipeline_tag ON models (pipeline_tag, downloads);
+CREATE VIRTUAL TABLE models_fts USING fts5(id, content='models', content_rowid='rowid', tokenize='trigram');
+INSERT INTO models_fts (models_fts) VALUES ('rebuild');
+"""
+
+
+_ITEM_COLUMNS = "id, author, pipeline_tag, tags, downloads, likes, last_modified, private"
+
+
+def _item(row: tuple) -> dict:
+    model_id, author, pipeline, tags_json, downloads, likes, last_modified, private = row
+    return {
+        "id": model_id,
+        "name": model_id,
+        "creator": author,
+        "private": bool(private) if private is not None else None,
+        "downloads": downloads,
+        "likes": likes,
+        "lastModified": last_modified,
+        "tags": json.loads(tags_json),
+        "description": pipeline,
+        "iconUrl": None
+    }
+
+
+def _after_key(column: str, descending: bool, key, rowid: int) -> tuple:
+    """SQL condition for rows after (key, rowid) in `ORDER BY column [DESC], rowid`; NULL keys sort first ascending."""
+    if key is None:
+        if descending:
+            return f"({column} IS NULL AND rowid > ?)", [rowid]
+        return f"({column} IS NOT NULL OR rowid > ?)", [rowid]
+    if descending:
+        return f"({column} < ? OR ({column} = ? AND rowid > ?) OR {column} IS NULL)", [key, key, rowid]
+    return f"({column} > ? OR ({column} = ? AND rowid > ?))", [key, key, rowid]
+
+
+def default_catalog_path() -> str:
+    return settings.HF_CATALOG_PATH or os.path.join(config_store.get("model_directory"), ".catalog", "hf_models.sqlite3")
+
+
+class ModelCatalog:
+    """
+    Local, read-only snapshot of Hub model metadata stored in SQLite.
+
+    Search uses an FTS5 trigram index (substring match, like the Hub's own search),
+    sorting uses plain column indexes and tag filters use the `model_tags` table.
+    Snapshots are built into a temporary file by `sync_catalog` and swapped in with
+    `os.replace`, so readers never see a half-written catalog. Read connections are
+    per-thread and memory-mapped.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_catalog_path()
+        self._generation = 0
+        self._local = threading.local()
+        self._ready = False
+        self.synced_at: Optional[float] = None
+        self.model_count = 0
+        self.sync_in_progress = False
+        self.last_sync_error: Optional[str] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._file_signature = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def load(self) -> bool:
+        """(Re)opens the snapshot at `self.path`. Returns False when there is no usable snapshot yet."""
+        if not os.path.exists(self.path):
+            self._ready = False
+            return False
+        self._generation += 1 # Existing per-thread connections still point at the old file; reopen them lazily
+        self._file_signature = _file_signature(self.path)
+        try:
+            meta = dict(self._connection().execute("SELECT key, value FROM meta").fetchall())
+        except sqlite3.Error as e:
+            print(f"Could not load model catalog snapshot {self.path}: {e}")
+            self._ready = False
+            return False
+        self.synced_at = float(meta["synced_at"]) if "synced_at" in meta else None
+        self.model_count = int(meta.get("model_count", 0))
+        self._ready = True
+        return True
+
+    def reload_if_changed(self) -> bool:
+        """Loads the snapshot again if another process swapped in a new file since the last load."""
+        if _file_signature(self.path) in (None, self._file_signature):
+            return False
+        return self.load()
+
+    def _connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            if getattr(local, "connection", None) is not None:
+                local.connection.close()
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            connection.execute(f"PRAGMA mmap_size={settings.HF_CATALOG_MMAP_BYTES}")
+            local.connection = connection
+            local.generation = self._generation
+        return local.connection
+
+    def _filters(self, search: Optional[str], tags: Optional[List[str]], pipeline_tag: Optional[str]) -> tuple:
+        where, params = [], []
+        if search:
+            if len(search) >= 3:
+                # Trigram FTS gives case-insensitive substring matching; quote as an FTS5 string
+                where.append("rowid IN (SELECT rowid FROM models_fts WHERE models_fts MATCH ?)")
+                params.append('"' + search.replace('"', '""') + '"')
+            else:
+                where.append("id LIKE ? ESCAPE '\\'")
+                escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.append(f"%{escaped}%")
+        if pipeline_tag:
+            where.append("pipeline_tag = ?")
+            params.append(pipeline_tag)
+        for tag in tags or []:
+            where.append("rowid IN (SELECT model_rowid FROM model_tags WHERE tag = ?)")
+            params.append(tag)
+        return where, params
+
+    def query(self, search: Optional[str] = None, sort_field: str = "downloads", sort_direction: int = -1,
+              page: int = 1, limit: int = 10, tags: Optional[List[str]] = None,
+              pipeline_tag: Optional[str] = None) -> dict:
+        """Returns `{"items": [...], "total": n}` with items already shaped like `HFModel`."""
+        where, params = self._filters(search, tags, pipeline_tag)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        order_column = SORT_COLUMNS.get(sort_field, "last_modified")
+        order_sql = f"ORDER BY {order_column} {'DESC' if sort_direction == -1 else 'ASC'}, rowid"
+
+        connection = self._connection()
+        total = connection.execute(f"SELECT COUNT(*) FROM models {where_sql}", params).fetchone()[0]
+        rows = connection.execute(
+            f"SELECT {_ITEM_COLUMNS} FROM models {where_sql} {order_sql} LIMIT ? OFFSET ?",
+            params + [limit, (page - 1) * limit],
+        ).fetchall()
+        return {"items": [_item(row) for row in rows], "total": total}
+
+    def iter_pages(self, search: Optional[str] = None, sort_field: str = "downloads", sort_direction: int = -1,
+                   limit: int = 100, tags: Optional[List[str]] = None,
+                   pipeline_tag: Optional[str] = None) -> Iterator[List[dict]]:
+        """
+        Yields every match of a query as pages of `limit` items, in the same order as `query`.
+        Each page continues after the last row's (sort key, rowid) instead of using OFFSET, so reading the whole
+        listing stays linear. All pages come from one dedicated connection opened on the first page, so a
+        snapshot swapped in during the export does not duplicate or skip rows.
+        """
+        where, params = self._filters(search, tags, pipeline_tag)
+        column = SORT_COLUMNS.get(sort_field, "last_modified")
+        descending = sort_direction == -1
+        order_sql = f"ORDER BY {column} {'DESC' if descending else 'ASC'}, rowid"
+
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            connection.execute(f"PRAGMA mmap_size={settings.HF_CATALOG_MMAP_BYTES}")
+            last = None
+            while True:
+                page_where, page_params = list(where), list(params)
+                if last is not None:
+                    after_sql, after_params = _after_key(column, descending, *last)
+                    page_where.append(after_sql)
+                    page_params.extend(after_params)
+                where_sql = f"WHERE {' AND '.join(page_where)}" if page_where else ""
+                rows = connection.execute(
+                    f"SELECT rowid, {column}, {_ITEM_COLUMNS} FROM models {where_sql} {order_sql} LIMIT ?",
+                    page_params + [limit],
+                ).fetchall()
+                if rows:
+                    yield [_item(row[2:]) for row in rows]
+                if len(rows) < limit:
+                    return
+                last = (rows[-1][1], rows[-1][0])
+        finally:
+            connection.close()
+
+    async def aquery(self, **kwargs) -> dict:
+        # Keep SQLite work off the event loop; large FTS matches can take a few milliseconds.
+        return await asyncio.to_thread(self.query, **kwargs)
+
+    def status(self) -> dict:
+        return {
+            "enabled": settings.HF_CATALOG_ENABLED,
+            "ready": self._ready,
+            "path": self.path,
+            "model_count": self.model_count,
+            "synced_at": self.synced_at,
+            "sync_in_progress": self.sync_in_progress,
+            "last_sync_error": self.last_sync_error,
+        }
+
+
+class _SnapshotWriter:
+    """Writes a new snapshot into `<path>.tmp`; `commit()` indexes it and swaps it into place."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.connection = sqlite3.connect(self.tmp_path, check_same_thread=False)
+        self.connection.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + _SCHEMA)
+        self.count = 0
+
+    def add(self, records: Iterable[dict]) -> None:
+        with self.connection:
+            for record in records:
+                model_id = record.get("id") or record.get("modelId")
+                if not model_id:
+                    continue
+                tags = [str(tag) for tag in (record.get("tags") or []) if isinstance(tag, (str, int, float))]
+                private = record.get("private")
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO models (id, author, pipeline_tag, tags, downloads, likes, last_modified, private) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (model_id, record.get("author"), record.get("pipeline_tag"), json.dumps(tags),
+                     record.get("downloads") or 0, record.get("likes") or 0, record.get("lastModified"),
+                     int(private) if private is not None else None),
+                )
+                if cursor.rowcount:
+                    self.count += 1
+                    self.connection.executemany(
+                        "INSERT OR IGNORE INTO model_tags (tag, model_rowid) VALUES (?, ?)",
+                        [(tag, cursor.lastrowid) for tag in tags],
+                    )
+
+    def commit(self) -> None:
+        with self.connection:
+            self.connection.executescript(_INDEXES)
+            self.connection.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                [("synced_at", str(time.time())), ("model_count", str(self.count))],
+            )
+        self.connection.execute("VACUUM")
+        self.connection.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self.connection.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class CatalogSyncBusyError(Exception):
+    """Raised when a catalog sync is already running in this process or, in multi-worker mode, on another worker."""
+
+
+async def _claim_sync(catalog: "ModelCatalog", store: Optional[SharedStore]) -> None:
+    # Checked and set before any await, so two requests on this loop cannot both claim it
+    if catalog.sync_in_progress:
+        raise CatalogSyncBusyError("A catalog sync is already running.")
+    catalog.sync_in_progress = True
+    try:
+        if store is not None and not await asyncio.to_thread(
+            store.try_lease, "catalog_sync", settings.HF_CATALOG_SYNC_INTERVAL_SECONDS
+        ):
+            raise CatalogSyncBusyError("Another worker is syncing the catalog.")
+    except BaseException:
+        catalog.sync_in_progress = False
+        raise
+
+
+async def _release_sync(catalog: "ModelCatalog", store: Optional[SharedStore]) -> None:
+    catalog.sync_in_progress = False
+    if store is not None:
+        await asyncio.to_thread(store.release_lease, "catalog_sync")
+
+
+async def sync_catalog(catalog: "ModelCatalog", client: Optional[HubClient] = None,
+                       max_models: Optional[int] = None, store: Optional[SharedStore] = None) -> int:
+    """
+    Mirrors Hub model metadata (most downloaded first) into a fresh snapshot and loads it.
+    Returns the number of models in the new snapshot. Only one sync writes a snapshot at a time:
+    raises `CatalogSyncBusyError` while another runs in this process or, with a shared `store`,
+    while another worker holds the `catalog_sync` lease.
+    """
+    await _claim_sync(catalog, store)
+    try:
+        return await _write_snapshot(catalog, client or hub_client, max_models or settings.HF_CATALOG_MAX_MODELS)
+    finally:
+        await _release_sync(catalog, store)
+
+
+async def start_catalog_sync(catalog: "ModelCatalog", store: Optional[SharedStore] = None) -> None:
+    """
+    Claims the sync like `sync_catalog` (raising `CatalogSyncBusyError` when it is taken) and runs it in the background.
+    Errors are reported through `catalog.last_sync_error`.
+    """
+    await _claim_sync(catalog, store)
+
+    async def run():
+        try:
+            await _write_snapshot(catalog, hub_client, settings.HF_CATALOG_MAX_MODELS)
+        except Exception as e:
+            print(f"Model catalog sync failed: {e}")
+        finally:
+            await _release_sync(catalog, store)
+
+    catalog._sync_task = asyncio.create_task(run())
+
+
+async def _write_snapshot(catalog: "ModelCatalog", client: HubClient, max_models: int) -> int:
+    page_size = min(settings.HF_CATALOG_SYNC_PAGE_SIZE, max_models)
+    writer = None
+    try:
+        writer = await asyncio.to_thread(_SnapshotWriter, catalog.path)
+        cursor = None
+        fetched = 0
+        while fetched < max_models:
+            hub_page = await client.list_models_page(sort="downloads", direction=-1, limit=page_size, full=True, cursor=cursor)
+            batch = hub_page.items[:max_models - fetched]
+            await asyncio.to_thread(writer.add, batch)
+            fetched += len(batch)
+            cursor = hub_page.next_cursor
+            if not cursor or not batch:
+                break
+        await asyncio.to_thread(writer.commit)
+        catalog.last_sync_error = None
+    except BaseException as e:
+        if writer is not None:
+            await asyncio.to_thread(writer.abort)
+        if isinstance(e, Exception):
+            catalog.last_sync_error = str(e)
+        raise
+
+    catalog.load()
+    print(f"Model catalog synced: {writer.count} models in {catalog.path}")
+    return writer.count
+
+
+async def run_catalog_sync_loop(catalog: "ModelCatalog", interval: Optional[float] = None,
+                                store: Optional[SharedStore] = None) -> None:
+    """
+    Background job started from the app lifespan. Syncs immediately if the snapshot is missing or old.
+    With a shared `store` (multi-worker mode) only the worker holding the sync lease talks to the Hub;
+    the others check every minute for a snapshot it swapped in and load that. The lease is held for the
+    duration of a sync, so manual syncs (`start_catalog_sync`) from any worker take turns with it.
+    """
+    interval = interval or settings.HF_CATALOG_SYNC_INTERVAL_SECONDS
+    while True:
+        if store is not None:
+            catalog.reload_if_changed()
+        age = time.time() - catalog.synced_at if catalog.synced_at else None
+        if age is not None and age < interval:
+            await asyncio.sleep(interval - age if store is None else min(interval - age, 60))
+            continue
+        try:
+            await sync_catalog(catalog, store=store)
+        except CatalogSyncBusyError:
+            await asyncio.sleep(60) # A manual sync or another worker is syncing
+        except Exception as e:
+            print(f"Model catalog sync failed: {e}")
+            await asyncio.sleep(min(interval, 300))
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+model_catalog = ModelCatalog()
@@ -0,0 +1,443 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+from app.core.config_store import config_store
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError: # Windows; blobs are then only guarded against jobs of the same process
+    FCNTL_AVAILABLE = False
+
+from app.services.download_engine import (
+    DownloadEngine, DownloadError, DownloadProgress, RepoFile, gather_or_cancel, hash_file, safe_join
+)
+
+
+def model_snapshot_dirname(model_id: str, revision: str = "main") -> str:
+    name = model_id.replace("/", "__")
+    return name if revision == "main" else f"{name}@{revision.replace('/', '__')}"
+
+
+class ModelStore:
+    """
+    Content-addressed, deduplicating store for downloaded model files.
+
+    Layout under `root` (the `model_directory` setting by default):
+
+        .store/blobs/sha256/ab/cdef...            one file per unique content hash
+        .store/manifests/<org>__<model>/<rev>.json  path -> sha256 for each downloaded revision
+        .store/manifests/<org>__<model>/<rev>.pending.json  blobs a download in progress relies on
+        .store/tmp/                               partial downloads (resumable)
+        .store/index.sqlite3                      integrity index of verified blobs
+        <org>__<model>[@<rev>]/...                snapshot view, hardlinked to the blobs
+
+    Blobs shared between revisions or fine-tunes are stored and downloaded once. A blob is
+    hashed once when it enters the store; afterwards the integrity index (size, mtime, inode)
+    is trusted, so repeated downloads never re-hash known blobs.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._blob_locks: Dict[str, asyncio.Lock] = {}
+        self._downloads_lock = threading.Lock()
+        self._active_downloads = 0
+        self._pending_root: Optional[str] = None
+        self.set_root(root or config_store.get("model_directory"))
+
+    def request_root(self, root: str) -> None:
+        """
+        Moves the store to `root` once no download is in flight (right away when idle). A download keeps the
+        root it started with from start to finish, so its partial files and blobs never straddle two volumes.
+        """
+        with self._downloads_lock:
+            self._pending_root = root
+            if not self._active_downloads:
+                self._apply_pending_root()
+
+    def _apply_pending_root(self) -> None:
+        if self._pending_root is not None:
+            root, self._pending_root = self._pending_root, None
+            if root != self.root:
+                self.set_root(root)
+
+    def set_root(self, root: str) -> None:
+        """Moves the store to `root` for subsequent operations; files already stored stay where they are."""
+        with self._db_lock:
+            self.close()
+            self.root = root
+            self.store_dir = os.path.join(self.root, ".store")
+            self.blobs_dir = os.path.join(self.store_dir, "blobs", "sha256")
+            self.manifests_dir = os.path.join(self.store_dir, "manifests")
+            self.tmp_dir = os.path.join(self.store_dir, "tmp")
+            self.index_path = os.path.join(self.store_dir, "index.sqlite3")
+
+    # Integrity index
+
+    def _index(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.store_dir, exist_ok=True)
+            self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+            self._db.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                " sha256 TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                " inode INTEGER NOT NULL, verified_at REAL NOT NULL);"
+            )
+        return self._db
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blobs_dir, sha256[:2], sha256[2:])
+
+    def has_verified_blob(self, sha256: str, size: Optional[int] = None) -> bool:
+        """True when the blob is on disk and unchanged since it was verified. Never hashes."""
+        try:
+            stat = os.stat(self.blob_path(sha256))
+        except FileNotFoundError:
+            return False
+        with self._db_lock:
+            row = self._index().execute(
+                "SELECT size, mtime_ns, inode FROM blobs WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        if row is None or row != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return False
+        return size is None or size == stat.st_size
+
+    def ensure_blob(self, sha256: str, size: Optional[int] = None) -> bool:
+        """Like `has_verified_blob`, but hashes a blob once if it is on disk without an index entry."""
+        if self.has_verified_blob(sha256, size):
+            return True
+        return os.path.exists(self.blob_path(sha256)) and self.verify_blob(sha256) and self.has_verified_blob(sha256, size)
+
+    def add_blob(self, source_path: str, sha256: str) -> str:
+        """Moves an already-hashed file into the store and records it as verified."""
+        blob_path = self.blob_path(sha256)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(source_path, blob_path)
+        os.chmod(blob_path, 0o444) # Blobs are shared through hardlinks; keep them read-only
+        self._record_verified(sha256, blob_path)
+        return blob_path
+
+    def verify_blob(self, sha256: str) -> bool:
+        """Re-hashes a blob (for blobs missing from the index) and records it when it matches."""
+        blob_path = self.blob_path(sha256)
+        if not os.path.exists(blob_path) or hash_file(blob_path, settings.DOWNLOAD_BUFFER_SIZE) != sha256:
+            return False
+        self._record_verified(sha256, blob_path)
+        return True
+
+    def _record_verified(self, sha256: str, blob_path: str) -> None:
+        stat = os.stat(blob_path)
+        with self._db_lock, self._index() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO blobs (sha256, size, mtime_ns, inode, verified_at) VALUES (?, ?, ?, ?, ?)",
+                (sha256, stat.st_size, stat.st_mtime_ns, stat.st_ino, time.time()),
+            )
+
+    # Manifests and snapshot views
+
+    def manifest_path(self, model_id: str, revision: str) -> str:
+        return os.path.join(self.manifests_dir, model_id.replace("/", "__"), f"{revision.replace('/', '__')}.json")
+
+    def snapshot_path(self, model_id: str, revision: str = "main") -> str:
+        return os.path.join(self.root, model_snapshot_dirname(model_id, revision))
+
+    def pending_manifest_path(self, model_id: str, revision: str) -> str:
+        return self.manifest_path(model_id, revision)[:-len(".json")] + ".pending.json"
+
+    def write_manifest(self, model_id: str, revision: str, commit: Optional[str], files: Dict[str, dict],
+                       pending: bool = False) -> str:
+        path = self.pending_manifest_path(model_id, revision) if pending else self.manifest_path(model_id, revision)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"model_id": model_id, "revision": revision, "commit": commit,
+                       "created_at": time.time(), "files": files}, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def remove_pending_manifest(self, model_id: str, revision: str) -> None:
+        try:
+            os.remove(self.pending_manifest_path(model_id, revision))
+        except FileNotFoundError:
+            pass
+
+    def link_snapshot(self, model_id: str, revision: str, files: Dict[str, dict]) -> str:
+        """
+        Points every file of the snapshot view at its blob (hardlink, else symlink, else copy).
+        Raises `DownloadError` when a blob is missing rather than leaving a dangling link.
+        """
+        snapshot_dir = self.snapshot_path(model_id, revision)
+        for repo_path, entry in files.items():
+            dest_path = safe_join(snapshot_dir, repo_path)
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            blob_path = self.blob_path(entry["sha256"])
+            tmp_path = f"{dest_path}.link-tmp"
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            if not os.path.exists(blob_path):
+                raise DownloadError(f"Blob for {repo_path} ({entry['sha256']}) is missing from the store")
+            try:
+                os.link(blob_path, tmp_path)
+            except OSError:
+                try:
+                    os.symlink(os.path.abspath(blob_path), tmp_path)
+                except OSError:
+                    shutil.copyfile(blob_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+        return snapshot_dir
+
+    def referenced_blobs(self, pending_max_age: Optional[float] = None) -> set:
+        """
+        Blobs referenced by a manifest, including the pending manifests of downloads in progress.
+        Pending manifests older than `pending_max_age` seconds are left over from crashed downloads and ignored.
+        """
+        referenced = set()
+        cutoff = time.time() - pending_max_age if pending_max_age is not None else None
+        for dirpath, _, filenames in os.walk(self.manifests_dir):
+            for filename in filenames:
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    if cutoff is not None and filename.endswith(".pending.json") and os.path.getmtime(path) < cutoff:
+                        continue
+                    with open(path) as f:
+                        files = json.load(f)["files"]
+                except FileNotFoundError:
+                    continue # A pending manifest removed by a download that just finished
+                referenced.update(entry["sha256"] for entry in files.values() if entry.get("sha256"))
+        return referenced
+
+    def gc(self, dry_run: bool = False, tmp_max_age: float = 7 * 24 * 3600) -> dict:
+        """
+        Deletes blobs no manifest references (and their index rows), plus partial downloads
+        untouched for `tmp_max_age` seconds. Snapshot hardlinks keep their data alive until removed.
+        Safe to run next to downloads: they list the blobs they rely on in a pending manifest before
+        fetching, and references are read again just before deleting.
+        """
+        referenced = self.referenced_blobs(tmp_max_age)
+        candidates = []
+        for dirpath, _, filenames in os.walk(self.blobs_dir):
+            for filename in filenames:
+                sha256 = os.path.basename(dirpath) + filename
+                if sha256 not in referenced:
+                    candidates.append((sha256, os.path.join(dirpath, filename)))
+
+        if candidates:
+            referenced = self.referenced_blobs(tmp_max_age) # Downloads started during the scan
+        removed_blobs, freed_bytes = [], 0
+        for sha256, path in candidates:
+            if sha256 in referenced:
+                continue
+            freed_bytes += os.path.getsize(path)
+            removed_blobs.append(sha256)
+            if not dry_run:
+                os.remove(path)
+        if removed_blobs and not dry_run:
+            with self._db_lock, self._index() as db:
+                db.executemany("DELETE FROM blobs WHERE sha256 = ?", [(sha,) for sha in removed_blobs])
+
+        removed_tmp = 0
+        cutoff = time.time() - tmp_max_age
+        for dirpath, _, filenames in os.walk(self.tmp_dir):
+            for filename in filenames:
+                if filename.endswith(".lock"):
+                    continue # Empty; removing one a worker holds would let a second worker in
+                path = os.path.join(dirpath, filename)
+                if os.path.getmtime(path) < cutoff:
+                    freed_bytes += os.path.getsize(path)
+                    removed_tmp += 1
+                    if not dry_run:
+                        os.remove(path)
+        return {"removed_blobs": len(removed_blobs), "removed_partial_files": removed_tmp,
+                "freed_bytes": freed_bytes, "dry_run": dry_run}
+
+    # Downloads
+
+    async def download_repo(self, engine: DownloadEngine, repo_id: str, revision: str = "main",
+                            progress: Optional[DownloadProgress] = None) -> dict:
+        """
+        Downloads `repo_id` at `revision` into the store and links its snapshot view.
+        Blobs already in the store (matched by the Hub's LFS sha256) are not downloaded again.
+        """
+        with self._downloads_lock:
+            self._active_downloads += 1
+        try:
+            return await self._download_repo(engine, repo_id, revision, progress or DownloadProgress())
+        finally:
+            with self._downloads_lock:
+                self._active_downloads -= 1
+                if not self._active_downloads:
+                    self._apply_pending_root()
+
+    async def _download_repo(self, engine: DownloadEngine, repo_id: str, revision: str,
+                             progress: DownloadProgress) -> dict:
+        repo = await engine.get_repo_revision(repo_id, revision)
+        progress.files_total = len(repo.files)
+        progress.total_bytes = sum(f.size or 0 for f in repo.files)
+
+        semaphore = asyncio.Semaphore(engine.max_concurrent_files)
+        manifest_files: Dict[str, dict] = {}
+        reused_bytes = 0
+
+        # Announce the blobs this download relies on, so `gc` does not delete them (or the ones it stores)
+        # before the manifest is written. Files without a published sha256 are added as they complete.
+        pending_files = {f.path: {"sha256": f.sha256, "size": f.size} for f in repo.files}
+        await asyncio.to_thread(self.write_manifest, repo_id, revision, repo.commit, pending_files, True)
+
+        async def fetch(repo_file: RepoFile):
+            nonlocal reused_bytes
+            async with semaphore:
+                if repo_file.sha256:
+                    async with self._blob_lock(repo_file.sha256): # Another job may be fetching the same blob
+                        if await asyncio.to_thread(self.ensure_blob, repo_file.sha256, repo_file.size):
+                            reused_bytes += repo_file.size or 0
+                            progress.downloaded_bytes += repo_file.size or 0
+                            digest = repo_file.sha256
+                        else:
+                            digest = await self._download_blob(engine, repo_id, revision, repo_file, progress)
+                else:
+                    async def announce(digest: str):
+                        pending_files[repo_file.path] = {"sha256": digest, "size": repo_file.size}
+                        await asyncio.to_thread(self.write_manifest, repo_id, revision, repo.commit, dict(pending_files), True)
+                    async with self._blob_lock(_tmp_name(repo_id, revision, repo_file)):
+                        digest = await self._download_blob(engine, repo_id, revision, repo_file, progress, announce)
+                manifest_files[repo_file.path] = {"sha256": digest, "size": repo_file.size}
+                progress.files_completed += 1
+
+        try:
+            await gather_or_cancel([fetch(f) for f in repo.files])
+            await asyncio.to_thread(self.write_manifest, repo_id, revision, repo.commit, manifest_files)
+        finally:
+            await asyncio.to_thread(self.remove_pending_manifest, repo_id, revision)
+        snapshot_dir = await asyncio.to_thread(self.link_snapshot, repo_id, revision, manifest_files)
+        return {
+            "repo_id": repo_id,
+            "revision": revision,
+            "commit": repo.commit,
+            "path": snapshot_dir,
+            "files": len(repo.files),
+            "bytes": progress.total_bytes,
+            "reused_bytes": reused_bytes,
+        }
+
+    async def _download_blob(self, engine: DownloadEngine, repo_id: str, revision: str,
+                             repo_file: RepoFile, progress: DownloadProgress, announce=None) -> str:
+        tmp_path = os.path.join(self.tmp_dir, _tmp_name(repo_id, revision, repo_file))
+        digest = await engine.download_file(
+            engine.file_url(repo_id, revision, repo_file.path), tmp_path,
+            size=repo_file.size, expected_sha256=repo_file.sha256, progress=progress,
+        )
+        if announce is not None:
+            await announce(digest) # Listed in the pending manifest before it can be seen by `gc`
+        if await asyncio.to_thread(self.has_verified_blob, digest):
+            await asyncio.to_thread(os.remove, tmp_path) # Same content already stored under another path
+        else:
+            await asyncio.to_thread(self.add_blob, tmp_path, digest)
+        return digest
+
+    @asynccontextmanager
+    async def _blob_lock(self, name: str) -> AsyncIterator[None]:
+        """
+        Held while a job checks for and downloads the temporary file `name`. Jobs of this process queue on an
+        `asyncio.Lock`; other workers sharing the model directory are kept out by an `flock` on `tmp/<name>.lock`.
+        """
+        lock = self._blob_locks.get(name)
+        if lock is None:
+            lock = self._blob_locks[name] = asyncio.Lock()
+        async with lock:
+            if not FCNTL_AVAILABLE:
+                yield
+                return
+            lock_file = await asyncio.to_thread(_open_lock_file, os.path.join(self.tmp_dir, f"{name}.lock"))
+            try:
+                # Polled rather than blocking, so waiting for another worker's download does not hold a thread
+                while not _try_flock(lock_file):
+                    await asyncio.sleep(settings.DOWNLOAD_BLOB_LOCK_POLL_SECONDS)
+                yield
+            finally:
+                lock_file.close() # Also releases the flock
+
+
+def _tmp_name(repo_id: str, revision: str, repo_file: RepoFile) -> str:
+    if repo_file.sha256:
+        return repo_file.sha256
+    # Non-LFS files have no published sha256; key the partial file by its location instead
+    return "path-" + hashlib.sha256(f"{repo_id}@{revision}:{repo_file.path}".encode()).hexdigest()
+
+
+def _open_lock_file(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(path, "a")
+
+
+def _try_flock(lock_file) -> bool:
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+model_store = ModelStore()
+
+
+def _follow_model_directory(key: str, old, new) -> None:
+    if key == "model_directory" and new:
+        model_store.request_root(new)
+
+
+# Changing `model_directory` (from any worker) moves where new downloads are stored, once the running ones finish.
+# The catalog snapshot and the shared-state file are opened at startup and move after a restart.
+config_store.add_listener(_follow_model_directory)
+
+
+def download_repo_blocking(repo_id: str, root: Optional[str] = None, revision: str = "main") -> dict:
+    """Synchronous entry point for scripts and the CLI helpers in app.utils; stores into the store at `root`."""
+    async def run():
+        store = ModelStore(root) if root else model_store
+        engine = DownloadEngine()
+        try:
+            return await store.download_repo(engine, repo_id, revision)
+        finally:
+            await engine.aclose()
+            if store is not model_store:
+                store.close()
+    return asyncio.run(run())
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.model_store", description="Maintain the model blob store.")
+    parser.add_argument("--root", default=None, help="Store root (defaults to the model_directory setting).")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    gc_parser = subcommands.add_parser("gc", help="Delete blobs that no manifest references.")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted.")
+    args = parser.parse_args(argv)
+
+    store = ModelStore(args.root)
+    if args.command == "gc":
+        result = store.gc(dry_run=args.dry_run)
+        action = "Would remove" if args.dry_run else "Removed"
+        print(f"{action} {result['removed_blobs']} unreferenced blobs and {result['removed_partial_files']} "
+              f"stale partial files ({result['freed_bytes']} bytes).")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.hub_client import HubClient, hub_client
+from app.services.huggingface_service import transform_hub_model
+from app.services.model_catalog import ModelCatalog
+
+# Sorts after every character a lowercase key can contain, so [prefix, prefix + _KEY_END) is the prefix range
+_KEY_END = "\U0010ffff"
+
+
+class PrefixRanking:
+    """
+    Immutable prefix index over (key, rank) pairs, where a lower rank is better.
+
+    Keys live in a sorted list, so a prefix is a contiguous slice found with two bisects.
+    Prefixes up to `hot_length` characters match too many keys to rank per request;
+    their best `hot_limit` ranks are precomputed when the index is built.
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[str, int]], hot_length: int = 2, hot_limit: int = 20):
+        pairs = sorted(set(pairs))
+        self.keys = [key for key, _ in pairs]
+        self.ranks = [rank for _, rank in pairs]
+        self.hot_length = hot_length
+        self.hot_limit = hot_limit
+
+        hot: Dict[str, set] = {}
+        for key, rank in pairs:
+            for length in range(1, min(hot_length, len(key)) + 1):
+                hot.setdefault(key[:length], set()).add(rank)
+        self.hot = {prefix: heapq.nsmallest(hot_limit, ranks) for prefix, ranks in hot.items()}
+
+    def top(self, prefix: str, limit: int) -> List[int]:
+        """Best `limit` ranks among keys starting with `prefix` (already lowercased), best first."""
+        if len(prefix) <= self.hot_length and limit <= self.hot_limit:
+            return self.hot.get(prefix, [])[:limit]
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + _KEY_END, start)
+        return heapq.nsmallest(limit, set(self.ranks[start:end]))
+
+
+class SuggestIndex:
+    """
+    Snapshot of the suggest data: models ranked by downloads and authors ranked by their total downloads.
+    A model matches on its full ID, on the name after the slash and on its author.
+    """
+
+    def __init__(self, models: Iterable[dict], hot_limit: int = 20):
+        self.models = sorted(models, key=lambda model: (-(model.get("downloads") or 0), model["id"]))
+        model_keys = []
+        author_totals: Dict[str, List] = {} # lowercased author -> [author, downloads, model count]
+        for rank, model in enumerate(self.models):
+            model_id = model["id"].lower()
+            model_keys.append((model_id, rank))
+            author, _, name = model_id.rpartition("/")
+            if author:
+                model_keys.append((name, rank))
+                model_keys.append((author, rank))
+                totals = author_totals.setdefault(author, [model["id"].rpartition("/")[0], 0, 0])
+                totals[1] += model.get("downloads") or 0
+                totals[2] += 1
+
+        self.authors = [
+            {"author": author, "downloads": downloads, "models": count}
+            for author, downloads, count in sorted(author_totals.values(), key=lambda totals: (-totals[1], totals[0]))
+        ]
+        self.model_ranking = PrefixRanking(model_keys, hot_limit=hot_limit)
+        self.author_ranking = PrefixRanking(
+            ((entry["author"].lower(), rank) for rank, entry in enumerate(self.authors)), hot_limit=hot_limit
+        )
+
+    def suggest(self, query: str, limit: int) -> dict:
+        prefix = query.strip().lower()
+        if not prefix:
+            return {"items": self.models[:limit], "authors": self.authors[:limit]}
+        return {
+            "items": [self.models[rank] for rank in self.model_ranking.top(prefix, limit)],
+            "authors": [self.authors[rank] for rank in self.author_ranking.top(prefix, limit)],
+        }
+
+
+class ModelSuggester:
+    """
+    Keeps a `SuggestIndex` of the most downloaded models warm in memory for search-as-you-type.
+
+    The first load comes from the local catalog snapshot when it is ready, otherwise from the
+    Hub's most-downloaded pages. After that, `refresh` re-reads only the head of the ranking
+    (where download counts move and new models appear), merges it into the known models and
+    swaps in a rebuilt index. Requests never wait on the network; they read whichever index is current.
+    """
+
+    def __init__(self, max_models: Optional[int] = None, hot_limit: Optional[int] = None):
+        self.max_models = max_models or settings.HF_SUGGEST_MAX_MODELS
+        self.hot_limit = hot_limit or settings.HF_SUGGEST_MAX_LIMIT
+        self.index: Optional[SuggestIndex] = None
+        self.source: Optional[str] = None # "catalog" or "hub"
+        self.built_at: Optional[float] = None
+        self.catalog_synced_at: Optional[float] = None # Catalog snapshot the index was last loaded from
+        self.last_refresh_error: Optional[str] = None
+        self._models: Dict[str, dict] = {}
+
+    @property
+    def is_ready(self) -> bool:
+        return self.index is not None
+
+    def suggest(self, query: str, limit: int = 10) -> dict:
+        if self.index is None:
+            return {"query": query, "ready": False, "items": [], "authors": []}
+        return {"query": query, "ready": True, **self.index.suggest(query, limit)}
+
+    async def load_catalog(self, catalog: ModelCatalog) -> int:
+        """Replaces the known models with the catalog's most downloaded ones."""
+        result = await catalog.aquery(sort_field="downloads", sort_direction=-1, page=1, limit=self.max_models)
+        self.catalog_synced_at = catalog.synced_at
+        await self._rebuild(result["items"], "catalog", replace=True)
+        return len(result["items"])
+
+    async def load_hub(self, max_models: int, client: Optional[HubClient] = None) -> int:
+        """Merges the Hub's `max_models` most downloaded models into the known models."""
+        client = client or hub_client
+        page_size = min(settings.HF_CATALOG_SYNC_PAGE_SIZE, max_models)
+        models, cursor = [], None
+        while len(models) < max_models:
+            hub_page = await client.list_models_page(sort="downloads", direction=-1, limit=page_size, cursor=cursor)
+            models.extend(transform_hub_model(record) for record in hub_page.items[:max_models - len(models)])
+            cursor = hub_page.next_cursor
+            if not cursor or not hub_page.items:
+                break
+        await self._rebuild(models, "hub", replace=False)
+        return len(models)
+
+    async def refresh(self, catalog: Optional[ModelCatalog] = None, client: Optional[HubClient] = None) -> int:
+        """Full load on first use or after a new catalog snapshot; otherwise an incremental update of the head."""
+        try:
+            if catalog is not None and catalog.is_ready and catalog.synced_at != self.catalog_synced_at:
+                count = await self.load_catalog(catalog)
+            elif self.index is None:
+                count = await self.load_hub(self.max_models, client)
+            else:
+                count = await self.load_hub(settings.HF_SUGGEST_REFRESH_MODELS, client)
+        except Exception as e:
+            self.last_refresh_error = str(e)
+            raise
+        self.last_refresh_error = None
+        return count
+
+    async def _rebuild(self, models: List[dict], source: str, replace: bool) -> None:
+        known = {} if replace else dict(self._models)
+        known.update((model["id"], model) for model in models if model.get("id"))
+        if len(known) > self.max_models: # Drop the least downloaded once new models push the total over the cap
+            kept = heapq.nlargest(self.max_models, known.values(), key=lambda model: model.get("downloads") or 0)
+            known = {model["id"]: model for model in kept}
+        # Building sorts tens of thousands of keys; do it off the event loop and swap the finished index in
+        index = await asyncio.to_thread(SuggestIndex, list(known.values()), self.hot_limit)
+        self._models = known
+        self.index = index
+        self.source = source
+        self.built_at = time.time()
+
+    def status(self) -> dict:
+        return {
+            "ready": self.is_ready,
+            "source": self.source,
+            "model_count": len(self._models),
+            "author_count": len(self.index.authors) if self.index else 0,
+            "built_at": self.built_at,
+            "last_refresh_error": self.last_refresh_error,
+        }
+
+
+async def run_suggest_refresh_loop(suggester: ModelSuggester, catalog: Optional[ModelCatalog] = None,
+                                   interval: Optional[float] = None) -> None:
+    """Background job started from the app lifespan: builds the index right away, then keeps it fresh."""
+    interval = interval or settings.HF_SUGGEST_REFRESH_INTERVAL_SECONDS
+    while True:
+        try:
+            await suggester.refresh(catalog)
+        except Exception as e:
+            print(f"Model suggest index refresh failed: {e}")
+            if not suggester.is_ready:
+                await asyncio.sleep(min(interval, 60)) # Retry the first build sooner
+                continue
+        await asyncio.sleep(interval)
+
+
+model_suggester = ModelSuggester()
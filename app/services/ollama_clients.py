@@ -0,0 +1,95 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+@lru_cache(maxsize=1024)
+def normalize_ollama_url(ollama_url: str) -> str:
+    """
+    Canonical base URL for an Ollama instance: `localhost:11434/` -> `http://localhost:11434`.
+    Cached because every request normalizes the same handful of URLs.
+    """
+    processed_url = ollama_url.strip()
+    if not processed_url.startswith("http://") and not processed_url.startswith("https://"):
+        processed_url = f"http://{processed_url}" # Default to http
+    return processed_url.rstrip("/")
+
+
+class OllamaClientRegistry:
+    """
+    One pooled `httpx.AsyncClient` per Ollama base URL.
+
+    The Ollama service functions used to open and close a client per call, paying a TCP
+    (and TLS) handshake every time. Clients here keep idle connections alive between calls
+    and are closed in the app lifespan. The least recently used client is dropped once more
+    than `max_clients` distinct hosts have been contacted, since URLs come from requests.
+    Requests borrow a client with `use()`, so a dropped client is only closed once the requests
+    (e.g. long pulls or chat streams) still running on it have finished.
+    """
+
+    def __init__(self, max_clients: Optional[int] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.max_clients = max_clients or settings.OLLAMA_MAX_CLIENTS
+        self.transport = transport # Lets tests route every client through an httpx.MockTransport
+        self._clients: "OrderedDict[str, httpx.AsyncClient]" = OrderedDict()
+        self._in_use: Dict[httpx.AsyncClient, int] = {}
+        self._retired = set() # Dropped from `_clients` while in use; closed when the last request ends
+
+    @asynccontextmanager
+    async def use(self, ollama_url: str) -> AsyncIterator[httpx.AsyncClient]:
+        """`async with ollama_clients.use(url) as client:` for the duration of one request or stream."""
+        client = self.client(ollama_url)
+        self._in_use[client] = self._in_use.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            self._in_use[client] -= 1
+            if not self._in_use[client]:
+                del self._in_use[client]
+                if client in self._retired:
+                    self._retired.discard(client)
+                    await client.aclose()
+
+    def client(self, ollama_url: str) -> httpx.AsyncClient:
+        """The pooled client for `ollama_url`. Requests should go through `use()` so eviction cannot close it mid-request."""
+        base_url = normalize_ollama_url(ollama_url)
+        client = self._clients.get(base_url)
+        if client is not None and not client.is_closed:
+            self._clients.move_to_end(base_url)
+            return client
+
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            transport=self.transport,
+            timeout=httpx.Timeout(settings.OLLAMA_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        self._clients[base_url] = client
+        while len(self._clients) > self.max_clients:
+            _, evicted = self._clients.popitem(last=False)
+            if evicted in self._in_use:
+                self._retired.add(evicted)
+            else:
+                asyncio.get_running_loop().create_task(evicted.aclose())
+        return client
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values()) + list(self._retired)
+        self._clients.clear()
+        self._retired.clear()
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+
+ollama_clients = OllamaClientRegistry()
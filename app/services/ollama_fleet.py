@@ -0,0 +1,148 @@
+import asyncio
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.shared_store import SharedStore, shared_store
+from app.schemas.ollama_schemas import OllamaLocalModelInfo
+from app.services import ollama_service
+from app.services.ollama_clients import normalize_ollama_url
+
+
+class OllamaFleet:
+    """
+    Registry of named Ollama hosts (seeded from `OLLAMA_HOSTS`) and a concurrent inventory across them.
+
+    `inventory` asks every host for /api/tags at the same time and waits at most `timeout` seconds,
+    so a fleet listing costs the slowest answering host rather than the sum of all of them.
+    Hosts that fail or miss the deadline are reported per host and mark the result as partial.
+
+    With a `store` (multi-worker mode) runtime registrations and removals are written to its `ollama_hosts`
+    table and applied on top of the seed. Other workers pick them up in `refresh`, which the host listing
+    and inventory call first and `run_sync_loop` repeats every OLLAMA_HOSTS_SYNC_SECONDS for the router.
+    """
+
+    def __init__(self, hosts: Optional[Dict[str, str]] = None, store: Optional[SharedStore] = None):
+        seed = settings.OLLAMA_HOSTS if hosts is None else hosts
+        self._seed: Dict[str, str] = {name: normalize_ollama_url(url) for name, url in seed.items()}
+        self.hosts: Dict[str, str] = dict(self._seed)
+        self.store = store
+
+    async def register(self, name: str, url: str) -> str:
+        url = normalize_ollama_url(url)
+        if self.store is not None:
+            await asyncio.to_thread(self._write, name, url)
+        self.hosts[name] = url
+        return url
+
+    async def remove(self, name: str) -> None:
+        await self.refresh() # It may have been registered on another worker
+        if name not in self.hosts:
+            raise HTTPException(status_code=404, detail=f"Ollama host '{name}' is not registered.")
+        if self.store is not None:
+            await asyncio.to_thread(self._write, name, None)
+        self.hosts.pop(name, None)
+
+    async def refresh(self) -> None:
+        """Multi-worker mode: applies registrations and removals made on any worker."""
+        if self.store is None:
+            return
+        rows = await asyncio.to_thread(
+            lambda: self.store.connection().execute("SELECT name, url FROM ollama_hosts").fetchall()
+        )
+        hosts = dict(self._seed)
+        for name, url in rows:
+            if url is None:
+                hosts.pop(name, None)
+            else:
+                hosts[name] = url
+        self.hosts = hosts
+
+    async def run_sync_loop(self, interval: Optional[float] = None) -> None:
+        """Background job started from the app lifespan in multi-worker mode."""
+        interval = interval or settings.OLLAMA_HOSTS_SYNC_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except sqlite3.Error as e:
+                print(f"Ollama host registry sync failed: {e}")
+
+    def _write(self, name: str, url: Optional[str]) -> None:
+        self.store.connection().execute(
+            "INSERT INTO ollama_hosts (name, url) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET url = excluded.url",
+            (name, url),
+        )
+
+    def resolve(self, name: str) -> str:
+        url = self.hosts.get(name)
+        if url is None:
+            raise HTTPException(status_code=404, detail=f"Ollama host '{name}' is not registered.")
+        return url
+
+    async def inventory(self, timeout: Optional[float] = None) -> dict:
+        timeout = timeout if timeout is not None else settings.OLLAMA_FLEET_HOST_TIMEOUT_SECONDS
+        await self.refresh()
+        started = time.monotonic()
+        tasks = {
+            asyncio.ensure_future(self._timed_fetch(url)): name
+            for name, url in self.hosts.items()
+        }
+        done, pending = await asyncio.wait(tasks, timeout=timeout) if tasks else (set(), set())
+        for task in pending:
+            task.cancel() # Stop waiting on slow hosts (a request shared with other callers runs on to its own timeout)
+
+        host_statuses = []
+        models: Dict[Tuple[str, Optional[str]], dict] = {}
+        for task, name in tasks.items():
+            status = {"name": name, "url": self.hosts[name], "status": "ok", "latency_ms": None,
+                      "model_count": 0, "error": None}
+            if task in pending:
+                status["status"] = "timeout"
+                status["error"] = f"No answer within {timeout:g} seconds."
+                status["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+            elif task.exception() is not None:
+                status["status"] = "error"
+                status["error"] = _describe_error(task.exception())
+            else:
+                host_models, latency = task.result()
+                status["latency_ms"] = round(latency * 1000, 1)
+                status["model_count"] = len(host_models)
+                _merge_models(models, name, host_models)
+            host_statuses.append(status)
+
+        return {
+            "models": sorted(models.values(), key=lambda model: (model["name"], model["digest"] or "")),
+            "hosts": host_statuses,
+            "partial": any(status["status"] != "ok" for status in host_statuses),
+        }
+
+    async def _timed_fetch(self, url: str) -> Tuple[List[OllamaLocalModelInfo], float]:
+        started = time.monotonic()
+        host_models = await ollama_service.fetch_local_ollama_models(url)
+        return host_models, time.monotonic() - started
+
+
+def _merge_models(models: Dict[Tuple[str, Optional[str]], dict], host_name: str,
+                  host_models: List[OllamaLocalModelInfo]) -> None:
+    # Keyed by name and digest: the same tag with different contents on two hosts stays two entries
+    for model in host_models:
+        entry = models.setdefault((model.name, model.digest), {
+            "name": model.name, "digest": model.digest, "size": model.size, "hosts": [],
+        })
+        entry["hosts"].append(host_name)
+
+
+def _describe_error(error: BaseException) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code} from {error.request.url}"
+    if isinstance(error, httpx.RequestError):
+        return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+    return str(error)
+
+
+ollama_fleet = OllamaFleet(store=shared_store)
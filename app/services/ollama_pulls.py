@@ -0,0 +1,152 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services import ollama_service
+
+
+@dataclass
+class OllamaPull:
+    """State of a detached pull, folded from Ollama's streamed progress objects."""
+    model_name: str
+    ollama_url: str
+    pull_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    state: str = "running" # "running", "completed" or "failed"
+    status: Optional[str] = None # Last `status` text from Ollama, e.g. "pulling 8eeb52dfb3bb"
+    layers: Dict[str, dict] = field(default_factory=dict) # digest -> {"total", "completed"}
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    version: int = 0 # Bumped on every update so listeners can wait for changes
+
+    def apply(self, update: dict) -> None:
+        if "error" in update:
+            self.state = "failed"
+            self.error = update["error"]
+        else:
+            self.status = update.get("status", self.status)
+            digest = update.get("digest")
+            if digest:
+                layer = self.layers.setdefault(digest, {"total": 0, "completed": 0})
+                layer["total"] = update.get("total", layer["total"])
+                layer["completed"] = update.get("completed", layer["completed"])
+            if self.status == "success":
+                self.state = "completed"
+        if self.state != "running" and self.finished_at is None:
+            self.finished_at = time.time()
+        self.version += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "pull_id": self.pull_id,
+            "model_name": self.model_name,
+            "ollama_url": self.ollama_url,
+            "state": self.state,
+            "status": self.status,
+            "completed_bytes": sum(layer["completed"] for layer in self.layers.values()),
+            "total_bytes": sum(layer["total"] for layer in self.layers.values()),
+            "layers": [{"digest": digest, **layer} for digest, layer in self.layers.items()],
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class OllamaPullManager:
+    """
+    Runs Ollama pulls detached from the HTTP request that started them.
+    Clients can poll `get` or reattach to `events` at any time; a second request for the
+    same model on the same host while a pull is running returns the running pull.
+    """
+
+    def __init__(self, history: Optional[int] = None):
+        self.history = history or settings.OLLAMA_PULL_HISTORY
+        self.pulls: Dict[str, OllamaPull] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def _changed(self) -> asyncio.Condition:
+        if self._condition is None: # Created lazily so it binds to the running event loop
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def start(self, ollama_url: str, model_name: str, on_finish: Optional[Callable[[], None]] = None) -> OllamaPull:
+        """`on_finish` runs once the pull ends (or right away if an identical pull is already running)."""
+        for pull in self.pulls.values():
+            if pull.state == "running" and pull.model_name == model_name and pull.ollama_url == ollama_url:
+                if on_finish is not None:
+                    on_finish()
+                return pull
+        pull = OllamaPull(model_name=model_name, ollama_url=ollama_url)
+        self.pulls[pull.pull_id] = pull
+        self._tasks[pull.pull_id] = asyncio.get_running_loop().create_task(self._run(pull, on_finish))
+        self._prune_history()
+        return pull
+
+    def get(self, pull_id: str) -> OllamaPull:
+        pull = self.pulls.get(pull_id)
+        if pull is None:
+            raise HTTPException(status_code=404, detail=f"Ollama pull '{pull_id}' not found.")
+        return pull
+
+    def list(self) -> List[OllamaPull]:
+        return sorted(self.pulls.values(), key=lambda pull: pull.started_at, reverse=True)
+
+    async def events(self, pull_id: str, heartbeat: float = 15.0) -> AsyncIterator[dict]:
+        """Yields a snapshot now and after every change (or `heartbeat` seconds) until the pull ends."""
+        pull = self.get(pull_id)
+        seen = -1
+        while True:
+            if pull.version != seen:
+                seen = pull.version
+                yield pull.snapshot()
+            if pull.state != "running":
+                return
+            async with self._changed:
+                try:
+                    await asyncio.wait_for(self._changed.wait_for(lambda: pull.version != seen), heartbeat)
+                except asyncio.TimeoutError:
+                    seen = -1 # Re-send the current state as a keep-alive
+
+    async def shutdown(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, pull: OllamaPull, on_finish: Optional[Callable[[], None]] = None) -> None:
+        try:
+            async for update in ollama_service.stream_pull_ollama(pull.ollama_url, pull.model_name):
+                pull.apply(update)
+                await self._notify()
+            if pull.state == "running": # Stream ended without "success" or an error
+                pull.apply({"error": "Ollama closed the pull stream before reporting success."})
+        except asyncio.CancelledError:
+            pull.apply({"error": "Pull tracking stopped because the server is shutting down."})
+            raise
+        except Exception as e:
+            print(f"Unexpected error in detached pull of '{pull.model_name}' from {pull.ollama_url}: {e}")
+            pull.apply({"error": f"An unexpected error occurred: {str(e)}"})
+        finally:
+            self._tasks.pop(pull.pull_id, None)
+            if on_finish is not None:
+                on_finish()
+            await self._notify()
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _prune_history(self) -> None:
+        finished = [pull for pull in self.pulls.values() if pull.state != "running"]
+        for pull in sorted(finished, key=lambda pull: pull.finished_at or 0)[:max(len(finished) - self.history, 0)]:
+            del self.pulls[pull.pull_id]
+
+
+ollama_pull_manager = OllamaPullManager()
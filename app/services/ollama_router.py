@@ -0,0 +1,186 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services import ollama_service
+from app.services.ollama_clients import normalize_ollama_url
+from app.services.ollama_fleet import OllamaFleet, ollama_fleet
+
+
+@dataclass
+class HostLoad:
+    in_flight: int = 0
+    ewma_latency: Optional[float] = None # Seconds; None until the first sample
+    served: int = 0
+
+
+class HostLease:
+    """
+    A slot on one Ollama host, held for the duration of an operation.
+    Use as `async with`, or call `release()` when the operation ends (e.g. a detached pull).
+    """
+
+    def __init__(self, router: Optional["OllamaRouter"], name: Optional[str], url: str, queued_seconds: float = 0.0):
+        self.router = router
+        self.name = name # None for an explicit URL that is not a registered host (not tracked)
+        self.url = url
+        self.queued_seconds = queued_seconds
+        self._released = False
+
+    def observe(self, latency: float) -> None:
+        """Feeds a latency sample (e.g. time to first token) into the host's EWMA."""
+        if self.router is not None and self.name is not None:
+            self.router.observe(self.name, latency)
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            if self.router is not None and self.name is not None:
+                self.router.release(self.name)
+
+    async def __aenter__(self) -> "HostLease":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+class OllamaRouter:
+    """
+    Picks an Ollama host from the fleet for each operation instead of the caller hard-coding one.
+
+    Among hosts with a free slot (at most `max_in_flight` operations each) it prefers:
+    1. hosts that already have the model loaded (per /api/ps, cached for a couple of seconds),
+    2. then the fewest in-flight operations,
+    3. then the lowest recent latency (EWMA; hosts without samples go first so they get measured).
+    When every host is saturated, callers queue until a slot frees or `queue_timeout` passes (503).
+    Because a saturated host is skipped even if it has the model loaded, a hot model spills over
+    onto other hosts instead of piling onto one GPU box.
+    """
+
+    def __init__(self, fleet: Optional[OllamaFleet] = None, max_in_flight: Optional[int] = None,
+                 queue_timeout: Optional[float] = None, alpha: Optional[float] = None,
+                 timer: Callable[[], float] = time.monotonic):
+        self.fleet = fleet or ollama_fleet
+        self.max_in_flight = max_in_flight or settings.OLLAMA_ROUTER_MAX_IN_FLIGHT_PER_HOST
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.OLLAMA_ROUTER_QUEUE_TIMEOUT_SECONDS
+        self.alpha = alpha or settings.OLLAMA_ROUTER_EWMA_ALPHA
+        self.loads: Dict[str, HostLoad] = {}
+        self.queued = 0
+        self.loaded_models = TTLCache(maxsize=256, ttl=settings.OLLAMA_ROUTER_PS_TTL_SECONDS, timer=timer)
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def _slot_freed(self) -> asyncio.Condition:
+        if self._condition is None: # Created lazily so it binds to the running event loop
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def load(self, name: str) -> HostLoad:
+        return self.loads.setdefault(name, HostLoad())
+
+    async def acquire(self, model: Optional[str] = None, ollama_url: Optional[str] = None) -> HostLease:
+        """
+        Returns a lease on the best host for `model`. With an explicit `ollama_url` that host is used;
+        it is still subject to the per-host cap when it is a registered fleet host.
+        """
+        hosts = dict(self.fleet.hosts)
+        if ollama_url:
+            url = normalize_ollama_url(ollama_url)
+            names = [name for name, host_url in hosts.items() if host_url == url]
+            if not names:
+                return HostLease(None, None, url)
+            hosts = {names[0]: url}
+        elif not hosts:
+            raise HTTPException(status_code=400, detail="No ollama_url given and no Ollama hosts are registered (see OLLAMA_HOSTS).")
+
+        loaded = await self._hosts_with_model_loaded(hosts, model) if model else set()
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        async with self._slot_freed:
+            while True:
+                name = self._pick(hosts, loaded)
+                if name is not None:
+                    load = self.load(name)
+                    load.in_flight += 1
+                    load.served += 1
+                    return HostLease(self, name, hosts[name], queued_seconds=time.monotonic() - started)
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise HTTPException(status_code=503, detail=(
+                        f"All {len(hosts)} Ollama host(s) are busy ({self.max_in_flight} operations each); "
+                        f"no slot freed up within {self.queue_timeout:g} seconds."
+                    ))
+                self.queued += 1
+                try:
+                    await asyncio.wait_for(self._slot_freed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    self.queued -= 1
+
+    def release(self, name: str) -> None:
+        load = self.load(name)
+        load.in_flight = max(load.in_flight - 1, 0)
+        asyncio.get_running_loop().create_task(self._notify())
+
+    def observe(self, name: str, latency: float) -> None:
+        load = self.load(name)
+        load.ewma_latency = latency if load.ewma_latency is None else (
+            self.alpha * latency + (1 - self.alpha) * load.ewma_latency
+        )
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "name": name,
+                "url": url,
+                "in_flight": self.load(name).in_flight,
+                "max_in_flight": self.max_in_flight,
+                "served": self.load(name).served,
+                "ewma_latency_ms": round(self.load(name).ewma_latency * 1000, 1) if self.load(name).ewma_latency is not None else None,
+                "loaded_models": self.loaded_models.get(url),
+            }
+            for name, url in sorted(self.fleet.hosts.items())
+        ]
+
+    def _pick(self, hosts: Dict[str, str], loaded: set) -> Optional[str]:
+        available = [name for name in hosts if self.load(name).in_flight < self.max_in_flight]
+        if not available:
+            return None
+        return min(available, key=lambda name: (
+            name not in loaded,
+            self.load(name).in_flight,
+            self.load(name).ewma_latency or 0.0,
+        ))
+
+    async def _hosts_with_model_loaded(self, hosts: Dict[str, str], model: str) -> set:
+        async def running(url: str) -> List[str]:
+            try:
+                return await self.loaded_models.get_or_fetch(url, lambda: ollama_service.fetch_running_ollama_models(
+                    url, timeout=settings.OLLAMA_ROUTER_PS_TIMEOUT_SECONDS))
+            except Exception:
+                return [] # An unreachable host just loses the "already loaded" preference
+
+        names = list(hosts)
+        results = await asyncio.gather(*(running(hosts[name]) for name in names))
+        return {name for name, models in zip(names, results) if _model_matches(model, models)}
+
+    async def _notify(self) -> None:
+        async with self._slot_freed:
+            self._slot_freed.notify_all()
+
+
+def _model_matches(model: str, running: List[str]) -> bool:
+    # Ollama reports "mistral:latest" for a request for "mistral"
+    wanted = model if ":" in model else f"{model}:latest"
+    return any(name == wanted or name == model for name in running)
+
+
+ollama_router = OllamaRouter()
@@ -1,9 +1,41 @@
+import hashlib
 import httpx
+import json
 import os
+import time
 from fastapi import HTTPException # Added
 from app.core.config import settings # Added
-from typing import List, Optional # Added
-from app.schemas.ollama_schemas import OllamaLocalModelInfo # Added
+from typing import AsyncIterator, Dict, List, Optional, Tuple # Added
+from app.schemas.ollama_schemas import OllamaLocalModelInfo, OllamaLocalModelsResponse # Added
+from app.core.cache import TTLCache
+from app.core.metrics import track_upstream
+from app.core.shared_store import shared_cache
+from app.core.singleflight import SingleFlight
+from app.services.ollama_clients import normalize_ollama_url, ollama_clients
+
+# Concurrent /api/tags calls for the same host (page loads, fleet listings) share one request
+ollama_tags_flight = SingleFlight("ollama_tags")
+
+# (host, version) -> {"models": {name: OllamaLocalModelInfo}, "body": serialized response}.
+# Lets /local-models answer ?since=<version> with a diff and re-send an unchanged list without re-serializing it.
+ollama_model_versions = TTLCache(
+    maxsize=settings.OLLAMA_MODEL_VERSIONS_MAX_ENTRIES,
+    ttl=settings.OLLAMA_MODEL_VERSIONS_TTL_SECONDS,
+)
+# In multi-worker mode, each version's model list is also shared, so a diff works whichever worker answers
+ollama_model_versions_shared = shared_cache("ollama_model_versions")
+
+def ollama_host_label(ollama_url: str) -> str:
+    """
+    `host` metrics label for an Ollama URL: the name it is registered under in the fleet, else "other".
+    URLs come from requests, so using them as labels would add series without bound.
+    """
+    from app.services.ollama_fleet import ollama_fleet # Imported lazily to avoid a cycle
+    base_url = normalize_ollama_url(ollama_url)
+    for name, url in ollama_fleet.hosts.items():
+        if url == base_url:
+            return name
+    return "other"
 
 # asyncio might not be needed if httpx handles its own timeouts well.
 
@@ -12,16 +44,14 @@ async def test_ollama_connection(ollama_url: str) -> dict:
     Tests connectivity to an Ollama API server.
     It tries to connect and get a response from Ollama's /api/tags endpoint.
     """
-    processed_url = ollama_url.strip()
-    if not processed_url.startswith("http://") and not processed_url.startswith("https://"):
-        processed_url = f"http://{processed_url}" # Default to http
-
-    # Ensure no trailing slash for base, then correctly append /api/tags
-    api_test_url = f"{processed_url.rstrip('/')}/api/tags"
+    # Normalized base has no trailing slash, so /api/tags can be appended directly
+    api_test_url = f"{normalize_ollama_url(ollama_url)}/api/tags"
+    timeout = settings.OLLAMA_CONNECTION_TEST_TIMEOUT_SECONDS
 
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(api_test_url)
+        async with ollama_clients.use(ollama_url) as client:
+            with track_upstream("ollama_tags", ollama_host_label(ollama_url)):
+                response = await client.get("/api/tags", timeout=timeout)
 
         if response.status_code == 200:
             # Further check if it's really Ollama by looking for expected JSON structure
@@ -38,7 +68,7 @@ async def test_ollama_connection(ollama_url: str) -> dict:
             return {"status": "failure", "message": f"Connected to {ollama_url}, but received status {response.status_code} from {api_test_url}. Response: {error_detail}"}
 
     except httpx.TimeoutException:
-        return {"status": "failure", "message": f"Connection to {api_test_url} timed out (5 seconds)."}
+        return {"status": "failure", "message": f"Connection to {api_test_url} timed out ({timeout:g} seconds)."}
     except httpx.ConnectError:
         return {"status": "failure", "message": f"Failed to connect to Ollama at {ollama_url} (attempted {api_test_url}). Check server, port, and if Ollama is running."}
     except httpx.RequestError as e:
@@ -49,31 +79,113 @@ async def test_ollama_connection(ollama_url: str) -> dict:
         return {"status": "failure", "message": f"An unexpected error occurred: {str(e)}"}
 
 
-async def get_local_ollama_models(ollama_url: str) -> List[OllamaLocalModelInfo]:
-    processed_url = ollama_url.strip()
-    if not processed_url.startswith("http://") and not processed_url.startswith("https://"):
-        processed_url = f"http://{processed_url}"
+async def fetch_local_ollama_models(ollama_url: str) -> List[OllamaLocalModelInfo]:
+    """
+    Lists the models of one Ollama instance from /api/tags.
+    Unlike `get_local_ollama_models`, failures propagate (`httpx.HTTPStatusError` / `httpx.RequestError`)
+    so callers such as the fleet inventory can tell an empty host from an unreachable one.
+    Concurrent calls for the same host are coalesced into one request.
+    """
+    return await ollama_tags_flight.do(normalize_ollama_url(ollama_url), lambda: _fetch_local_ollama_models(ollama_url))
+
+
+async def _fetch_local_ollama_models(ollama_url: str) -> List[OllamaLocalModelInfo]:
+    # Pooled client; default OLLAMA_TIMEOUT_SECONDS allows for a larger list
+    async with ollama_clients.use(ollama_url) as client:
+        with track_upstream("ollama_tags", ollama_host_label(ollama_url)):
+            response = await client.get("/api/tags")
+            response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
 
-    api_tags_url = f"{processed_url.rstrip('/')}/api/tags"
     local_models = []
+    data = response.json()
+    if "models" in data and isinstance(data["models"], list):
+        for model_data in data["models"]:
+            local_models.append(
+                OllamaLocalModelInfo(
+                    name=model_data.get("name"),
+                    modified_at=model_data.get("modified_at"),
+                    size=model_data.get("size"),
+                    digest=model_data.get("digest")
+                )
+            )
+    return local_models
+
+
+async def fetch_running_ollama_models(ollama_url: str, timeout: Optional[float] = None) -> List[str]:
+    """
+    Names of the models an Ollama instance currently has loaded in memory (/api/ps).
+    Raises `httpx.HTTPStatusError` / `httpx.RequestError` on failure.
+    """
+    async with ollama_clients.use(ollama_url) as client:
+        with track_upstream("ollama_ps", ollama_host_label(ollama_url)):
+            response = await client.get("/api/ps", timeout=timeout or settings.OLLAMA_TIMEOUT_SECONDS)
+            response.raise_for_status()
+    data = response.json()
+    return [model.get("name") or model.get("model") for model in data.get("models") or []]
+
+
+def ollama_models_version(models: List[OllamaLocalModelInfo]) -> str:
+    """Stable version of a model list: a hash of the sorted (name, digest) pairs, independent of order."""
+    hasher = hashlib.sha256()
+    for name, digest in sorted((model.name, model.digest or "") for model in models):
+        hasher.update(f"{name}\0{digest}\n".encode())
+    return hasher.hexdigest()[:20]
 
+
+async def get_versioned_local_ollama_models(ollama_url: str) -> Optional[Tuple[str, dict]]:
+    """
+    Returns `(version, snapshot)` for an instance's models, where the snapshot holds the models by name
+    and the serialized `OllamaLocalModelsResponse` body. Snapshots are cached per version, so an unchanged
+    list is serialized once. Returns None when Ollama cannot be reached, since an error must not look
+    like a version in which every model was removed.
+    """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client: # Increased timeout for potentially larger list
-            response = await client.get(api_tags_url)
-        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-
-        data = response.json()
-        if "models" in data and isinstance(data["models"], list):
-            for model_data in data["models"]:
-                local_models.append(
-                    OllamaLocalModelInfo(
-                        name=model_data.get("name"),
-                        modified_at=model_data.get("modified_at"),
-                        size=model_data.get("size"),
-                        digest=model_data.get("digest")
-                    )
-                )
-        return local_models
+        models = await fetch_local_ollama_models(ollama_url)
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Error fetching local Ollama models from {normalize_ollama_url(ollama_url)}/api/tags: {str(e)}")
+        return None
+
+    version = ollama_models_version(models)
+    key = (normalize_ollama_url(ollama_url), version)
+    snapshot = ollama_model_versions.get(key)
+    if snapshot is None:
+        snapshot = {
+            "models": {model.name: model for model in models},
+            "body": OllamaLocalModelsResponse(models=models, version=version).model_dump_json().encode(),
+        }
+        ollama_model_versions.set(key, snapshot)
+        if ollama_model_versions_shared is not None:
+            models_json = {name: model.model_dump(mode="json") for name, model in snapshot["models"].items()}
+            await ollama_model_versions_shared.aset(key, models_json, settings.OLLAMA_MODEL_VERSIONS_TTL_SECONDS)
+    return version, snapshot
+
+
+async def get_ollama_models_at_version(ollama_url: str, version: str) -> Optional[Dict[str, OllamaLocalModelInfo]]:
+    """The models of an earlier version by name, or None when that version is no longer known."""
+    key = (normalize_ollama_url(ollama_url), version)
+    snapshot = ollama_model_versions.get(key)
+    if snapshot is not None:
+        return snapshot["models"]
+    if ollama_model_versions_shared is not None:
+        record = await ollama_model_versions_shared.aget(key)
+        if record is not None:
+            return {name: OllamaLocalModelInfo(**model) for name, model in record[1].items()}
+    return None
+
+
+def diff_ollama_models(old: Dict[str, OllamaLocalModelInfo], new: Dict[str, OllamaLocalModelInfo]) -> dict:
+    return {
+        "added": [model for name, model in sorted(new.items()) if name not in old],
+        "removed": sorted(name for name in old if name not in new),
+        "changed": [model for name, model in sorted(new.items()) if name in old and old[name].digest != model.digest],
+    }
+
+
+async def get_local_ollama_models(ollama_url: str) -> List[OllamaLocalModelInfo]:
+    api_tags_url = f"{normalize_ollama_url(ollama_url)}/api/tags"
+
+    try:
+        return await fetch_local_ollama_models(ollama_url)
     except httpx.HTTPStatusError as e:
         # Log the error and response content for debugging
         print(f"HTTP error fetching local Ollama models from {api_tags_url}: {e.response.status_code} - {e.response.text[:200] if e.response.text else 'No response text'}")
@@ -89,18 +201,15 @@ async def get_local_ollama_models(ollama_url: str) -> List[OllamaLocalModelInfo]
         return []
 
 async def pull_model_ollama(ollama_url: str, model_name: str) -> dict:
-    processed_url = ollama_url.strip()
-    if not processed_url.startswith("http://") and not processed_url.startswith("https://"):
-        processed_url = f"http://{processed_url}"
-
-    api_pull_url = f"{processed_url.rstrip('/')}/api/pull"
     payload = {"name": model_name, "stream": False} # stream: False for a consolidated response
+    timeout = settings.OLLAMA_PULL_TIMEOUT_SECONDS
 
     try:
         # Pulling can take a very long time, default httpx timeout might be too short.
         # Using a longer timeout for pull operation.
-        async with httpx.AsyncClient(timeout=300.0) as client: # 5 minutes timeout
-            response = await client.post(api_pull_url, json=payload)
+        async with ollama_clients.use(ollama_url) as client:
+            with track_upstream("ollama_pull", ollama_host_label(ollama_url)):
+                response = await client.post("/api/pull", json=payload, timeout=timeout)
 
         # Ollama's /api/pull with stream:false gives 200 OK even if model is already present or if pull fails early.
         # The response body indicates the actual status.
@@ -133,10 +242,136 @@ async def pull_model_ollama(ollama_url: str, model_name: str) -> dict:
             error_message += " Could not parse error response."
         return {"status": "failure", "message": error_message}
     except httpx.TimeoutException:
-        return {"status": "failure", "message": f"Pulling model '{model_name}' from {ollama_url} timed out (5 minutes). The model might still be downloading in Ollama."}
+        return {"status": "failure", "message": f"Pulling model '{model_name}' from {ollama_url} timed out ({timeout:g} seconds). The model might still be downloading in Ollama."}
     except httpx.RequestError as e:
         return {"status": "failure", "message": f"Request error while trying to pull model '{model_name}': {str(e)}"}
     except Exception as e:
         print(f"Unexpected error pulling model '{model_name}' from {ollama_url}: {str(e)}")
         # import traceback; traceback.print_exc();
         return {"status": "failure", "message": f"An unexpected error occurred: {str(e)}"}
+
+
+async def stream_pull_ollama(ollama_url: str, model_name: str) -> AsyncIterator[dict]:
+    """
+    Pulls a model with `{"stream": true}` and yields Ollama's NDJSON progress objects as they arrive
+    (`status`, plus `digest`/`total`/`completed` while layers download).
+    Upstream is only read as fast as the caller consumes, so a slow client applies backpressure.
+    Failures are yielded as a final `{"error": ...}` object because the stream may already have started.
+    """
+    api_pull_url = f"{normalize_ollama_url(ollama_url)}/api/pull"
+    payload = {"name": model_name, "stream": True}
+    # No overall deadline: large pulls take as long as they take. Only a silent connection times out.
+    timeout = httpx.Timeout(10.0, read=settings.OLLAMA_PULL_READ_TIMEOUT_SECONDS)
+
+    try:
+        async with ollama_clients.use(ollama_url) as client:
+            with track_upstream("ollama_pull", ollama_host_label(ollama_url)) as tracked:
+                async with client.stream("POST", "/api/pull", json=payload, timeout=timeout) as response:
+                    if response.status_code >= 400:
+                        tracked.fail("HTTPStatusError")
+                        body = (await response.aread()).decode(errors="replace")
+                        try:
+                            detail = json.loads(body).get("error", body[:200])
+                        except ValueError:
+                            detail = body[:200] or "No response body"
+                        yield {"error": f"Ollama API returned an error: {response.status_code}. Detail: {detail}"}
+                        return
+
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            print(f"Skipping non-JSON line from {api_pull_url}: {line[:200]}")
+    except httpx.TimeoutException:
+        yield {"error": f"Ollama at {ollama_url} sent no progress for {settings.OLLAMA_PULL_READ_TIMEOUT_SECONDS:.0f} seconds while pulling '{model_name}'."}
+    except httpx.RequestError as e:
+        yield {"error": f"Request error while trying to pull model '{model_name}': {str(e)}"}
+
+
+# Ollama streams one JSON object per token; this is where the text of each kind of chunk lives
+_TOKEN_FIELDS = {
+    "chat": lambda chunk: (chunk.get("message") or {}).get("content", ""),
+    "generate": lambda chunk: chunk.get("response", ""),
+}
+_OLLAMA_STATS = ("done_reason", "total_duration", "load_duration", "prompt_eval_count",
+                 "prompt_eval_duration", "eval_count", "eval_duration")
+
+
+async def stream_ollama_generation(ollama_url: str, kind: str, payload: dict,
+                                   started: Optional[float] = None) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Proxies Ollama's /api/chat or /api/generate (`kind`) with streaming on, yielding `(event, data)` pairs:
+    - `("token", {"content", "index"})` per token; the first one also carries `ttft_ms`,
+    - `("done", {...})` with time to first token, total time, the proxy's own per-token overhead
+      (parse + re-encode time between reading a line from Ollama and handing the token on) and Ollama's stats,
+    - `("error", {"error"})` if Ollama fails; the stream ends after it.
+    `started` is a `time.perf_counter()` timestamp of when the request arrived, so TTFT includes routing.
+    The next line is only read from Ollama when the caller asks for the next event, so a slow client slows
+    generation reads instead of buffering; closing the iterator closes the upstream connection, which
+    makes Ollama stop generating.
+    """
+    started = started if started is not None else time.perf_counter()
+    token_text = _TOKEN_FIELDS[kind]
+    api_url = f"{normalize_ollama_url(ollama_url)}/api/{kind}"
+    # Loading a model into memory can take a while before the first token, so reads get a long timeout.
+    timeout = httpx.Timeout(10.0, read=settings.OLLAMA_GENERATE_READ_TIMEOUT_SECONDS)
+    tokens = 0
+    overhead = 0.0
+    ttft_ms = None
+
+    try:
+        async with ollama_clients.use(ollama_url) as client:
+            with track_upstream(f"ollama_{kind}", ollama_host_label(ollama_url)) as tracked:
+                async with client.stream("POST", f"/api/{kind}", json={**payload, "stream": True}, timeout=timeout) as response:
+                    if response.status_code >= 400:
+                        tracked.fail("HTTPStatusError")
+                        body = (await response.aread()).decode(errors="replace")
+                        try:
+                            detail = json.loads(body).get("error", body[:200])
+                        except ValueError:
+                            detail = body[:200] or "No response body"
+                        yield "error", {"error": f"Ollama API returned an error: {response.status_code}. Detail: {detail}"}
+                        return
+
+                    async for line in response.aiter_lines():
+                        received = time.perf_counter()
+                        if not line.strip():
+                            continue
+                        try:
+                            chunk = json.loads(line)
+                        except ValueError:
+                            print(f"Skipping non-JSON line from {api_url}: {line[:200]}")
+                            continue
+                        if "error" in chunk:
+                            tracked.fail("OllamaError")
+                            yield "error", {"error": chunk["error"]}
+                            return
+
+                        content = token_text(chunk)
+                        if content:
+                            event = {"content": content, "index": tokens}
+                            if ttft_ms is None:
+                                ttft_ms = round((received - started) * 1000, 1)
+                                event["ttft_ms"] = ttft_ms
+                            tokens += 1
+                            overhead += time.perf_counter() - received
+                            yield "token", event
+
+                        if chunk.get("done"):
+                            summary = {
+                                "ttft_ms": ttft_ms,
+                                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                                "tokens": tokens,
+                                "proxy_overhead_ms_per_token": round(overhead * 1000 / tokens, 4) if tokens else None,
+                            }
+                            summary.update({key: chunk[key] for key in _OLLAMA_STATS if key in chunk})
+                            yield "done", summary
+                            return
+                tracked.fail("IncompleteStream")
+                yield "error", {"error": "Ollama closed the stream before the response was done."}
+    except httpx.TimeoutException:
+        yield "error", {"error": f"Ollama at {ollama_url} sent nothing for {settings.OLLAMA_GENERATE_READ_TIMEOUT_SECONDS:.0f} seconds."}
+    except httpx.RequestError as e:
+        yield "error", {"error": f"Request error while calling {api_url}: {str(e)}"}
@@ -1,38 +1,26 @@
-import json
-import os
+"""
+Compatibility wrapper around `app.core.config_store`.
 
-SETTINGS_FILE = "settings.json"
-DEFAULT_SETTINGS = {'model_directory': 'downloaded_models/'}
+Settings used to be read from settings.json at import and rewritten synchronously here;
+they now live in the shared, cached `config_store`. New code should use it directly.
+"""
+from app.core.config_store import DEFAULT_CONFIG, config_store
+
+SETTINGS_FILE = config_store.path
+DEFAULT_SETTINGS = DEFAULT_CONFIG
 
 def load_settings():
-    """Reads settings from settings.json.
-    If the file doesn't exist or is invalid, it returns default settings.
-    """
-    if not os.path.exists(SETTINGS_FILE):
-        return DEFAULT_SETTINGS.copy()
-    try:
-        with open(SETTINGS_FILE, 'r') as f:
-            settings = json.load(f)
-            return settings
-    except (IOError, json.JSONDecodeError):
-        return DEFAULT_SETTINGS.copy()
+    """Returns all settings (stored values over defaults) from the in-memory cache."""
+    return config_store.all()
 
 def save_settings(settings_dict):
-    """Saves the provided dictionary to settings.json."""
-    try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings_dict, f, indent=4)
-        return True
-    except IOError:
-        return False
-
-_current_settings = load_settings()
+    """Saves the provided settings. Returns False if the file could not be written."""
+    return config_store.update(settings_dict)
 
 def get_setting(key):
-    """Returns the value of a specific setting key from the loaded settings."""
-    return _current_settings.get(key)
+    """Returns the value of a specific setting key."""
+    return config_store.get(key)
 
 def update_setting(key, value):
     """Updates a specific setting and saves the changes."""
-    _current_settings[key] = value
-    return save_settings(_current_settings)
+    return config_store.set(key, value)
@@ -1,72 +1,129 @@
+import codecs
 import requests
 import json
 import os
+import threading
+from requests.adapters import HTTPAdapter
 from .settings import get_setting
+from .services.model_store import download_repo_blocking
 
 HUGGINGFACE_API_BASE_URL = "https://huggingface.co/api/models"
+HUB_PAGE_SIZE = 100 # Models per Hub request while paginating
+HUB_TIMEOUT_SECONDS = 10
 
-def fetch_top_models():
+_session = None
+_session_lock = threading.Lock()
+
+def get_hub_session():
     """
-    Fetches the top 10 models from the Hugging Face API.
-    Returns a list of model dictionaries, each containing 'modelId' and 'pipeline_tag'.
-    Handles potential network or API errors.
+    Shared `requests.Session` for the helpers below, so repeated calls (and every page of a paginated
+    listing) reuse pooled keep-alive connections instead of doing a new TLS handshake each time.
     """
-    try:
-        response = requests.get(HUGGINGFACE_API_BASE_URL, timeout=10)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        models = response.json()
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        return _session
+
+def iter_hub_models(search=None, max_results=None, page_size=HUB_PAGE_SIZE, session=None):
+    """
+    Yields raw model records from the Hub listing, following its `Link: <...>; rel="next"` pagination
+    lazily: the next page is only requested once the caller has consumed the current one.
+    Each page is parsed as it streams in, so memory stays bounded by one record rather than a page,
+    and iteration stops (closing the connection) after `max_results` records.
+    Raises `requests.exceptions.RequestException` / `requests.exceptions.JSONDecodeError`.
+    """
+    session = session or get_hub_session()
+    if max_results is not None and max_results <= 0:
+        return
+    params = {"search": search} if search else {}
+    params["limit"] = min(page_size, max_results) if max_results is not None else page_size
+    url = HUGGINGFACE_API_BASE_URL
+    yielded = 0
+    while url:
+        # `params` encodes the query; later pages use the Hub's `next` URL as is
+        with session.get(url, params=params, timeout=HUB_TIMEOUT_SECONDS, stream=True) as response:
+            response.raise_for_status()
+            url = response.links.get("next", {}).get("url")
+            params = None
+            for model in _iter_json_array(response):
+                yield model
+                yielded += 1
+                if max_results is not None and yielded >= max_results:
+                    return
+
+def _iter_json_array(response, chunk_size=64 * 1024):
+    """Decodes the elements of a streamed top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, started = "", 0, False
+    for chunk in response.iter_content(chunk_size):
+        buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise requests.exceptions.JSONDecodeError("Expected a JSON array", buffer, pos)
+                started, pos = True, pos + 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError: # Element not complete yet; read more
+                break
+            yield item
+    raise requests.exceptions.JSONDecodeError("Unexpected end of JSON array", buffer, pos)
+
+def _model_info(model):
+    return {
+        'modelId': model.get('modelId'),
+        'pipeline_tag': model.get('pipeline_tag')
+    }
 
-        top_models = []
-        for model in models[:10]:
-            model_info = {
-                'modelId': model.get('modelId'),
-                'pipeline_tag': model.get('pipeline_tag')
-            }
-            top_models.append(model_info)
-        return top_models
+def fetch_top_models(limit=10):
+    """
+    Yields the first `limit` models of the Hugging Face API listing.
+    Each item is a dictionary containing 'modelId' and 'pipeline_tag'.
+    Handles potential network or API errors by printing them and stopping.
+    """
+    try:
+        for model in iter_hub_models(max_results=limit):
+            yield _model_info(model)
     except requests.exceptions.JSONDecodeError: # Must be before RequestException
         print("Error decoding JSON response from API.")
-        return []
     except requests.exceptions.RequestException as e: # This includes HTTPError and others
         print(f"Error fetching top models: {e}")
-        return []
     except Exception as e: # General fallback
         print(f"An unexpected error occurred: {e}")
-        return []
 
-def search_models(query):
+def search_models(query, max_results=None):
     """
-    Searches for models on the Hugging Face API based on a query.
-    Returns a list of model dictionaries, each containing 'modelId' and 'pipeline_tag'.
-    Handles potential network or API errors.
+    Yields the models matching `query` on the Hugging Face API, fetching further result pages
+    only as they are consumed, up to `max_results` (all matches when None).
+    Each item is a dictionary containing 'modelId' and 'pipeline_tag'.
+    Handles potential network or API errors by printing them and stopping.
     """
     try:
-        response = requests.get(f"{HUGGINGFACE_API_BASE_URL}?search={query}", timeout=10)
-        response.raise_for_status()
-        models = response.json()
-
-        search_results = []
-        for model in models:
-            model_info = {
-                'modelId': model.get('modelId'),
-                'pipeline_tag': model.get('pipeline_tag')
-            }
-            search_results.append(model_info)
-        return search_results
+        for model in iter_hub_models(search=query, max_results=max_results):
+            yield _model_info(model)
     except requests.exceptions.JSONDecodeError: # Must be before RequestException
         print("Error decoding JSON response from API.")
-        return []
     except requests.exceptions.RequestException as e: # This includes HTTPError and others
         print(f"Error searching models for query '{query}': {e}")
-        return []
     except Exception as e: # General fallback
         print(f"An unexpected error occurred during search: {e}")
-        return []
 
 def download_model(model_id, download_directory=None):
     """
-    Placeholder for model download functionality.
-    Prints a message simulating the download.
+    Downloads all files of a Hugging Face model into the model store at `download_directory`
+    (or the configured model directory), the same deduplicated store and `<org>__<model>` snapshot
+    the API downloads into. Returns the store's result dict, or None on failure.
     """
     if download_directory is None:
         download_directory = get_setting('model_directory')
@@ -82,23 +139,27 @@ def download_model(model_id, download_directory=None):
             print(f"Error creating directory {download_directory}: {e}")
             return
 
-    print(f"Simulating download of {model_id} to {download_directory}")
+    print(f"Downloading {model_id} to {download_directory}")
+    try:
+        result = download_repo_blocking(model_id, download_directory)
+    except Exception as e:
+        print(f"Error downloading {model_id}: {e}")
+        return None
+    print(f"Downloaded {result['files']} files ({result['bytes']} bytes) to {result['path']}")
+    return result
 
 # Example usage (optional, can be removed or commented out)
 if __name__ == '__main__':
     print("Fetching top models...")
-    top_models = fetch_top_models()
-    if top_models:
-        for model in top_models:
-            print(f"- {model['modelId']} ({model.get('pipeline_tag', 'N/A')})")
+    top_models = list(fetch_top_models())
+    for model in top_models:
+        print(f"- {model['modelId']} ({model.get('pipeline_tag', 'N/A')})")
 
     print("\nSearching for 'text-generation' models...")
-    searched_models = search_models("text-generation")
-    if searched_models:
-        for model in searched_models[:5]: # Print top 5 results for brevity
-            print(f"- {model['modelId']} ({model.get('pipeline_tag', 'N/A')})")
+    for model in search_models("text-generation", max_results=5): # Only the first page is fetched
+        print(f"- {model['modelId']} ({model.get('pipeline_tag', 'N/A')})")
 
-    print("\nSimulating model download...")
+    print("\nDownloading a model...")
     if top_models:
         download_model(top_models[0]['modelId'])
         download_model("user/specific-model-test", "custom_downloads/")
@@ -0,0 +1,288 @@
+"""
+Load test: runs the real app against local Hub and Ollama stand-ins and reports latency and throughput.
+
+    python -m benchmarks.load [--concurrency 1,8,32] [--duration 5] [--latency-ms 20] [--scenarios hf_list,ollama_chat]
+    python -m benchmarks.load --save-baseline     # Record the current numbers in benchmarks/baseline.json
+
+The stand-ins (`benchmarks.standins`) and the app (`app.main:app`, one uvicorn worker) each run in their own
+process, so the load generator does not compete with the app for its event loop. Every scenario runs for
+`--duration` seconds at each concurrency level (that many clients sending back-to-back requests) after a short
+warm-up, and reports p50/p95/p99 latency of complete responses (streams included) and requests per second.
+Results are compared with the stored baseline; a p95 above or a throughput below it by more than `--tolerance`
+is reported as a regression (exit code 1 with `--fail-on-regression`). Baselines are machine-specific:
+record one on the machine that runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.standins import StandinConfig
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SEARCH_TERMS = ["bert", "llama", "gpt", "vit", "t5"]
+
+
+@dataclass
+class Scenario:
+    description: str
+    request: Callable[[int, str], Tuple[str, str, Optional[dict]]] # (i, ollama_url) -> (method, path, json body)
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "hf_list_cached": Scenario(
+        "Model listing for a few popular searches (served from the listing cache after warm-up)",
+        lambda i, ollama: ("GET", f"/api/v1/hf-models/?limit=12&search={SEARCH_TERMS[i % len(SEARCH_TERMS)]}", None),
+    ),
+    "hf_list_uncached": Scenario(
+        "Model listing with a new search each time (one Hub round trip per request)",
+        lambda i, ollama: ("GET", f"/api/v1/hf-models/?limit=12&search=model-{i}", None),
+    ),
+    "hf_suggest": Scenario(
+        "Search-as-you-type over the in-memory index",
+        lambda i, ollama: ("GET", f"/api/v1/hf-models/suggest?q={'model-'[:1 + i % 6]}{i % 10}", None),
+    ),
+    "ollama_local_models": Scenario(
+        "Ollama model listing (/api/tags)",
+        lambda i, ollama: ("GET", f"/api/v1/ollama/local-models?ollama_url={ollama}", None),
+    ),
+    "ollama_pull_stream": Scenario(
+        "Streamed pull, relayed as NDJSON progress",
+        lambda i, ollama: ("POST", "/api/v1/ollama/pull-model",
+                           {"model_name": f"model-{i % 20}:latest", "ollama_url": ollama, "stream": True}),
+    ),
+    "ollama_chat": Scenario(
+        "Streamed chat completion, relayed as Server-Sent Events",
+        lambda i, ollama: ("POST", "/api/v1/ollama/chat",
+                           {"ollama_url": ollama, "model": "model-0:latest", "messages": [{"role": "user", "content": "hi"}]}),
+    ),
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list (`q` in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run_level(client: httpx.AsyncClient, scenario: Scenario, ollama_url: str, concurrency: int,
+                    duration: float, warmup: float) -> dict:
+    counter = 0
+    latencies: List[float] = []
+    errors = 0
+
+    async def one_request(record: bool) -> None:
+        nonlocal counter, errors
+        method, path, body = scenario.request(counter, ollama_url)
+        counter += 1
+        started = time.perf_counter()
+        try:
+            async with client.stream(method, path, json=body) as response:
+                async for _ in response.aiter_raw():
+                    pass
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        if record:
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    async def client_loop(deadline: float, record: bool) -> None:
+        while time.perf_counter() < deadline:
+            await one_request(record)
+
+    await asyncio.gather(*(client_loop(time.perf_counter() + warmup, False) for _ in range(concurrency)))
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(started + duration, True) for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+
+
+async def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server for {url} did not start within {timeout:.0f} seconds")
+
+
+async def run_suite(scenarios: List[str], levels: List[int], duration: float, warmup: float,
+                    standin: StandinConfig, app_env: Dict[str, str]) -> dict:
+    standin_port, app_port = free_port(), free_port()
+    standin_url = f"http://127.0.0.1:{standin_port}"
+    state_dir = tempfile.TemporaryDirectory(prefix="otto-bench-")
+    env = {
+        "HF_ENDPOINT": standin_url,
+        "HF_TOKEN": "",
+        "OLLAMA_HOSTS": json.dumps({"standin": standin_url}),
+        "MODEL_DOWNLOAD_DIRECTORY": os.path.join(state_dir.name, "models"),
+        "CONFIG_STORE_PATH": os.path.join(state_dir.name, "settings.json"),
+        "HF_CATALOG_ENABLED": "false",
+        "WORKERS": "1",
+        **app_env,
+    }
+    processes = [start_server("benchmarks.standins:app", standin_port, standin.to_env())]
+    try:
+        await wait_until_ready(f"{standin_url}/api/tags", processes[0])
+        processes.append(start_server("app.main:app", app_port, env))
+        app_url = f"http://127.0.0.1:{app_port}"
+        await wait_until_ready(f"{app_url}/api/v1/hf-models/suggest/status", processes[1])
+
+        results: Dict[str, Dict[str, dict]] = {}
+        limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+        async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=60.0) as client:
+            await wait_for_suggest_index(client)
+            for name in scenarios:
+                results[name] = {}
+                for level in levels:
+                    results[name][str(level)] = await run_level(client, SCENARIOS[name], standin_url, level, duration, warmup)
+                    print_row(name, level, results[name][str(level)])
+        return {
+            "config": {"duration": duration, "warmup": warmup, "standin": asdict(standin), "app_env": app_env},
+            "python": sys.version.split()[0],
+            "results": results,
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+        state_dir.cleanup()
+
+
+async def wait_for_suggest_index(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    # The suggest index is built in the background at startup; measure it once it is ready
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if (await client.get("/api/v1/hf-models/suggest/status")).json().get("ready"):
+            return
+        await asyncio.sleep(0.2)
+
+
+HEADER = f"{'scenario':<22}{'conc':>5}{'reqs':>8}{'err':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+
+
+def print_row(name: str, level: int, result: dict, note: str = "") -> None:
+    print(f"{name:<22}{level:>5}{result['requests']:>8}{result['errors']:>6}{result['rps']:>9.1f}"
+          f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}  {note}".rstrip())
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Returns one line per scenario/concurrency that regressed beyond `tolerance` (a fraction)."""
+    regressions = []
+    for name, levels in results["results"].items():
+        for level, result in levels.items():
+            base = baseline.get("results", {}).get(name, {}).get(level)
+            if not base:
+                continue
+            if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{name} x{level}: p95 {result['p95_ms']:.2f} ms vs baseline {base['p95_ms']:.2f} ms")
+            if base["rps"] and result["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append(f"{name} x{level}: {result['rps']:.1f} req/s vs baseline {base['rps']:.1f} req/s")
+            if result["errors"] > base["errors"]:
+                regressions.append(f"{name} x{level}: {result['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Measured seconds per scenario and level.")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--latency-ms", type=float, default=StandinConfig.latency_ms, help="Stand-in response latency.")
+    parser.add_argument("--hub-models", type=int, default=StandinConfig.hub_models)
+    parser.add_argument("--ollama-models", type=int, default=StandinConfig.ollama_models)
+    parser.add_argument("--pull-steps", type=int, default=StandinConfig.pull_steps)
+    parser.add_argument("--chat-tokens", type=int, default=StandinConfig.chat_tokens)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="Extra app setting, repeatable.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to --baseline.")
+    parser.add_argument("--output", help="Also write the results as JSON to this file.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95/throughput change, as a fraction.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+    standin = StandinConfig(latency_ms=args.latency_ms, hub_models=args.hub_models, ollama_models=args.ollama_models,
+                            pull_steps=args.pull_steps, chat_tokens=args.chat_tokens)
+    app_env = dict(item.split("=", 1) for item in args.app_env)
+
+    print(HEADER)
+    results = asyncio.run(run_suite(scenarios, levels, args.duration, args.warmup, standin, app_env))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; record one with --save-baseline.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != results["config"]:
+        print("\nNote: the baseline was recorded with different settings; differences may not be regressions.")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        if args.fail_on_regression:
+            sys.exit(1)
+    else:
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
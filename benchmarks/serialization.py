@@ -0,0 +1,108 @@
+"""
+Micro-benchmark for the HF model listing response: per-item cost of serializing a 100-item page
+with FastAPI's `response_model` path versus the opt-in `FAST_SERIALIZATION` path.
+
+    python -m benchmarks.serialization [--items 100] [--rounds 2000]
+
+Two measurements:
+- serialize: the encoding step alone (validate into HFModelResponse + dump to JSON, vs. encode the dict),
+- request:   a full in-process request through a FastAPI app (routing, validation, encoding, ASGI).
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi import FastAPI
+from pydantic import TypeAdapter
+
+from app.core.serialization import ORJSON_AVAILABLE, FastJSONResponse, dumps_bytes
+from app.schemas.model_schemas import HFModelResponse
+from app.services.huggingface_service import transform_hub_model
+
+
+def make_page(items: int) -> dict:
+    hub_records = [{
+        "id": f"org-{i % 37}/model-{i}", "author": f"org-{i % 37}", "downloads": 1_000_000 - i * 17, "likes": i * 3,
+        "private": False, "lastModified": "2024-05-01T12:00:00.000Z", "pipeline_tag": "text-generation",
+        "tags": ["transformers", "pytorch", "safetensors", "text-generation", "en", "license:apache-2.0"],
+    } for i in range(items)]
+    return {
+        "items": [transform_hub_model(record) for record in hub_records],
+        "total": 10_000, "total_is_estimate": False, "page": 1, "limit": items,
+        "next_cursor": "eyJmaWxlX25hbWUiOiJtb2RlbC0xMDAifQ", "has_more": True,
+    }
+
+
+def per_item_us(fn, rounds: int, items: int) -> float:
+    fn() # Warm up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds / items * 1e6
+
+
+def bench_serialize(page: dict, rounds: int) -> dict:
+    adapter = TypeAdapter(HFModelResponse)
+    items = len(page["items"])
+
+    def response_model_path(): # What FastAPI does with response_model: validate, then dump to JSON bytes
+        return adapter.dump_json(adapter.validate_python(page), by_alias=True)
+
+    def legacy_path(): # Older FastAPI: validate, dump to Python, json.dumps
+        value = adapter.validate_python(page)
+        return json.dumps(adapter.dump_python(value, mode="json", by_alias=True), separators=(",", ":")).encode()
+
+    def fast_path():
+        return dumps_bytes(page)
+
+    assert json.loads(response_model_path()) == json.loads(fast_path()), "fast path output differs from response_model output"
+    return {
+        "response_model (validate + dump_json)": per_item_us(response_model_path, rounds, items),
+        "legacy (validate + json.dumps)": per_item_us(legacy_path, rounds, items),
+        "fast (dumps_bytes)": per_item_us(fast_path, rounds, items),
+    }
+
+
+async def bench_requests(page: dict, rounds: int) -> dict:
+    app = FastAPI()
+
+    @app.get("/validated", response_model=HFModelResponse)
+    async def validated():
+        return page
+
+    @app.get("/fast", response_model=HFModelResponse)
+    async def fast():
+        return FastJSONResponse(page)
+
+    results = {}
+    items = len(page["items"])
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for name, path in (("response_model", "/validated"), ("fast", "/fast")):
+            await client.get(path)
+            started = time.perf_counter()
+            for _ in range(rounds):
+                await client.get(path)
+            results[name] = (time.perf_counter() - started) / rounds / items * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    page = make_page(args.items)
+    print(f"{args.items}-item page, {len(dumps_bytes(page))} bytes of JSON, orjson {'available' if ORJSON_AVAILABLE else 'not installed'}")
+    print("\nserialize (us per item):")
+    for name, cost in bench_serialize(page, args.rounds).items():
+        print(f"  {name:<40} {cost:8.3f}")
+    print("\nin-process request (us per item):")
+    for name, cost in asyncio.run(bench_requests(page, max(args.rounds // 10, 50))).items():
+        print(f"  {name:<40} {cost:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Local stand-ins for the Hugging Face Hub and Ollama, used by `benchmarks.load`.
+
+    python -m uvicorn benchmarks.standins:app --port 9100
+
+Serves, with a fixed added latency and configurable payload sizes:
+- Hub:    GET /api/models (search, sort, limit, cursor paging via `Link`, `X-Total-Count`), GET /api/models/{id}
+- Ollama: GET /api/tags, GET /api/ps, POST /api/pull (NDJSON progress), POST /api/chat and /api/generate (NDJSON tokens)
+
+Settings come from STANDIN_* environment variables (see `StandinConfig`) so the load test can start it as a
+separate process; responses are deterministic so runs are comparable.
+"""
+import asyncio
+import json
+import os
+from dataclasses import dataclass, fields
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StandinConfig:
+    latency_ms: float = 20.0        # Added before every response (time to headers)
+    hub_models: int = 5000          # Size of the fake Hub catalog
+    ollama_models: int = 20         # Models listed by /api/tags
+    pull_steps: int = 50            # Progress lines per pull
+    pull_step_ms: float = 2.0       # Delay between progress lines
+    chat_tokens: int = 64           # Tokens per chat/generate reply
+    token_interval_ms: float = 2.0  # Delay between tokens
+
+    @classmethod
+    def from_env(cls) -> "StandinConfig":
+        values = {}
+        for field in fields(cls):
+            raw = os.environ.get(f"STANDIN_{field.name.upper()}")
+            if raw is not None:
+                values[field.name] = type(field.default)(raw)
+        return cls(**values)
+
+    def to_env(self) -> dict:
+        return {f"STANDIN_{field.name.upper()}": str(getattr(self, field.name)) for field in fields(self)}
+
+
+def hub_model(index: int) -> dict:
+    author = f"org-{index % 97}"
+    return {
+        "id": f"{author}/model-{index}", "modelId": f"{author}/model-{index}", "author": author,
+        "downloads": 10_000_000 // (index + 1), "likes": (index * 7) % 5000, "private": False,
+        "lastModified": "2024-05-01T12:00:00.000Z", "pipeline_tag": "text-generation",
+        "tags": ["transformers", "pytorch", "safetensors", "text-generation", "en", "license:apache-2.0"],
+        "sha": f"{index:040x}",
+    }
+
+
+def create_app(config: StandinConfig) -> FastAPI:
+    app = FastAPI(title="Hub and Ollama stand-ins")
+    catalog = [hub_model(i) for i in range(config.hub_models)]
+    tags = [{
+        "name": f"model-{i}:latest", "model": f"model-{i}:latest", "modified_at": "2024-05-01T12:00:00Z",
+        "size": 4_000_000_000 + i, "digest": f"{i:064x}",
+    } for i in range(config.ollama_models)]
+
+    async def delay():
+        if config.latency_ms:
+            await asyncio.sleep(config.latency_ms / 1000)
+
+    @app.get("/api/models")
+    async def list_models(request: Request, search: str = "", sort: str = "downloads", limit: int = 20, cursor: int = 0):
+        await delay()
+        matches = [model for model in catalog if search.lower() in model["id"].lower()] if search else catalog
+        if sort in ("likes", "downloads"):
+            matches = sorted(matches, key=lambda model: model[sort], reverse=True)
+        page = matches[cursor:cursor + limit]
+        headers = {"X-Total-Count": str(len(matches))}
+        if cursor + limit < len(matches):
+            next_url = request.url.include_query_params(cursor=cursor + limit)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return JSONResponse(page, headers=headers)
+
+    @app.get("/api/models/{model_id:path}")
+    async def get_model(model_id: str):
+        await delay()
+        index = int(model_id.rsplit("-", 1)[-1]) if model_id.rsplit("-", 1)[-1].isdigit() else -1
+        if not 0 <= index < len(catalog) or catalog[index]["id"] != model_id:
+            return JSONResponse({"error": "Repository not found"}, status_code=404)
+        return catalog[index]
+
+    @app.get("/api/tags")
+    async def list_tags():
+        await delay()
+        return {"models": tags}
+
+    @app.get("/api/ps")
+    async def list_running():
+        await delay()
+        return {"models": tags[:1]}
+
+    async def ndjson(lines, interval_ms: float):
+        for line in lines:
+            yield json.dumps(line) + "\n"
+            if interval_ms:
+                await asyncio.sleep(interval_ms / 1000)
+
+    @app.post("/api/pull")
+    async def pull(request: Request):
+        body = await request.json()
+        await delay()
+        total = 1_000_000
+        steps = [{"status": "pulling manifest"}]
+        steps += [{"status": "pulling 0123abcd", "digest": "sha256:0123abcd", "total": total,
+                   "completed": total * (i + 1) // config.pull_steps} for i in range(config.pull_steps)]
+        steps += [{"status": "verifying sha256 digest"}, {"status": "success"}]
+        if not body.get("stream", True):
+            return steps[-1]
+        return StreamingResponse(ndjson(steps, config.pull_step_ms), media_type="application/x-ndjson")
+
+    def token_stream(kind: str, model: str):
+        for i in range(config.chat_tokens):
+            text = f"tok{i} "
+            yield {"model": model, "done": False, **({"message": {"role": "assistant", "content": text}} if kind == "chat" else {"response": text})}
+        yield {"model": model, "done": True, "done_reason": "stop", "eval_count": config.chat_tokens,
+               **({"message": {"role": "assistant", "content": ""}} if kind == "chat" else {"response": ""})}
+
+    @app.post("/api/{kind}")
+    async def generate(kind: str, request: Request):
+        if kind not in ("chat", "generate"):
+            return JSONResponse({"error": "not found"}, status_code=404)
+        body = await request.json()
+        await delay()
+        return StreamingResponse(ndjson(token_stream(kind, body.get("model", "")), config.token_interval_ms),
+                                 media_type="application/x-ndjson")
+
+    return app
+
+
+app = create_app(StandinConfig.from_env())
@@ -35,6 +35,8 @@ document.addEventListener('DOMContentLoaded', () => {
     let selectedModel = null;
     let selectedProvider = null;
     let selectedEngine = null; // New variable for selected engine
+    let activeChatConfig = null; // { model, ollamaUrl } once a local Ollama model is applied
+    let chatHistory = []; // Messages sent to /ollama/chat for the active model
 
     // --- Sidebar Functionality ---
     const leftSidebar = document.getElementById('leftSidebar');
@@ -196,6 +198,24 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Returns suggested models for a search prefix, or null while the suggest index is not built yet
+    async function fetchModelSuggestions(searchTerm, limit = 10) {
+        const params = new URLSearchParams({ q: searchTerm, limit: limit });
+        try {
+            const response = await fetch(`${backendBaseUrl}/hf-models/suggest?${params.toString()}`);
+            if (!response.ok) return null;
+            const responseData = await response.json();
+            if (!responseData.ready) return null;
+            if (responseData.items.length === 0 && modelListContainer) {
+                modelListContainer.innerHTML = `<p class="no-results-message">No models start with "${searchTerm}". Press Enter to search all models.</p>`;
+            }
+            return responseData.items;
+        } catch (error) {
+            console.error('Error fetching model suggestions:', error);
+            return null;
+        }
+    }
+
     async function fetchProvidersForModelFromBackend(modelId) {
         console.log(`Fetching providers for model (simulated): ${modelId}...`);
         if (providerListContainer) providerListContainer.innerHTML = '<p class="loading-message">Loading providers...</p>';
@@ -268,7 +288,53 @@ document.addEventListener('DOMContentLoaded', () => {
     function handleSendMessage() {
         if (!messageInput) return;
         const text = messageInput.value.trim();
-        if (text) { addMessage(text, 'user'); messageInput.value = ''; setTimeout(() => simulateAIResponse(text), 1000); }
+        if (!text) return;
+        addMessage(text, 'user'); messageInput.value = '';
+        if (activeChatConfig) { streamOllamaChat(text); } else { setTimeout(() => simulateAIResponse(text), 1000); }
+    }
+
+    // Streams the reply from /ollama/chat (Server-Sent Events over a POST, so fetch + reader instead of EventSource)
+    async function streamOllamaChat(userText) {
+        chatHistory.push({ role: 'user', content: userText });
+        addMessage('', 'ai');
+        const paragraph = messageList.lastElementChild.querySelector('p');
+        let reply = '';
+        try {
+            const response = await fetch(`${backendBaseUrl}/ollama/chat`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+                body: JSON.stringify({ ollama_url: activeChatConfig.ollamaUrl, model: activeChatConfig.model, messages: chatHistory })
+            });
+            if (!response.ok) throw new Error(`HTTP error ${response.status}`);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const frames = buffer.split('\n\n');
+                buffer = frames.pop(); // Keep an incomplete frame for the next read
+                for (const frame of frames) {
+                    const event = (frame.match(/^event: (.*)$/m) || [])[1];
+                    const data = JSON.parse(frame.split('\n').filter(line => line.startsWith('data: ')).map(line => line.slice(6)).join('\n') || '{}');
+                    if (event === 'token') {
+                        reply += data.content;
+                        paragraph.textContent = reply;
+                        messageList.scrollTop = messageList.scrollHeight;
+                    } else if (event === 'done') {
+                        console.log(`Ollama reply: first token after ${data.ttft_ms} ms, ${data.tokens} tokens in ${data.total_ms} ms`);
+                    } else if (event === 'error') {
+                        throw new Error(data.error);
+                    }
+                }
+            }
+            chatHistory.push({ role: 'assistant', content: reply });
+        } catch (error) {
+            console.error('Error streaming chat from Ollama:', error);
+            paragraph.textContent = reply ? `${reply} [interrupted: ${error.message}]` : `Error: ${error.message}`;
+            chatHistory.pop(); // Let the user retry the same question
+        }
     }
     function simulateAIResponse(userText) { addMessage(`Mock AI received: '${userText}'`, 'ai'); }
 
@@ -744,9 +810,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 selectedProvider = { name: "Local Execution", tier: "N/A", price: "N/A" }; // Placeholder provider for local
                 configComplete = true;
                 if (activeConfigDisplay) activeConfigDisplay.textContent = `Engine: Local Llama, Model: ${selectedModel.name}`;
+                activeChatConfig = selectedModel.isLocalOllama ? { model: selectedModel.id, ollamaUrl: ollamaApiUrlInput.value.trim() } : null;
+                chatHistory = [];
             } else if (selectedEngine && selectedEngine.startsWith('cloud_provider_') && selectedModel && selectedProvider) {
                 configComplete = true;
                 if (activeConfigDisplay) activeConfigDisplay.textContent = `Engine: ${selectedEngine}, Model: ${selectedModel.name}, Provider: ${selectedProvider.name} (${selectedProvider.tier}) - ${selectedProvider.price}`;
+                activeChatConfig = null; // Cloud providers are still mocked
             }
 
             if (configComplete) {
@@ -761,14 +830,24 @@ document.addEventListener('DOMContentLoaded', () => {
 
     if (modelSearchInput && modelListContainer) {
         let searchTimeout;
+        // Typing is answered from the backend's in-memory prefix index (/suggest), so it can run on
+        // a short debounce. Enter runs the full substring search against the listing endpoint.
         modelSearchInput.addEventListener('input', () => {
             clearTimeout(searchTimeout);
-            searchTimeout = setTimeout(() => {
+            searchTimeout = setTimeout(async () => {
                 const searchTerm = modelSearchInput.value.trim();
-                fetchModelsFromBackend({ searchTerm: searchTerm, limit: 20 }).then(models => {
-                   renderModelCards(models);
-                });
-            }, 300);
+                const suggestions = await fetchModelSuggestions(searchTerm, 20);
+                if (modelSearchInput.value.trim() !== searchTerm) return; // A newer keystroke is in flight
+                const models = suggestions || await fetchModelsFromBackend({ searchTerm: searchTerm, limit: 20 });
+                renderModelCards(models);
+            }, 80);
+        });
+        modelSearchInput.addEventListener('keydown', (event) => {
+            if (event.key !== 'Enter') return;
+            clearTimeout(searchTimeout);
+            fetchModelsFromBackend({ searchTerm: modelSearchInput.value.trim(), limit: 20 }).then(models => {
+               renderModelCards(models);
+            });
         });
     }
 
@@ -10,7 +10,7 @@ from unittest.mock import patch, MagicMock
 # import sys
 # sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.utils import fetch_top_models, search_models, download_model
+from app.utils import fetch_top_models, search_models, download_model, _iter_json_array
 from app.settings import DEFAULT_SETTINGS # For checking default download dir
 
 # Sample API responses
@@ -22,13 +22,15 @@ SAMPLE_MODELS_RESPONSE = [
 
 SAMPLE_EMPTY_RESPONSE = []
 
+SAMPLE_DOWNLOAD_RESULT = {"repo_id": "test_model", "revision": "main", "path": "dir/test_model", "files": 2, "bytes": 10, "sha256": {}}
+
 class TestApiUtils(unittest.TestCase):
 
     @requests_mock.Mocker()
     def test_fetch_top_models_success(self, m):
         m.get("https://huggingface.co/api/models", json=SAMPLE_MODELS_RESPONSE)
 
-        result = fetch_top_models()
+        result = list(fetch_top_models())
 
         self.assertEqual(len(result), 3) # Expecting all 3 as top if API returns < 10
         self.assertEqual(result[0]['modelId'], "model1")
@@ -42,11 +44,11 @@ class TestApiUtils(unittest.TestCase):
 
     @requests_mock.Mocker()
     def test_fetch_top_models_api_error(self, m):
-        url = "https://huggingface.co/api/models"
+        url = "https://huggingface.co/api/models?limit=10"
         m.get(url, status_code=500, text="Internal Server Error")
 
         with patch('builtins.print') as mock_print: # Suppress print output during test
-            result = fetch_top_models()
+            result = list(fetch_top_models())
 
         self.assertEqual(result, [])
         self.assertTrue(m.called)
@@ -60,7 +62,7 @@ class TestApiUtils(unittest.TestCase):
     def test_fetch_top_models_json_decode_error(self, m):
         m.get("https://huggingface.co/api/models", text="Not a valid JSON")
         with patch('builtins.print') as mock_print:
-            result = fetch_top_models()
+            result = list(fetch_top_models())
         self.assertEqual(result, [])
         # Debug print removed for brevity, previous step confirmed it's now correct
         mock_print.assert_called_once_with("Error decoding JSON response from API.")
@@ -70,7 +72,7 @@ class TestApiUtils(unittest.TestCase):
         query = "test_query"
         m.get(f"https://huggingface.co/api/models?search={query}", json=SAMPLE_MODELS_RESPONSE)
 
-        result = search_models(query)
+        result = list(search_models(query))
 
         self.assertEqual(len(result), 3)
         self.assertEqual(result[0]['modelId'], "model1")
@@ -82,7 +84,7 @@ class TestApiUtils(unittest.TestCase):
         query = "non_existent_query"
         m.get(f"https://huggingface.co/api/models?search={query}", json=SAMPLE_EMPTY_RESPONSE)
 
-        result = search_models(query)
+        result = list(search_models(query))
 
         self.assertEqual(result, [])
         self.assertTrue(m.called)
@@ -90,11 +92,11 @@ class TestApiUtils(unittest.TestCase):
     @requests_mock.Mocker()
     def test_search_models_api_error(self, m):
         query = "error_query"
-        url = f"https://huggingface.co/api/models?search={query}"
+        url = f"https://huggingface.co/api/models?search={query}&limit=100"
         m.get(url, status_code=503, text="Service Unavailable")
 
         with patch('builtins.print') as mock_print:
-            result = search_models(query)
+            result = list(search_models(query))
 
         self.assertEqual(result, [])
         self.assertTrue(m.called)
@@ -102,11 +104,49 @@ class TestApiUtils(unittest.TestCase):
         expected_print = f"Error searching models for query '{query}': 503 Server Error: None for url: {url}"
         mock_print.assert_called_once_with(expected_print)
 
+    @requests_mock.Mocker()
+    def test_search_models_follows_pages_lazily_up_to_the_cap(self, m):
+        base = "https://huggingface.co/api/models"
+        page_2 = f"{base}?search=bert&limit=100&cursor=abc"
+        m.get(f"{base}?search=bert", complete_qs=False, json=SAMPLE_MODELS_RESPONSE,
+              headers={"Link": f'<{page_2}>; rel="next"'})
+        m.get(page_2, json=[{"modelId": "model4", "pipeline_tag": None}])
+
+        results = search_models("bert")
+        self.assertEqual(m.call_count, 0) # Nothing is fetched until iteration starts
+        self.assertEqual(next(results)['modelId'], "model1")
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual([model['modelId'] for model in results], ["model2", "model3", "model4"])
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(m.request_history[1].qs['cursor'], ["abc"])
+
+        m.reset_mock()
+        self.assertEqual(len(list(search_models("bert", max_results=2))), 2)
+        self.assertEqual(m.call_count, 1) # The cap is reached on the first page
+        self.assertEqual(m.last_request.qs['limit'], ["2"])
+
+    def test_json_array_is_decoded_across_chunk_boundaries(self):
+        body = json.dumps([{"modelId": "café/modèle", "n": i} for i in range(5)], ensure_ascii=False).encode("utf-8")
+        response = MagicMock()
+        response.iter_content.return_value = [body[i:i + 3] for i in range(0, len(body), 3)]
+        self.assertEqual([item["n"] for item in _iter_json_array(response)], [0, 1, 2, 3, 4])
+
+        response.iter_content.return_value = [b'[{"modelId": "truncated"']
+        with self.assertRaises(requests.exceptions.JSONDecodeError):
+            list(_iter_json_array(response))
+
+    @requests_mock.Mocker()
+    def test_search_models_encodes_the_query(self, m):
+        m.get("https://huggingface.co/api/models", json=SAMPLE_EMPTY_RESPONSE)
+        list(search_models("llama 3&sort=likes"))
+        self.assertIn("search=llama+3%26sort%3Dlikes", m.last_request.url)
+
+    @patch('app.utils.download_repo_blocking', return_value=SAMPLE_DOWNLOAD_RESULT)
     @patch('app.utils.get_setting')
     @patch('app.utils.os.makedirs')
     @patch('app.utils.os.path.exists')
     @patch('builtins.print') # To capture the print output
-    def test_download_model_placeholder_new_directory(self, mock_print, mock_exists, mock_makedirs, mock_get_setting):
+    def test_download_model_new_directory(self, mock_print, mock_exists, mock_makedirs, mock_get_setting, mock_download):
         model_id = "test_model"
         custom_dir = "custom_test_downloads/"
 
@@ -119,13 +159,15 @@ class TestApiUtils(unittest.TestCase):
         mock_exists.assert_called_once_with(custom_dir)
         mock_makedirs.assert_called_once_with(custom_dir)
         mock_print.assert_any_call(f"Created directory: {custom_dir}")
-        mock_print.assert_any_call(f"Simulating download of {model_id} to {custom_dir}")
+        mock_print.assert_any_call(f"Downloading {model_id} to {custom_dir}")
+        mock_download.assert_called_once_with(model_id, custom_dir)
 
+    @patch('app.utils.download_repo_blocking', return_value=SAMPLE_DOWNLOAD_RESULT)
     @patch('app.utils.get_setting')
     @patch('app.utils.os.makedirs')
     @patch('app.utils.os.path.exists')
     @patch('builtins.print')
-    def test_download_model_placeholder_existing_directory(self, mock_print, mock_exists, mock_makedirs, mock_get_setting):
+    def test_download_model_existing_directory(self, mock_print, mock_exists, mock_makedirs, mock_get_setting, mock_download):
         model_id = "another_model"
         existing_dir = "existing_downloads/"
 
@@ -137,13 +179,14 @@ class TestApiUtils(unittest.TestCase):
         mock_get_setting.assert_not_called() # Should not be called if dir is passed
         mock_exists.assert_called_once_with(existing_dir)
         mock_makedirs.assert_not_called() # Should not be called if dir exists
-        mock_print.assert_any_call(f"Simulating download of {model_id} to {existing_dir}")
+        mock_print.assert_any_call(f"Downloading {model_id} to {existing_dir}")
 
+    @patch('app.utils.download_repo_blocking', return_value=SAMPLE_DOWNLOAD_RESULT)
     @patch('app.utils.get_setting')
     @patch('app.utils.os.makedirs')
     @patch('app.utils.os.path.exists')
     @patch('builtins.print')
-    def test_download_model_uses_default_settings_dir_if_not_passed(self, mock_print, mock_exists, mock_makedirs, mock_get_setting):
+    def test_download_model_uses_default_settings_dir_if_not_passed(self, mock_print, mock_exists, mock_makedirs, mock_get_setting, mock_download):
         model_id = "test_model_default_dir"
 
         # Simulate get_setting returning the default model directory
@@ -156,13 +199,14 @@ class TestApiUtils(unittest.TestCase):
         mock_get_setting.assert_called_once_with('model_directory')
         mock_exists.assert_called_once_with(default_settings_dir)
         mock_makedirs.assert_not_called()
-        mock_print.assert_any_call(f"Simulating download of {model_id} to {default_settings_dir}")
+        mock_print.assert_any_call(f"Downloading {model_id} to {default_settings_dir}")
 
+    @patch('app.utils.download_repo_blocking', return_value=SAMPLE_DOWNLOAD_RESULT)
     @patch('app.utils.get_setting', return_value=None) # Simulate setting not found
     @patch('app.utils.os.makedirs')
     @patch('app.utils.os.path.exists', return_value=False) # Fallback dir also doesn't exist
     @patch('builtins.print')
-    def test_download_model_fallback_directory_creation(self, mock_print, mock_exists, mock_makedirs, mock_get_setting):
+    def test_download_model_fallback_directory_creation(self, mock_print, mock_exists, mock_makedirs, mock_get_setting, mock_download):
         model_id = "fallback_test"
         fallback_dir = "downloaded_models/" # This is the hardcoded fallback in download_model
 
@@ -173,13 +217,14 @@ class TestApiUtils(unittest.TestCase):
         mock_exists.assert_any_call(fallback_dir)
         mock_makedirs.assert_called_once_with(fallback_dir)
         mock_print.assert_any_call(f"Created directory: {fallback_dir}")
-        mock_print.assert_any_call(f"Simulating download of {model_id} to {fallback_dir}")
+        mock_print.assert_any_call(f"Downloading {model_id} to {fallback_dir}")
 
+    @patch('app.utils.download_repo_blocking')
     @patch('app.utils.get_setting')
     @patch('app.utils.os.makedirs', side_effect=OSError("Permission Denied"))
     @patch('app.utils.os.path.exists', return_value=False)
     @patch('builtins.print')
-    def test_download_model_directory_creation_os_error(self, mock_print, mock_exists, mock_makedirs, mock_get_setting):
+    def test_download_model_directory_creation_os_error(self, mock_print, mock_exists, mock_makedirs, mock_get_setting, mock_download):
         model_id = "os_error_test"
         target_dir = "problem_dir/"
         mock_get_setting.return_value = target_dir
@@ -190,10 +235,21 @@ class TestApiUtils(unittest.TestCase):
         mock_exists.assert_called_once_with(target_dir)
         mock_makedirs.assert_called_once_with(target_dir)
         mock_print.assert_any_call(f"Error creating directory {target_dir}: Permission Denied")
-        # Also check that the download simulation message is NOT printed
-        download_simulation_message = f"Simulating download of {model_id} to {target_dir}"
+        # Also check that the download is NOT attempted
+        mock_download.assert_not_called()
+        download_message = f"Downloading {model_id} to {target_dir}"
         for call_args in mock_print.call_args_list:
-            self.assertNotEqual(call_args[0][0], download_simulation_message)
+            self.assertNotEqual(call_args[0][0], download_message)
+
+    @patch('app.utils.download_repo_blocking', side_effect=RuntimeError("Hub unreachable"))
+    @patch('app.utils.os.path.exists', return_value=True)
+    @patch('builtins.print')
+    def test_download_model_engine_error(self, mock_print, mock_exists, mock_download):
+        result = download_model("org/model", "some_dir/")
+
+        self.assertIsNone(result)
+        mock_download.assert_called_once_with("org/model", "some_dir/")
+        mock_print.assert_any_call("Error downloading org/model: Hub unreachable")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,59 @@
+import unittest
+import httpx
+
+from benchmarks.load import compare, percentile, summarize
+from benchmarks.standins import StandinConfig, create_app
+from app.services.hub_client import HubClient
+
+
+class TestLoadStatistics(unittest.TestCase):
+
+    def test_nearest_rank_percentiles(self):
+        values = [i / 1000 for i in range(1, 101)] # 1..100 ms
+        self.assertEqual(percentile(values, 50), 0.05)
+        self.assertEqual(percentile(values, 99), 0.099)
+        self.assertEqual(percentile([0.2], 95), 0.2)
+        self.assertEqual(percentile([], 95), 0.0)
+
+        summary = summarize(list(reversed(values)), errors=1, elapsed=2.0)
+        self.assertEqual((summary["requests"], summary["rps"], summary["p95_ms"]), (100, 50.0, 95.0))
+
+    def test_regressions_beyond_tolerance(self):
+        baseline = {"results": {"hf_suggest": {"8": {"rps": 1000.0, "p95_ms": 10.0, "errors": 0}}}}
+        within = {"results": {"hf_suggest": {"8": {"rps": 900.0, "p95_ms": 11.5, "errors": 0}}}}
+        worse = {"results": {"hf_suggest": {"8": {"rps": 700.0, "p95_ms": 13.0, "errors": 2}},
+                             "new_scenario": {"1": {"rps": 1.0, "p95_ms": 1.0, "errors": 0}}}}
+        self.assertEqual(compare(within, baseline, 0.2), [])
+        self.assertEqual(len(compare(worse, baseline, 0.2)), 3)
+
+
+class TestStandins(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        app = create_app(StandinConfig(latency_ms=0, hub_models=30, pull_steps=3, pull_step_ms=0, chat_tokens=2, token_interval_ms=0))
+        self.transport = httpx.ASGITransport(app=app)
+        self.hub = HubClient(endpoint="http://standin", token="")
+        self.hub._client = httpx.AsyncClient(base_url="http://standin", transport=self.transport)
+
+    async def asyncTearDown(self):
+        await self.hub.aclose()
+
+    async def test_hub_listing_pages_like_the_hub(self):
+        first = await self.hub.list_models_page(search="model-1", sort="downloads", limit=5)
+        self.assertEqual(first.total, 11) # model-1 and model-10..19
+        self.assertEqual(first.items[0]["id"], "org-1/model-1")
+        second = await self.hub.list_models_page(search="model-1", sort="downloads", limit=5, cursor=first.next_cursor)
+        self.assertEqual(len(second.items), 5)
+        self.assertNotIn(first.items[0]["id"], [model["id"] for model in second.items])
+        self.assertEqual((await self.hub.get_model("org-2/model-2"))["downloads"], 10_000_000 // 3)
+
+    async def test_ollama_streams(self):
+        async with httpx.AsyncClient(base_url="http://standin", transport=self.transport) as client:
+            pull = await client.post("/api/pull", json={"name": "model-0:latest", "stream": True})
+            self.assertEqual(pull.text.count("\n"), 6) # manifest, 3 layers, verify, success
+            chat = await client.post("/api/chat", json={"model": "model-0:latest", "messages": []})
+            self.assertIn('"done": true', chat.text.splitlines()[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
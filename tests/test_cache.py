@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+
+from app.core.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.IsolatedAsyncioTestCase):
+
+    async def test_fresh_hit_does_not_refetch(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=4, ttl=10, stale_ttl=0, timer=clock)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return "value"
+
+        self.assertEqual(await cache.get_or_fetch("k", fetch), "value")
+        clock.now = 5
+        self.assertEqual(await cache.get_or_fetch("k", fetch), "value")
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    async def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=10, timer=FakeClock())
+        cache.set("a", 1)
+        cache.set("b", 2)
+        await cache.get_or_fetch("a", None)  # Touch "a" so that "b" becomes least recently used
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    async def test_stale_entry_served_while_single_refresh_runs(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=4, ttl=10, stale_ttl=100, timer=clock)
+        release = asyncio.Event()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            if len(calls) > 1:
+                await release.wait()
+            return len(calls)
+
+        self.assertEqual(await cache.get_or_fetch("k", fetch), 1)
+        clock.now = 20  # Stale but within the stale window
+        results = [await cache.get_or_fetch("k", fetch) for _ in range(3)]
+
+        await asyncio.sleep(0)  # Let the background refresh start
+
+        self.assertEqual(results, [1, 1, 1])
+        self.assertEqual(len(calls), 2)  # Only one background refresh was started
+
+        release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        self.assertEqual(cache.get("k"), 2)
+        self.assertEqual(cache.stats()["stale_hits"], 3)
+        self.assertEqual(cache.stats()["refreshes"], 1)
+
+    async def test_expired_entry_is_fetched_inline(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=4, ttl=10, stale_ttl=5, timer=clock)
+
+        async def fetch():
+            return clock.now
+
+        await cache.get_or_fetch("k", fetch)
+        clock.now = 16
+        self.assertEqual(await cache.get_or_fetch("k", fetch), 16)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    async def test_fetch_error_is_not_cached(self):
+        cache = TTLCache(maxsize=4, ttl=10, timer=FakeClock())
+
+        async def failing_fetch():
+            raise RuntimeError("upstream down")
+
+        with self.assertRaises(RuntimeError):
+            await cache.get_or_fetch("k", failing_fetch)
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from app.core.config_store import ConfigStore
+from app.services.model_store import ModelStore
+
+
+class TestConfigStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "settings.json")
+        self.store = ConfigStore(path=self.path, defaults={"model_directory": "models/"})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_defaults_until_a_value_is_stored(self):
+        self.assertEqual(self.store.get("model_directory"), "models/")
+        self.assertIsNone(self.store.get("missing"))
+        self.assertEqual(self.store.get("missing", "fallback"), "fallback")
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_writes_are_atomic_and_notify_listeners(self):
+        changes = []
+        self.store.add_listener(lambda key, old, new: changes.append((key, old, new)))
+
+        self.assertTrue(self.store.set("model_directory", "elsewhere/"))
+        self.assertTrue(self.store.set("model_directory", "elsewhere/")) # Unchanged value, no notification
+
+        self.assertEqual(self.store.get("model_directory"), "elsewhere/")
+        self.assertEqual(changes, [("model_directory", "models/", "elsewhere/")])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"model_directory": "elsewhere/"})
+        self.assertEqual([name for name in os.listdir(self.tmp_dir.name) if name.endswith(".tmp")], [])
+
+    def test_writes_from_another_worker_are_merged_and_picked_up(self):
+        other_worker = ConfigStore(path=self.path, defaults={"model_directory": "models/"})
+        changes = []
+        self.store.add_listener(lambda key, old, new: changes.append((key, new)))
+
+        self.store.set("theme", "dark")
+        other_worker.set("model_directory", "shared/")
+        self.assertEqual(self.store.get("model_directory"), "models/") # Cached until the file is checked
+
+        self.assertTrue(self.store.reload())
+        self.assertFalse(self.store.reload()) # Nothing changed since
+        self.assertEqual(self.store.all(), {"model_directory": "shared/", "theme": "dark"})
+        self.assertEqual(changes, [("theme", "dark"), ("model_directory", "shared/")])
+
+    def test_unreadable_file_falls_back_to_defaults(self):
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        self.assertEqual(ConfigStore(path=self.path, defaults={"a": 1}).all(), {"a": 1})
+
+    async def test_async_writes_and_watch(self):
+        other_worker = ConfigStore(path=self.path, defaults={})
+        watcher = asyncio.create_task(self.store.watch(interval=0.01))
+        try:
+            self.assertTrue(await other_worker.aset("model_directory", "watched/"))
+            for _ in range(100):
+                if self.store.get("model_directory") == "watched/":
+                    break
+                await asyncio.sleep(0.01)
+            self.assertEqual(self.store.get("model_directory"), "watched/")
+        finally:
+            watcher.cancel()
+
+
+class TestModelStoreRoot(unittest.TestCase):
+
+    def test_set_root_moves_store_paths(self):
+        store = ModelStore(root="first")
+        store.set_root("second")
+        self.assertEqual(store.root, "second")
+        self.assertEqual(store.snapshot_path("org/model"), os.path.join("second", "org__model"))
+        self.assertTrue(store.index_path.startswith(os.path.join("second", ".store")))
+
+
+if __name__ == '__main__':
+    unittest.main()
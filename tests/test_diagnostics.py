@@ -0,0 +1,111 @@
+import asyncio
+import time
+import unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import diagnostics
+from app.core.config import settings
+from app.core.diagnostics import LoopLagMonitor, ProfilerBusyError, SamplingProfiler
+
+
+def block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+def busy_spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestLoopLagMonitor(unittest.IsolatedAsyncioTestCase):
+
+    async def test_stall_is_reported_with_the_blocking_stack(self):
+        monitor = LoopLagMonitor(interval=0.02, threshold=0.1)
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.05)
+
+        block_the_loop(0.3)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        status = monitor.status()
+        self.assertFalse(status["running"])
+        self.assertGreaterEqual(status["max_lag_seconds"], 0.25)
+        stall = status["recent_stalls"][-1]
+        self.assertGreaterEqual(stall["duration_seconds"], 0.25)
+        self.assertIn("block_the_loop", stall["stack"])
+
+
+class TestSamplingProfiler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_collapsed_stacks_of_the_loop_thread(self):
+        profiler = SamplingProfiler()
+
+        async def busy_later():
+            await asyncio.sleep(0.02)
+            busy_spin(0.15)
+
+        busy = asyncio.create_task(busy_later())
+        stacks = await profiler.profile(0.3, 0.002)
+        await busy
+
+        lines = stacks.splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+            self.assertNotIn("loop-lag-watchdog", stack)
+        spinning = sum(int(line.rsplit(" ", 1)[1]) for line in lines if "busy_spin (tests/test_diagnostics.py" in line)
+        self.assertGreater(spinning, 10)
+
+    async def test_one_profile_at_a_time(self):
+        profiler = SamplingProfiler()
+        first = asyncio.create_task(profiler.profile(0.1, 0.01))
+        await asyncio.sleep(0)
+        with self.assertRaises(ProfilerBusyError):
+            await profiler.profile(0.1, 0.01)
+        await first
+        self.assertFalse(profiler.running)
+
+
+class TestDiagnosticsEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(diagnostics.router, prefix="/api/v1/diagnostics")
+        self.client = TestClient(app, headers={"X-Diagnostics-Token": "secret"})
+        self.original_token = settings.DIAGNOSTICS_TOKEN
+        settings.DIAGNOSTICS_TOKEN = "secret"
+
+    def tearDown(self):
+        settings.DIAGNOSTICS_TOKEN = self.original_token
+
+    def test_profile_returns_a_collapsed_stack_file(self):
+        response = self.client.get("/api/v1/diagnostics/profile", params={"seconds": 0.1, "interval_ms": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn(".folded", response.headers["content-disposition"])
+        self.assertRegex(response.text.splitlines()[0], r" \d+$")
+
+    def test_limits_and_token(self):
+        too_long = self.client.get("/api/v1/diagnostics/profile", params={"seconds": settings.PROFILER_MAX_SECONDS + 1})
+        self.assertEqual(too_long.status_code, 422)
+
+        too_fast = self.client.get("/api/v1/diagnostics/profile", params={"seconds": 0.1, "interval_ms": 1})
+        self.assertEqual(too_fast.status_code, 422)
+
+        response = self.client.get("/api/v1/diagnostics/loop")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("recent_stalls", response.json())
+        self.assertEqual(self.client.get("/api/v1/diagnostics/loop", headers={"X-Diagnostics-Token": "wrong"}).status_code, 403)
+
+        settings.DIAGNOSTICS_TOKEN = None # Disabled unless configured
+        self.assertEqual(self.client.get("/api/v1/diagnostics/loop").status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.download_engine import DownloadEngine, DownloadError
+
+LARGE_FILE = os.urandom(1000 * 1024 + 7)  # Not a multiple of the chunk size
+SMALL_FILE = b'{"model_type": "gpt2"}'
+REPO_FILES = {"config.json": SMALL_FILE, "model.safetensors": LARGE_FILE}
+
+
+class RangeServer:
+    """Local stand-in for the Hub: repo listing, resolve/ redirects and a CDN serving range requests."""
+
+    def __init__(self, files, lfs_hashes=None):
+        self.files = files
+        self.lfs_hashes = lfs_hashes if lfs_hashes is not None else {
+            name: hashlib.sha256(data).hexdigest() for name, data in files.items() if len(data) > 1024
+        }
+        self.range_requests = []
+        self.fail_offsets = set()  # Range starts that answer 500 (simulates a dropped connection)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.handle_request(send_body=False)
+
+            def do_GET(self):
+                self.handle_request(send_body=True)
+
+            def handle_request(self, send_body):
+                if re.match(r"^/api/models/org/repo/revision/[^/?]+", self.path):
+                    siblings = []
+                    for name, data in server.files.items():
+                        sibling = {"rfilename": name, "size": len(data)}
+                        if name in server.lfs_hashes:
+                            sibling["lfs"] = {"sha256": server.lfs_hashes[name], "size": len(data)}
+                        siblings.append(sibling)
+                    return self.send_bytes(200, json.dumps({"sha": "abc123", "siblings": siblings}).encode(), send_body)
+                match = re.match(r"^/org/repo/resolve/[^/]+/(.+)$", self.path)
+                if match:
+                    self.send_response(302)
+                    self.send_header("Location", f"/cdn/{match.group(1)}")
+                    self.send_header("Content-Length", "0")
+                    return self.end_headers()
+                match = re.match(r"^/cdn/(.+)$", self.path)
+                if not match or match.group(1) not in server.files:
+                    return self.send_bytes(404, b"not found", send_body)
+
+                data = server.files[match.group(1)]
+                range_header = self.headers.get("Range")
+                if not range_header or not send_body:
+                    return self.send_bytes(200, data, send_body)
+                start, end = re.match(r"bytes=(\d+)-(\d*)", range_header).groups()
+                start, end = int(start), int(end) if end else len(data) - 1
+                server.range_requests.append((start, end))
+                if start in server.fail_offsets:
+                    return self.send_bytes(500, b"boom", send_body)
+                if start >= len(data):
+                    return self.send_bytes(416, b"", send_body)
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+                self.wfile.write(data[start:end + 1])
+
+            def send_bytes(self, status, body, send_body):
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_engine(server) -> DownloadEngine:
+    """Engine pointed at the stand-in, with chunk sizes scaled down to the test files."""
+    engine = DownloadEngine(endpoint=server.url, token="")
+    engine.chunk_size = 256 * 1024
+    engine.buffer_size = 16 * 1024
+    engine.parallel_threshold = 512 * 1024
+    engine.connections_per_file = 4
+    engine.max_retries = 0
+    return engine
+
+
+class TestDownloadEngine(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dest_dir = os.path.join(self.tmp_dir.name, "org__repo")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_downloads_repo_with_parallel_ranges(self):
+        with RangeServer(REPO_FILES) as server:
+            engine = make_engine(server)
+            try:
+                result = await engine.download_repo("org/repo", self.dest_dir)
+            finally:
+                await engine.aclose()
+
+        for name, data in REPO_FILES.items():
+            with open(os.path.join(self.dest_dir, name), "rb") as f:
+                self.assertEqual(f.read(), data)
+        self.assertEqual(result["files"], 2)
+        self.assertEqual(result["sha256"]["model.safetensors"], hashlib.sha256(LARGE_FILE).hexdigest())
+        self.assertEqual(len(server.range_requests), 4)  # ceil(1000 KiB + 7 / 256 KiB)
+        self.assertFalse(any(name.endswith((".incomplete", ".json.tmp")) for name in os.listdir(self.dest_dir)))
+
+    async def test_resumes_only_missing_ranges_after_failure(self):
+        with RangeServer(REPO_FILES) as server:
+            server.fail_offsets = {512 * 1024}
+            engine = make_engine(server)
+            try:
+                with self.assertRaises(DownloadError):
+                    await engine.download_repo("org/repo", self.dest_dir)
+                self.assertTrue(os.path.exists(os.path.join(self.dest_dir, "model.safetensors.incomplete.json")))
+
+                server.fail_offsets = set()
+                server.range_requests.clear()
+                await engine.download_repo("org/repo", self.dest_dir)
+            finally:
+                await engine.aclose()
+
+        self.assertEqual(server.range_requests, [(512 * 1024, 768 * 1024 - 1)])
+        with open(os.path.join(self.dest_dir, "model.safetensors"), "rb") as f:
+            self.assertEqual(hashlib.sha256(f.read()).hexdigest(), hashlib.sha256(LARGE_FILE).hexdigest())
+
+    async def test_hash_mismatch_is_rejected(self):
+        with RangeServer(REPO_FILES, lfs_hashes={"model.safetensors": "0" * 64}) as server:
+            engine = make_engine(server)
+            try:
+                with self.assertRaises(DownloadError):
+                    await engine.download_repo("org/repo", self.dest_dir)
+            finally:
+                await engine.aclose()
+
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "model.safetensors")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "model.safetensors.incomplete")))
+
+    async def test_stale_file_of_the_same_size_is_replaced(self):
+        os.makedirs(self.dest_dir)
+        stale_path = os.path.join(self.dest_dir, "model.safetensors")
+        with open(stale_path, "wb") as f:
+            f.write(bytes(len(LARGE_FILE))) # e.g. an older revision of the file
+        with RangeServer(REPO_FILES) as server:
+            engine = make_engine(server)
+            try:
+                await engine.download_repo("org/repo", self.dest_dir)
+            finally:
+                await engine.aclose()
+
+        self.assertEqual(len(server.range_requests), 4)
+        with open(stale_path, "rb") as f:
+            self.assertEqual(f.read(), LARGE_FILE)
+
+
+if __name__ == '__main__':
+    unittest.main()
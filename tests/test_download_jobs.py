@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+
+from app.services.download_jobs import DownloadScheduler, JobState
+
+
+class FakeRunner:
+    """Runner whose jobs block until released, recording the order they started in."""
+
+    def __init__(self):
+        self.started = []
+        self.release = {}
+
+    async def __call__(self, job):
+        self.started.append(job.model_id)
+        job.progress.total_bytes = 100
+        event = self.release.setdefault(job.model_id, asyncio.Event())
+        await event.wait()
+        job.progress.downloaded_bytes = 100
+        return {"download_path": f"/models/{job.model_id}"}
+
+    def finish(self, model_id):
+        self.release.setdefault(model_id, asyncio.Event()).set()
+
+
+async def settle():
+    # Long enough for shared-table statements to finish on the scheduler's database thread too
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+class TestDownloadScheduler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.runner = FakeRunner()
+        self.scheduler = DownloadScheduler(runner=self.runner, max_concurrent=2, history=10)
+
+    async def asyncTearDown(self):
+        await self.scheduler.shutdown()
+
+    async def test_concurrency_limit_and_priority_order(self):
+        await self.scheduler.submit("a")
+        await self.scheduler.submit("b")
+        await self.scheduler.submit("low", priority=0)
+        await self.scheduler.submit("high", priority=5)
+        await settle()
+
+        self.assertEqual(self.runner.started, ["a", "b"])
+        self.runner.finish("a")
+        await settle()
+        self.assertEqual(self.runner.started, ["a", "b", "high"])
+
+    async def test_duplicate_submission_returns_existing_job(self):
+        first, created = await self.scheduler.submit("org/model")
+        second, created_again = await self.scheduler.submit("org/model")
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertIs(first, second)
+
+    async def test_completion_records_result(self):
+        job, _ = await self.scheduler.submit("org/model")
+        await settle()
+        self.runner.finish("org/model")
+        await settle()
+
+        self.assertEqual(job.state, JobState.COMPLETED)
+        self.assertEqual(job.download_path, "/models/org/model")
+        self.assertEqual(job.snapshot()["downloaded_bytes"], 100)
+
+    async def test_pause_resume_and_cancel(self):
+        job, _ = await self.scheduler.submit("org/model")
+        await settle()
+        await self.scheduler.pause(job.job_id)
+        await settle()
+        self.assertEqual(job.state, JobState.PAUSED)
+
+        await self.scheduler.resume(job.job_id)
+        await settle()
+        self.assertEqual(job.state, JobState.RUNNING)
+        self.assertEqual(self.runner.started, ["org/model", "org/model"])
+
+        await self.scheduler.cancel(job.job_id)
+        await settle()
+        self.assertEqual(job.state, JobState.CANCELLED)
+
+    async def test_events_end_with_terminal_snapshot(self):
+        job, _ = await self.scheduler.submit("org/model")
+        await settle()
+        self.runner.finish("org/model")
+
+        states = [snapshot["state"] async for snapshot in self.scheduler.events(job.job_id, interval=0.01)]
+
+        self.assertEqual(states[-1], "completed")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import unittest
+import httpx
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import hf_models as hf_models_endpoints
+from app.services import huggingface_service
+from app.services.hub_client import HubClient
+
+SAMPLE_HUB_MODELS = [
+    {"id": "org/model1", "author": "org", "downloads": 100, "likes": 5, "private": False,
+     "lastModified": "2024-01-01T00:00:00.000Z", "tags": ["pytorch", 1], "pipeline_tag": "text-generation"},
+    {"id": "org/model2", "author": "org", "downloads": 50, "likes": 2, "private": False,
+     "lastModified": "2024-01-02T00:00:00.000Z", "tags": [], "pipeline_tag": None},
+]
+
+
+def make_hub_client(handler) -> HubClient:
+    client = HubClient(endpoint="https://hub.test", token="")
+    client._client = httpx.AsyncClient(base_url=client.endpoint, transport=httpx.MockTransport(handler))
+    return client
+
+
+class TestHuggingFaceService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return httpx.Response(200, json=SAMPLE_HUB_MODELS)
+
+        self.hub_client = make_hub_client(handler)
+        self._original_client = huggingface_service.hub_client
+        huggingface_service.hub_client = self.hub_client
+        huggingface_service.hf_models_cache.clear()
+
+    async def asyncTearDown(self):
+        await self.hub_client.aclose()
+        huggingface_service.hub_client = self._original_client
+        huggingface_service.hf_models_cache.clear()
+
+    async def test_get_hf_models_transforms_hub_records(self):
+        result = await huggingface_service.get_hf_models(search="model", limit=10, page=1)
+
+        self.assertEqual([item["id"] for item in result["items"]], ["org/model1", "org/model2"])
+        self.assertEqual(result["items"][0]["creator"], "org")
+        self.assertEqual(result["items"][0]["tags"], ["pytorch", "1"])
+        self.assertEqual(result["items"][0]["description"], "text-generation")
+        self.assertEqual(self.requests[0].url.params["search"], "model")
+        self.assertEqual(self.requests[0].url.params["sort"], "downloads")
+        self.assertEqual(self.requests[0].url.params["direction"], "-1")
+
+    async def test_next_cursor_and_estimated_total(self):
+        result = await huggingface_service.get_hf_models(limit=2, page=1)
+
+        self.assertEqual(result["next_cursor"], None)
+        self.assertEqual(result["total"], 2)
+        self.assertFalse(result["total_is_estimate"])
+
+    async def test_identical_queries_hit_the_cache(self):
+        await huggingface_service.get_hf_models(search="Model ", limit=10, page=1)
+        await huggingface_service.get_hf_models(search="model", limit=10, page=1)
+
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_concurrent_cache_misses_share_one_hub_request(self):
+        before = huggingface_service.hf_models_flight.stats()
+        results = await asyncio.gather(*(huggingface_service.get_hf_models(limit=10, page=1) for _ in range(20)))
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertTrue(all(result == results[0] for result in results))
+        after = huggingface_service.hf_models_flight.stats()
+        self.assertEqual(after["coalesced"] - before["coalesced"], 19)
+
+
+class TestHuggingFaceCursorPagination(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.requests = []
+        pages = {None: ("c2", SAMPLE_HUB_MODELS[:1]), "c2": ("c3", SAMPLE_HUB_MODELS[1:]), "c3": (None, [])}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            next_cursor, items = pages[request.url.params.get("cursor")]
+            headers = {}
+            if next_cursor:
+                headers["Link"] = f'<https://hub.test/api/models?limit=1&cursor={next_cursor}>; rel="next"'
+            return httpx.Response(200, json=items, headers=headers)
+
+        self.hub_client = make_hub_client(handler)
+        self._original_client = huggingface_service.hub_client
+        huggingface_service.hub_client = self.hub_client
+        huggingface_service.hf_models_cache.clear()
+        huggingface_service.page_cursor_cache.clear()
+
+    async def asyncTearDown(self):
+        await self.hub_client.aclose()
+        huggingface_service.hub_client = self._original_client
+        huggingface_service.hf_models_cache.clear()
+        huggingface_service.page_cursor_cache.clear()
+
+    async def test_sequential_pages_cost_one_request_each(self):
+        first = await huggingface_service.get_hf_models(limit=1, page=1)
+        second = await huggingface_service.get_hf_models(limit=1, page=2)
+
+        self.assertEqual(first["next_cursor"], "c2")
+        self.assertEqual(second["items"][0]["id"], "org/model2")
+        self.assertEqual(second["total"], 3)
+        self.assertTrue(second["total_is_estimate"])
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.requests[1].url.params["cursor"], "c2")
+
+    async def test_cold_page_walks_forward_from_known_cursor(self):
+        result = await huggingface_service.get_hf_models(limit=1, page=2)
+
+        self.assertEqual(result["items"][0]["id"], "org/model2")
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_explicit_cursor(self):
+        result = await huggingface_service.get_hf_models(limit=1, page=2, cursor="c2")
+
+        self.assertEqual(result["items"][0]["id"], "org/model2")
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_unknown_cursor_is_not_cached_as_a_page(self):
+        await huggingface_service.get_hf_models(limit=1, cursor="c2") # `page` left at its default of 1
+        second = await huggingface_service.get_hf_models(limit=1, page=2)
+
+        self.assertEqual(second["items"][0]["id"], "org/model2")
+
+    async def test_issued_cursor_knows_its_page(self):
+        await huggingface_service.get_hf_models(limit=1, page=1)
+        second = await huggingface_service.get_hf_models(limit=1, cursor="c2")
+
+        self.assertEqual((second["page"], second["total"]), (2, 3))
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_page_past_the_end_is_empty(self):
+        result = await huggingface_service.get_hf_models(limit=1, page=5)
+
+        self.assertEqual(result["items"], [])
+        self.assertIsNone(result["next_cursor"])
+
+
+
+class TestHuggingFaceBatchLookup(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request.url.path)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            model_id = request.url.path[len("/api/models/"):]
+            if model_id.startswith("missing"):
+                return httpx.Response(404, json={"error": "Repository not found"})
+            return httpx.Response(200, json={**SAMPLE_HUB_MODELS[0], "id": model_id})
+
+        self.hub_client = make_hub_client(handler)
+        self._original_client = huggingface_service.hub_client
+        huggingface_service.hub_client = self.hub_client
+        huggingface_service.hf_model_info_cache.clear()
+
+    async def asyncTearDown(self):
+        await self.hub_client.aclose()
+        huggingface_service.hub_client = self._original_client
+        huggingface_service.hf_model_info_cache.clear()
+
+    async def collect(self, ids, concurrency=None):
+        return [result async for result in huggingface_service.iter_hf_model_batch(ids, concurrency=concurrency)]
+
+    async def test_per_id_results_and_errors(self):
+        results = await self.collect(["org/a", "missing/b", "org/a"])
+        by_id = {result["id"]: result for result in results}
+
+        self.assertEqual(len(results), 2) # Duplicates are looked up once
+        self.assertEqual(by_id["org/a"]["model"]["id"], "org/a")
+        self.assertEqual(by_id["org/a"]["model"]["creator"], "org")
+        self.assertEqual(by_id["missing/b"]["error"]["status"], 404)
+
+    async def test_concurrency_is_bounded(self):
+        await self.collect([f"org/model-{i}" for i in range(12)], concurrency=3)
+
+        self.assertEqual(len(self.requests), 12)
+        self.assertLessEqual(self.max_active, 3)
+        self.assertGreater(self.max_active, 1)
+
+    async def test_recent_lookups_come_from_the_cache(self):
+        await self.collect(["org/a", "org/b"])
+        await self.collect(["org/a", "org/b", "org/c"])
+
+        self.assertEqual(sorted(self.requests), ["/api/models/org/a", "/api/models/org/b", "/api/models/org/c"])
+
+    async def test_stopping_early_cancels_pending_lookups(self):
+        results = huggingface_service.iter_hf_model_batch([f"org/model-{i}" for i in range(10)], concurrency=1)
+        await results.__anext__()
+        await results.aclose()
+        await asyncio.sleep(0.05)
+
+        self.assertLess(len(self.requests), 10)
+
+
+class TestHuggingFaceExport(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.requests = []
+        self.catalog = [{**SAMPLE_HUB_MODELS[0], "id": f"org/model-{i}"} for i in range(25)]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            limit = int(request.url.params["limit"])
+            offset = int(request.url.params.get("cursor", 0))
+            headers = {}
+            if offset + limit < len(self.catalog):
+                headers["Link"] = f'<https://hub.test/api/models?limit={limit}&cursor={offset + limit}>; rel="next"'
+            return httpx.Response(200, json=self.catalog[offset:offset + limit], headers=headers)
+
+        self.hub_client = make_hub_client(handler)
+        self._original_client = huggingface_service.hub_client
+        huggingface_service.hub_client = self.hub_client
+        huggingface_service.hf_models_cache.clear()
+
+    async def asyncTearDown(self):
+        await self.hub_client.aclose()
+        huggingface_service.hub_client = self._original_client
+
+    async def collect(self, **kwargs):
+        return [page async for page in huggingface_service.iter_hf_model_pages(**kwargs)]
+
+    async def test_follows_every_page(self):
+        pages = await self.collect(search="Model", page_size=10)
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(pages[2][-1]["id"], "org/model-24")
+        self.assertEqual(pages[0][0]["creator"], "org")
+        self.assertEqual(self.requests[0].url.params["search"], "model")
+        self.assertEqual(len(huggingface_service.hf_models_cache), 0) # Exports do not fill the listing cache
+
+    async def test_stops_at_max_results(self):
+        pages = await self.collect(page_size=10, max_results=12)
+
+        self.assertEqual(sum(len(page) for page in pages), 12)
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_next_page_is_requested_ahead(self):
+        pages = huggingface_service.iter_hf_model_pages(page_size=10)
+        await pages.__anext__()
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(self.requests), 2)
+
+        await pages.aclose()
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_endpoint_streams_ndjson_and_csv(self):
+        app = FastAPI()
+        app.include_router(hf_models_endpoints.router, prefix="/api/v1/hf-models")
+        client = TestClient(app)
+        pages = [[{**SAMPLE_HUB_MODELS[0], "id": "org/a", "tags": ["x", "y"]}], [{**SAMPLE_HUB_MODELS[1], "id": "org/b"}]]
+        calls = []
+
+        async def fake_pages(**kwargs):
+            calls.append(kwargs)
+            for page in pages:
+                yield page
+            raise httpx.ConnectError("hub went away")
+
+        with patch.object(hf_models_endpoints, "iter_hf_model_pages", fake_pages):
+            ndjson = client.get("/api/v1/hf-models/export", params={"search": "bert", "tag": "x", "max_results": 5})
+            csv_export = client.get("/api/v1/hf-models/export", params={"format": "csv"})
+
+        lines = [json.loads(line) for line in ndjson.text.splitlines()]
+        self.assertEqual(ndjson.headers["content-type"], "application/x-ndjson")
+        self.assertIn("hf-models.ndjson", ndjson.headers["content-disposition"])
+        self.assertEqual([line.get("id") for line in lines[:2]], ["org/a", "org/b"])
+        self.assertIn("hub went away", lines[2]["error"])
+        self.assertEqual((calls[0]["search"], calls[0]["tags"], calls[0]["max_results"]), ("bert", ["x"], 5))
+
+        rows = csv_export.text.splitlines()
+        self.assertTrue(csv_export.headers["content-type"].startswith("text/csv"))
+        self.assertEqual(rows[0], ",".join(hf_models_endpoints.EXPORT_CSV_FIELDS))
+        self.assertTrue(rows[1].startswith("org/a,") and rows[1].endswith(",x|y"))
+        self.assertTrue(rows[3].startswith("# error:"))
+
+    def test_endpoint_reports_upstream_failure_before_streaming(self):
+        app = FastAPI()
+        app.include_router(hf_models_endpoints.router, prefix="/api/v1/hf-models")
+
+        async def failing_pages(**kwargs):
+            raise httpx.ConnectError("hub is down")
+            yield
+
+        with patch.object(hf_models_endpoints, "iter_hf_model_pages", failing_pages):
+            response = TestClient(app).get("/api/v1/hf-models/export")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("hub is down", response.json()["detail"])
+
+
+if __name__ == '__main__':
+    unittest.main()
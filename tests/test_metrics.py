@@ -0,0 +1,150 @@
+import asyncio
+import unittest
+import httpx
+from unittest.mock import patch
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.cache import TTLCache
+from app.core.metrics import MetricsMiddleware, MetricsRegistry, cache_collector, http_requests, track_upstream, upstream_errors
+from app.services.hub_client import HubClient
+from app.services.ollama_fleet import ollama_fleet
+from app.services.ollama_service import ollama_host_label
+
+
+def sample(text, line_prefix):
+    """Value of the exposition line starting with `line_prefix`, or None."""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_renders_counters_gauges_and_cumulative_histograms(self):
+        registry = MetricsRegistry()
+        requests = registry.counter("requests", "Requests.", ("route",))
+        in_flight = registry.gauge("in_flight", "In flight.")
+        latency = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+
+        requests.labels('/a"b').inc()
+        requests.labels('/a"b').inc(2)
+        in_flight.labels().inc()
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.labels("/x").observe(value)
+
+        text = registry.render()
+        self.assertIn("# TYPE requests counter", text)
+        self.assertIn('requests_total{route="/a\\"b"} 3', text)
+        self.assertIn("in_flight 1", text)
+        self.assertIn('latency_seconds_bucket{route="/x",le="0.1"} 2', text) # Upper bounds are inclusive
+        self.assertIn('latency_seconds_bucket{route="/x",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{route="/x",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{route="/x"} 4', text)
+        self.assertEqual(sample(text, 'latency_seconds_sum{route="/x"}'), 3.65)
+
+
+class TestCollectors(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cache_collector_exports_hit_ratio(self):
+        registry = MetricsRegistry()
+        cache = TTLCache(ttl=60)
+        registry.add_collector(cache_collector({"models": cache}))
+
+        async def fetch():
+            return 1
+
+        await cache.get_or_fetch("a", fetch)
+        await cache.get_or_fetch("a", fetch)
+
+        text = registry.render()
+        self.assertIn('cache_lookups_total{cache="models",result="hit"} 1', text)
+        self.assertIn('cache_lookups_total{cache="models",result="miss"} 1', text)
+        self.assertIn('cache_hit_ratio{cache="models"} 0.5', text)
+
+
+class TestMetricsMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        router = APIRouter()
+
+        @router.get("/items/{item_id}")
+        async def get_item(item_id: str):
+            if item_id == "missing":
+                raise HTTPException(status_code=404, detail="Not found")
+            return {"id": item_id}
+
+        app.include_router(router, prefix="/api")
+
+        @app.get("/boom")
+        async def boom():
+            raise RuntimeError("boom")
+
+        app.add_middleware(MetricsMiddleware, router=app.router)
+        self.client = TestClient(app, raise_server_exceptions=False)
+
+    def count(self, route, status):
+        return http_requests.labels("GET", route, status).value
+
+    def test_requests_are_labelled_by_route_template_and_status(self):
+        before_ok, before_missing = self.count("/api/items/{item_id}", "200"), self.count("/api/items/{item_id}", "404")
+        self.client.get("/api/items/1")
+        self.client.get("/api/items/2")
+        self.client.get("/api/items/missing")
+        self.assertEqual(self.count("/api/items/{item_id}", "200") - before_ok, 2)
+        self.assertEqual(self.count("/api/items/{item_id}", "404") - before_missing, 1)
+
+        before_unmatched = self.count("unmatched", "404")
+        self.client.get("/nothing/here")
+        self.assertEqual(self.count("unmatched", "404") - before_unmatched, 1)
+
+    def test_unhandled_exceptions_count_as_500(self):
+        before = self.count("/boom", "500")
+        self.assertEqual(self.client.get("/boom").status_code, 500)
+        self.assertEqual(self.count("/boom", "500") - before, 1)
+
+
+class TestUpstreamTracking(unittest.IsolatedAsyncioTestCase):
+
+    async def test_hub_errors_are_counted_by_type(self):
+        client = HubClient(endpoint="https://hub.test", token="")
+        client._client = httpx.AsyncClient(base_url="https://hub.test",
+                                           transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+        errors = upstream_errors.labels("hub_list", "hub.test", "HTTPStatusError")
+        before = errors.value
+        with self.assertRaises(httpx.HTTPStatusError):
+            await client.list_models_page(search="bert")
+        await client.aclose()
+        self.assertEqual(errors.value - before, 1)
+
+    def test_handled_failures_are_reported_with_fail(self):
+        errors = upstream_errors.labels("ollama_chat", "http://ollama.test", "OllamaError")
+        before = errors.value
+        with track_upstream("ollama_chat", "http://ollama.test") as tracked:
+            tracked.fail("OllamaError")
+        self.assertEqual(errors.value - before, 1)
+
+    async def test_cancelled_calls_are_not_errors(self):
+        errors = upstream_errors.labels("ollama_chat", "other", "CancelledError")
+
+        async def call():
+            with track_upstream("ollama_chat", "other"):
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(errors.value, 0)
+
+    def test_ollama_hosts_are_labelled_by_registered_name(self):
+        with patch.dict(ollama_fleet.hosts, {"gpu-1": "http://10.0.0.11:11434"}, clear=True):
+            self.assertEqual(ollama_host_label("10.0.0.11:11434/"), "gpu-1")
+            self.assertEqual(ollama_host_label("http://attacker-chosen.example:1"), "other")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+import asyncio
+import httpx
+from unittest.mock import patch
+
+from app.core.shared_store import SharedStore
+from app.services import model_catalog as model_catalog_module
+from app.services.hub_client import HubClient
+from app.services.model_catalog import CatalogSyncBusyError, ModelCatalog, sync_catalog
+
+HUB_PAGES = {
+    None: ("p2", [
+        {"id": "meta-llama/Llama-2-7b", "author": "meta-llama", "pipeline_tag": "text-generation",
+         "tags": ["pytorch", "llama"], "downloads": 900, "likes": 50, "lastModified": "2024-03-01T00:00:00.000Z"},
+        {"id": "TheBloke/Llama-2-7B-GGUF", "author": "TheBloke", "pipeline_tag": "text-generation",
+         "tags": ["gguf", "llama"], "downloads": 500, "likes": 80, "lastModified": "2024-05-01T00:00:00.000Z"},
+    ]),
+    "p2": (None, [
+        {"id": "google/vit-base", "author": "google", "pipeline_tag": "image-classification",
+         "tags": ["pytorch"], "downloads": 700, "likes": 10, "lastModified": "2023-01-01T00:00:00.000Z"},
+    ]),
+}
+
+
+class TestModelCatalog(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.catalog = ModelCatalog(path=os.path.join(self.tmp_dir.name, "catalog.sqlite3"))
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            next_cursor, items = HUB_PAGES[request.url.params.get("cursor")]
+            headers = {"Link": f'<https://hub.test/api/models?cursor={next_cursor}>; rel="next"'} if next_cursor else {}
+            return httpx.Response(200, json=items, headers=headers)
+
+        self.hub_client = HubClient(endpoint="https://hub.test", token="")
+        self.hub_client._client = httpx.AsyncClient(base_url="https://hub.test", transport=httpx.MockTransport(handler))
+        self.synced = await sync_catalog(self.catalog, client=self.hub_client, max_models=100)
+
+    async def asyncTearDown(self):
+        await self.hub_client.aclose()
+        self.tmp_dir.cleanup()
+
+    def test_sync_follows_pagination_and_loads_snapshot(self):
+        self.assertEqual(self.synced, 3)
+        self.assertTrue(self.catalog.is_ready)
+        self.assertEqual(self.catalog.model_count, 3)
+        self.assertFalse(os.path.exists(self.catalog.path + ".tmp"))
+
+    def test_sort_and_pagination(self):
+        result = self.catalog.query(sort_field="downloads", sort_direction=-1, page=1, limit=2)
+        self.assertEqual(result["total"], 3)
+        self.assertEqual([m["id"] for m in result["items"]], ["meta-llama/Llama-2-7b", "google/vit-base"])
+
+        result = self.catalog.query(sort_field="likes", sort_direction=-1, page=2, limit=2)
+        self.assertEqual([m["id"] for m in result["items"]], ["google/vit-base"])
+
+    def test_substring_search_is_case_insensitive(self):
+        result = self.catalog.query(search="llama-2", sort_field="lastModified", sort_direction=-1)
+        self.assertEqual([m["id"] for m in result["items"]], ["TheBloke/Llama-2-7B-GGUF", "meta-llama/Llama-2-7b"])
+
+        result = self.catalog.query(search="vi")  # Shorter than a trigram
+        self.assertEqual([m["id"] for m in result["items"]], ["google/vit-base"])
+
+    def test_tag_and_pipeline_filters(self):
+        result = self.catalog.query(tags=["llama", "gguf"])
+        self.assertEqual([m["id"] for m in result["items"]], ["TheBloke/Llama-2-7B-GGUF"])
+        self.assertEqual(result["items"][0]["tags"], ["gguf", "llama"])
+
+        result = self.catalog.query(pipeline_tag="image-classification")
+        self.assertEqual(result["total"], 1)
+
+    def write_snapshot(self, records):
+        writer = model_catalog_module._SnapshotWriter(self.catalog.path)
+        writer.add(records)
+        writer.commit()
+        self.catalog.load()
+
+    def test_pages_follow_query_order(self):
+        self.write_snapshot([
+            {"id": f"org/model-{i}", "downloads": i % 3, "likes": i % 2,
+             "lastModified": None if i % 4 == 0 else f"2024-0{i % 5 + 1}-01"}
+            for i in range(11)
+        ])
+        for sort_field in ("downloads", "likes", "lastModified"):
+            for sort_direction in (1, -1):
+                expected = self.catalog.query(sort_field=sort_field, sort_direction=sort_direction, limit=100)["items"]
+                pages = list(self.catalog.iter_pages(sort_field=sort_field, sort_direction=sort_direction, limit=3))
+                self.assertEqual([len(page) for page in pages], [3, 3, 3, 2])
+                self.assertEqual([m["id"] for page in pages for m in page], [m["id"] for m in expected])
+
+    def test_pages_stay_on_one_snapshot(self):
+        pages = self.catalog.iter_pages(limit=2)
+        first = next(pages)
+        self.write_snapshot([{"id": "org/newer", "downloads": 1000}, {"id": "org/other", "downloads": 1}])
+
+        rest = [m["id"] for page in pages for m in page]
+        self.assertEqual([m["id"] for m in first] + rest,
+                         ["meta-llama/Llama-2-7b", "google/vit-base", "TheBloke/Llama-2-7B-GGUF"])
+
+    async def test_one_sync_at_a_time(self):
+        results = await asyncio.gather(
+            sync_catalog(self.catalog, client=self.hub_client), sync_catalog(self.catalog, client=self.hub_client),
+            return_exceptions=True,
+        )
+        self.assertEqual(sorted(type(result).__name__ for result in results), ["CatalogSyncBusyError", "int"])
+        self.assertFalse(self.catalog.sync_in_progress)
+
+    async def test_failed_snapshot_setup_releases_the_sync(self):
+        with patch.object(model_catalog_module, "_SnapshotWriter", side_effect=OSError("read-only file system")):
+            with self.assertRaises(OSError):
+                await sync_catalog(self.catalog, client=self.hub_client)
+
+        self.assertFalse(self.catalog.sync_in_progress)
+        self.assertEqual(self.catalog.last_sync_error, "read-only file system")
+
+    async def test_workers_share_the_sync_lease(self):
+        path = os.path.join(self.tmp_dir.name, "shared.sqlite3")
+        worker_a, worker_b = SharedStore(path, worker_id="a"), SharedStore(path, worker_id="b")
+        try:
+            self.assertTrue(worker_a.try_lease("catalog_sync", 60)) # Worker a is syncing
+            with self.assertRaises(CatalogSyncBusyError):
+                await sync_catalog(self.catalog, client=self.hub_client, store=worker_b)
+            self.assertFalse(self.catalog.sync_in_progress)
+
+            worker_a.release_lease("catalog_sync")
+            self.assertEqual(await sync_catalog(self.catalog, client=self.hub_client, store=worker_b), 3)
+            self.assertTrue(worker_a.try_lease("catalog_sync", 60)) # Released once the sync finished
+        finally:
+            worker_a.close()
+            worker_b.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.services.download_engine import DownloadError
+from app.services.model_store import ModelStore
+from tests.test_download_engine import LARGE_FILE, REPO_FILES, RangeServer, make_engine
+
+
+class TestModelStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = ModelStore(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    async def download(self, server, revision="main"):
+        engine = make_engine(server)
+        try:
+            return await self.store.download_repo(engine, "org/repo", revision=revision)
+        finally:
+            await engine.aclose()
+
+    async def test_snapshot_links_to_content_addressed_blobs(self):
+        with RangeServer(REPO_FILES) as server:
+            result = await self.download(server)
+
+        large_sha = hashlib.sha256(LARGE_FILE).hexdigest()
+        snapshot_file = os.path.join(result["path"], "model.safetensors")
+        self.assertEqual(result["path"], os.path.join(self.tmp_dir.name, "org__repo"))
+        self.assertEqual(result["commit"], "abc123")
+        self.assertTrue(os.path.samefile(snapshot_file, self.store.blob_path(large_sha)))
+        with open(os.path.join(result["path"], "config.json"), "rb") as f:
+            self.assertEqual(f.read(), REPO_FILES["config.json"])
+        self.assertTrue(os.path.exists(self.store.manifest_path("org/repo", "main")))
+
+    async def test_known_blobs_are_neither_downloaded_nor_rehashed(self):
+        with RangeServer(REPO_FILES) as server:
+            await self.download(server)
+            server.range_requests.clear()
+            with patch("app.services.model_store.hash_file") as mock_hash:
+                result = await self.download(server, revision="v2")
+
+        self.assertEqual(server.range_requests, [])
+        mock_hash.assert_not_called()
+        self.assertEqual(result["reused_bytes"], len(LARGE_FILE))
+        self.assertEqual(result["path"], os.path.join(self.tmp_dir.name, "org__repo@v2"))
+
+    async def test_stores_sharing_a_root_download_a_blob_once(self):
+        other = ModelStore(self.tmp_dir.name) # Another worker process on the same model directory
+        self.addCleanup(other.close)
+        with RangeServer(REPO_FILES) as server:
+            engines = [make_engine(server), make_engine(server)]
+            try:
+                results = await asyncio.gather(*(
+                    store.download_repo(engine, "org/repo") for store, engine in zip((self.store, other), engines)
+                ))
+            finally:
+                for engine in engines:
+                    await engine.aclose()
+
+        self.assertEqual(sorted(result["reused_bytes"] for result in results), [0, len(LARGE_FILE)])
+        with open(os.path.join(results[0]["path"], "model.safetensors"), "rb") as f:
+            self.assertEqual(f.read(), LARGE_FILE)
+        self.assertTrue(all(name.endswith(".lock") for name in os.listdir(self.store.tmp_dir))) # No leftover partials
+
+    async def test_gc_removes_unreferenced_blobs(self):
+        with RangeServer(REPO_FILES) as server:
+            await self.download(server)
+
+        self.assertEqual(self.store.gc()["removed_blobs"], 0)
+        os.remove(self.store.manifest_path("org/repo", "main"))
+
+        self.assertEqual(self.store.gc(dry_run=True)["removed_blobs"], 2)
+        result = self.store.gc()
+        self.assertEqual(result["removed_blobs"], 2)
+        self.assertFalse(self.store.has_verified_blob(hashlib.sha256(LARGE_FILE).hexdigest()))
+
+    async def test_gc_during_a_download_keeps_its_blobs(self):
+        add_blob = self.store.add_blob
+        collected = []
+
+        def add_blob_then_gc(source_path, sha256):
+            path = add_blob(source_path, sha256)
+            collected.append(self.store.gc()["removed_blobs"]) # Runs before the manifest is written
+            return path
+
+        with patch.object(self.store, "add_blob", add_blob_then_gc), RangeServer(REPO_FILES) as server:
+            result = await self.download(server)
+
+        self.assertEqual(collected, [0, 0])
+        with open(os.path.join(result["path"], "model.safetensors"), "rb") as f:
+            self.assertEqual(f.read(), LARGE_FILE)
+        self.assertFalse(os.path.exists(self.store.pending_manifest_path("org/repo", "main")))
+
+    async def test_root_change_waits_for_running_downloads(self):
+        old_root, new_root = self.tmp_dir.name, os.path.join(self.tmp_dir.name, "moved")
+        add_blob = self.store.add_blob
+
+        def add_blob_after_root_change(source_path, sha256):
+            self.store.request_root(new_root) # e.g. model_directory changed by another worker
+            self.assertEqual(self.store.root, old_root)
+            return add_blob(source_path, sha256)
+
+        with patch.object(self.store, "add_blob", add_blob_after_root_change), RangeServer(REPO_FILES) as server:
+            result = await self.download(server)
+
+        self.assertEqual(result["path"], os.path.join(old_root, "org__repo"))
+        self.assertEqual(self.store.root, new_root)
+        self.store.request_root(old_root) # Idle: applies right away
+        self.assertEqual(self.store.root, old_root)
+
+    async def test_missing_blob_fails_instead_of_linking(self):
+        with RangeServer(REPO_FILES) as server:
+            await self.download(server)
+        large_sha = hashlib.sha256(LARGE_FILE).hexdigest()
+        os.remove(self.store.blob_path(large_sha))
+
+        with self.assertRaises(DownloadError):
+            self.store.link_snapshot("org/repo", "v2", {"model.safetensors": {"sha256": large_sha}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import hf_models
+from app.services.hub_client import HubClient
+from app.services.huggingface_service import transform_hub_model
+from app.services.model_catalog import ModelCatalog, sync_catalog
+from app.services.model_suggest import ModelSuggester, PrefixRanking, SuggestIndex
+
+MODELS = [
+    {"id": "meta-llama/Llama-2-7b", "downloads": 900},
+    {"id": "meta-llama/Meta-Llama-3-8B", "downloads": 1200},
+    {"id": "TheBloke/Llama-2-7B-GGUF", "downloads": 500},
+    {"id": "google/vit-base", "downloads": 700},
+    {"id": "gpt2", "downloads": 2000},
+]
+
+
+class TestSuggestIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SuggestIndex(MODELS, hot_limit=3)
+
+    def ids(self, query, limit=10):
+        return [model["id"] for model in self.index.suggest(query, limit)["items"]]
+
+    def test_matches_id_name_and_author_prefixes_by_downloads(self):
+        self.assertEqual(self.ids("meta-llama/"), ["meta-llama/Meta-Llama-3-8B", "meta-llama/Llama-2-7b"])
+        # "llama" matches the name part of two models; a model matching several keys is listed once
+        self.assertEqual(self.ids("LLAMA"), ["meta-llama/Llama-2-7b", "TheBloke/Llama-2-7B-GGUF"])
+        self.assertEqual(self.ids("meta"), ["meta-llama/Meta-Llama-3-8B", "meta-llama/Llama-2-7b"])
+        self.assertEqual(self.ids("g"), ["gpt2", "google/vit-base"])
+        self.assertEqual(self.ids("nothing-like-this"), [])
+
+    def test_short_prefixes_use_precomputed_top_ranks(self):
+        self.assertEqual(self.index.model_ranking.hot["l"], [2, 4])
+        self.assertEqual(self.ids("l", limit=1), ["meta-llama/Llama-2-7b"])
+        # Above the precomputed depth the ranking falls back to scanning the prefix range
+        ranking = PrefixRanking([("aa", 3), ("ab", 1), ("ac", 2), ("ad", 0)], hot_limit=2)
+        self.assertEqual(ranking.top("a", 2), [0, 1])
+        self.assertEqual(ranking.top("a", 4), [0, 1, 2, 3])
+
+    def test_authors_are_ranked_by_total_downloads(self):
+        authors = self.index.suggest("", 10)["authors"]
+        self.assertEqual(authors[0], {"author": "meta-llama", "downloads": 2100, "models": 2})
+        self.assertEqual([a["author"] for a in self.index.suggest("the", 10)["authors"]], ["TheBloke"])
+
+
+class TestModelSuggester(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.hub_models = [{"id": "gpt2", "downloads": 2000}, {"id": "google/vit-base", "downloads": 700}]
+        self.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return httpx.Response(200, json=self.hub_models)
+
+        self.hub_client = HubClient(endpoint="https://hub.test", token="")
+        self.hub_client._client = httpx.AsyncClient(base_url="https://hub.test", transport=httpx.MockTransport(handler))
+        self.suggester = ModelSuggester(max_models=3, hot_limit=5)
+
+    async def asyncTearDown(self):
+        await self.hub_client.aclose()
+
+    async def test_not_ready_until_first_refresh(self):
+        self.assertEqual(self.suggester.suggest("g"), {"query": "g", "ready": False, "items": [], "authors": []})
+        await self.suggester.refresh(client=self.hub_client)
+        result = self.suggester.suggest("g")
+        self.assertTrue(result["ready"])
+        self.assertEqual([model["id"] for model in result["items"]], ["gpt2", "google/vit-base"])
+        self.assertEqual(self.requests[0].url.params["sort"], "downloads")
+
+    async def test_incremental_refresh_merges_and_caps_by_downloads(self):
+        await self.suggester.refresh(client=self.hub_client)
+        self.hub_models = [{"id": "google/vit-base", "downloads": 3000}, {"id": "bert-base", "downloads": 100},
+                           {"id": "distilgpt2", "downloads": 50}]
+        await self.suggester.refresh(client=self.hub_client)
+
+        self.assertEqual(self.suggester.status()["model_count"], 3)
+        self.assertEqual([model["id"] for model in self.suggester.suggest("g")["items"]], ["google/vit-base", "gpt2"])
+        self.assertEqual(self.suggester.suggest("distil")["items"], []) # Least downloaded, dropped by the cap
+
+    async def test_loads_from_a_ready_catalog(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            catalog = ModelCatalog(path=os.path.join(tmp_dir, "catalog.sqlite3"))
+            await sync_catalog(catalog, client=self.hub_client, max_models=10)
+            self.requests.clear()
+
+            await self.suggester.refresh(catalog, client=self.hub_client)
+            self.assertEqual(self.suggester.source, "catalog")
+            self.assertEqual(self.requests, [])
+            self.assertEqual(self.suggester.suggest("vit")["items"][0]["id"], "google/vit-base")
+
+
+class TestSuggestEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(hf_models.router, prefix="/api/v1/hf-models")
+        self.client = TestClient(app)
+        self.original_index = hf_models.model_suggester.index
+        hf_models.model_suggester.index = SuggestIndex([transform_hub_model(model) for model in MODELS])
+
+    def tearDown(self):
+        hf_models.model_suggester.index = self.original_index
+
+    def test_suggest_returns_models_and_authors(self):
+        response = self.client.get("/api/v1/hf-models/suggest", params={"q": "meta", "limit": 1})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body["ready"])
+        self.assertEqual([model["id"] for model in body["items"]], ["meta-llama/Meta-Llama-3-8B"])
+        self.assertEqual(body["authors"][0]["author"], "meta-llama")
+
+    def test_limit_is_capped(self):
+        response = self.client.get("/api/v1/hf-models/suggest", params={"q": "a", "limit": 1000})
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app.services.ollama_clients import OllamaClientRegistry, normalize_ollama_url
+from app.services.ollama_service import get_local_ollama_models, test_ollama_connection as check_ollama_connection
+
+TAGS = {"models": [{"name": "mistral:latest", "modified_at": "2024-01-01T00:00:00Z", "size": 4109865159, "digest": "sha256:61e8"}]}
+
+
+class TestNormalizeOllamaUrl(unittest.TestCase):
+
+    def test_adds_scheme_and_strips_trailing_slash(self):
+        self.assertEqual(normalize_ollama_url(" localhost:11434/ "), "http://localhost:11434")
+        self.assertEqual(normalize_ollama_url("https://ollama.internal/"), "https://ollama.internal")
+
+
+class TestOllamaClientRegistry(unittest.IsolatedAsyncioTestCase):
+
+    async def test_equivalent_urls_share_one_client(self):
+        registry = OllamaClientRegistry()
+        first = registry.client("localhost:11434")
+        second = registry.client("http://localhost:11434/")
+
+        self.assertIs(first, second)
+        self.assertEqual(str(first.base_url), "http://localhost:11434")
+        await registry.aclose()
+        self.assertTrue(first.is_closed)
+        self.assertEqual(len(registry), 0)
+
+    async def test_least_recently_used_client_is_closed(self):
+        registry = OllamaClientRegistry(max_clients=2)
+        a = registry.client("http://a:11434")
+        registry.client("http://b:11434")
+        registry.client("http://a:11434") # a is now the most recently used
+        registry.client("http://c:11434")
+        await asyncio.sleep(0)
+
+        self.assertEqual(len(registry), 2)
+        self.assertIs(registry.client("http://a:11434"), a)
+        await registry.aclose()
+
+    async def test_clients_in_use_are_closed_only_when_idle(self):
+        registry = OllamaClientRegistry(max_clients=1)
+        async with registry.use("http://a:11434") as a:
+            registry.client("http://b:11434") # Evicts a while a request (e.g. a pull stream) is still running on it
+            await asyncio.sleep(0)
+            self.assertFalse(a.is_closed)
+        self.assertTrue(a.is_closed)
+        self.assertEqual(len(registry), 1)
+        await registry.aclose()
+
+    async def test_service_calls_reuse_the_pooled_client(self):
+        requests = []
+
+        def handler(request):
+            requests.append(str(request.url))
+            return httpx.Response(200, json=TAGS)
+
+        registry = OllamaClientRegistry(transport=httpx.MockTransport(handler))
+        with patch("app.services.ollama_service.ollama_clients", registry):
+            models = await get_local_ollama_models("localhost:11434")
+            result = await check_ollama_connection("localhost:11434/")
+
+        self.assertEqual(models[0].name, "mistral:latest")
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(requests, ["http://localhost:11434/api/tags"] * 2)
+        self.assertEqual(len(registry), 1)
+        await registry.aclose()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi import HTTPException
+
+from app.services.ollama_clients import OllamaClientRegistry
+from app.services.ollama_fleet import OllamaFleet
+
+
+def tags(*models):
+    return {"models": [{"name": name, "digest": digest, "size": 100} for name, digest in models]}
+
+
+class TestOllamaFleet(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        async def handler(request):
+            host = request.url.host
+            if host == "slow":
+                await asyncio.sleep(5)
+            if host == "broken":
+                return httpx.Response(500, text="boom")
+            if host == "a":
+                await asyncio.sleep(0.05)
+                return httpx.Response(200, json=tags(("mistral:latest", "sha256:1"), ("llama3:8b", "sha256:2")))
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=tags(("mistral:latest", "sha256:1"), ("llama3:8b", "sha256:9")))
+
+        self.clients = OllamaClientRegistry(transport=httpx.MockTransport(handler))
+        self.patcher = patch("app.services.ollama_service.ollama_clients", self.clients)
+        self.patcher.start()
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+        await self.clients.aclose()
+
+    async def test_merges_models_by_name_and_digest(self):
+        fleet = OllamaFleet({"a": "a:11434", "b": "http://b:11434/"})
+        inventory = await fleet.inventory(timeout=1)
+
+        self.assertFalse(inventory["partial"])
+        merged = {(m["name"], m["digest"]): m["hosts"] for m in inventory["models"]}
+        self.assertEqual(merged[("mistral:latest", "sha256:1")], ["a", "b"])
+        self.assertEqual(merged[("llama3:8b", "sha256:2")], ["a"])
+        self.assertEqual(merged[("llama3:8b", "sha256:9")], ["b"])
+
+    async def test_hosts_are_queried_concurrently_with_a_deadline(self):
+        fleet = OllamaFleet({"a": "a:11434", "b": "b:11434", "slow": "slow:11434", "broken": "broken:11434"})
+        started = time.monotonic()
+        inventory = await fleet.inventory(timeout=0.3)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(inventory["partial"])
+        statuses = {host["name"]: host["status"] for host in inventory["hosts"]}
+        self.assertEqual(statuses, {"a": "ok", "b": "ok", "slow": "timeout", "broken": "error"})
+        self.assertEqual(len(inventory["models"]), 3)
+
+    async def test_register_and_remove(self):
+        fleet = OllamaFleet({})
+        self.assertEqual(await fleet.register("gpu-1", "10.0.0.11:11434/"), "http://10.0.0.11:11434")
+        await fleet.remove("gpu-1")
+        with self.assertRaises(HTTPException):
+            fleet.resolve("gpu-1")
+        self.assertEqual(await fleet.inventory(), {"models": [], "hosts": [], "partial": False})
+
+
+if __name__ == '__main__':
+    unittest.main()
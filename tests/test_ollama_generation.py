@@ -0,0 +1,86 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app.services.ollama_clients import OllamaClientRegistry
+from app.services.ollama_service import stream_ollama_generation
+
+CHAT_CHUNKS = [
+    {"model": "mistral", "message": {"role": "assistant", "content": "Hel"}, "done": False},
+    {"model": "mistral", "message": {"role": "assistant", "content": "lo"}, "done": False},
+    {"model": "mistral", "message": {"role": "assistant", "content": ""}, "done": True,
+     "done_reason": "stop", "eval_count": 2, "eval_duration": 1000},
+]
+
+
+class EndlessTokens(httpx.AsyncByteStream):
+    """Upstream that keeps generating until the proxy closes the connection."""
+
+    def __init__(self):
+        self.closed = asyncio.Event()
+
+    async def __aiter__(self):
+        while True:
+            yield (json.dumps({"response": "tok", "done": False}) + "\n").encode()
+            await asyncio.sleep(0)
+
+    async def aclose(self):
+        self.closed.set()
+
+
+class TestStreamOllamaGeneration(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.handler = None
+        self.clients = OllamaClientRegistry(transport=httpx.MockTransport(lambda request: self.handler(request)))
+        self.patcher = patch("app.services.ollama_service.ollama_clients", self.clients)
+        self.patcher.start()
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+        await self.clients.aclose()
+
+    async def test_streams_tokens_then_summary(self):
+        def handler(request):
+            self.assertEqual(request.url.path, "/api/chat")
+            self.assertTrue(json.loads(request.content)["stream"])
+            return httpx.Response(200, text="\n".join(json.dumps(chunk) for chunk in CHAT_CHUNKS))
+        self.handler = handler
+
+        events = [event async for event in stream_ollama_generation(
+            "localhost:11434", "chat", {"model": "mistral", "messages": [{"role": "user", "content": "hi"}]})]
+
+        self.assertEqual([name for name, _ in events], ["token", "token", "done"])
+        self.assertEqual("".join(data["content"] for name, data in events if name == "token"), "Hello")
+        self.assertIn("ttft_ms", events[0][1])
+        self.assertNotIn("ttft_ms", events[1][1])
+        summary = events[-1][1]
+        self.assertEqual(summary["tokens"], 2)
+        self.assertEqual(summary["done_reason"], "stop")
+        self.assertIsNotNone(summary["proxy_overhead_ms_per_token"])
+
+    async def test_upstream_error_is_reported(self):
+        self.handler = lambda request: httpx.Response(404, json={"error": "model 'nope' not found"})
+
+        events = [event async for event in stream_ollama_generation("localhost:11434", "generate", {"model": "nope", "prompt": "hi"})]
+
+        self.assertEqual(events, [("error", {"error": "Ollama API returned an error: 404. Detail: model 'nope' not found"})])
+
+    async def test_closing_the_stream_closes_upstream(self):
+        upstream = EndlessTokens()
+        self.handler = lambda request: httpx.Response(200, stream=upstream)
+
+        stream = stream_ollama_generation("localhost:11434", "generate", {"model": "mistral", "prompt": "hi"})
+        for _ in range(3):
+            name, _ = await stream.__anext__()
+            self.assertEqual(name, "token")
+        await stream.aclose() # What Starlette does when the browser disconnects
+
+        await asyncio.wait_for(upstream.closed.wait(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
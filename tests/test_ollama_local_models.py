@@ -0,0 +1,87 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import ollama as ollama_endpoints
+from app.services import ollama_service
+from app.services.ollama_clients import OllamaClientRegistry
+
+URL = "/api/v1/ollama/local-models?ollama_url=localhost:11434"
+
+
+def tags(*models):
+    return {"models": [{"name": name, "digest": digest, "size": 1} for name, digest in models]}
+
+
+class TestVersionedLocalModels(unittest.TestCase):
+
+    def setUp(self):
+        self.tags = tags(("mistral:latest", "sha256:1"), ("llama3:8b", "sha256:2"))
+        self.reachable = True
+
+        def handler(request):
+            if not self.reachable:
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(200, json=self.tags)
+
+        self.clients = OllamaClientRegistry(transport=httpx.MockTransport(handler))
+        self.patcher = patch("app.services.ollama_service.ollama_clients", self.clients)
+        self.patcher.start()
+        ollama_service.ollama_model_versions.clear()
+
+        app = FastAPI()
+        app.include_router(ollama_endpoints.router, prefix="/api/v1/ollama")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.patcher.stop()
+        ollama_service.ollama_model_versions.clear()
+
+    def test_etag_and_not_modified(self):
+        first = self.client.get(URL)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers["etag"], f'"{first.json()["version"]}"')
+        self.assertEqual(len(first.json()["models"]), 2)
+
+        second = self.client.get(URL, headers={"If-None-Match": first.headers["etag"]})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+
+    def test_version_ignores_order(self):
+        version = self.client.get(URL).json()["version"]
+        self.tags["models"].reverse()
+
+        self.assertEqual(self.client.get(URL).json()["version"], version)
+
+    def test_since_returns_only_the_differences(self):
+        version = self.client.get(URL).json()["version"]
+        self.tags = tags(("mistral:latest", "sha256:3"), ("qwen2:7b", "sha256:4"))
+
+        delta = self.client.get(f"{URL}&since={version}").json()
+
+        self.assertEqual(delta["since"], version)
+        self.assertEqual([model["name"] for model in delta["added"]], ["qwen2:7b"])
+        self.assertEqual(delta["removed"], ["llama3:8b"])
+        self.assertEqual([model["digest"] for model in delta["changed"]], ["sha256:3"])
+        self.assertNotIn("models", delta)
+
+    def test_unknown_since_returns_the_full_list(self):
+        response = self.client.get(f"{URL}&since=unknown")
+
+        self.assertEqual(len(response.json()["models"]), 2)
+
+    def test_unreachable_host_returns_empty_list_without_etag(self):
+        self.reachable = False
+        response = self.client.get(URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["models"], [])
+        self.assertNotIn("etag", response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
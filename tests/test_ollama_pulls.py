@@ -0,0 +1,95 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app.services.ollama_clients import OllamaClientRegistry
+from app.services.ollama_pulls import OllamaPullManager
+from app.services.ollama_service import stream_pull_ollama
+
+PROGRESS = [
+    {"status": "pulling manifest"},
+    {"status": "pulling 8eeb52dfb3bb", "digest": "sha256:8eeb", "total": 100, "completed": 40},
+    {"status": "pulling 8eeb52dfb3bb", "digest": "sha256:8eeb", "total": 100, "completed": 100},
+    {"status": "success"},
+]
+
+
+def fake_stream(updates, gate=None):
+    async def stream(ollama_url, model_name):
+        for update in updates:
+            if gate is not None:
+                await gate.wait()
+            yield update
+    return stream
+
+
+class TestStreamPullOllama(unittest.IsolatedAsyncioTestCase):
+
+    async def collect(self, handler):
+        clients = OllamaClientRegistry(transport=httpx.MockTransport(handler))
+        with patch("app.services.ollama_service.ollama_clients", clients):
+            try:
+                return [update async for update in stream_pull_ollama("localhost:11434", "mistral")]
+            finally:
+                await clients.aclose()
+
+    async def test_relays_ndjson_progress(self):
+        def handler(request):
+            self.assertEqual(json.loads(request.content), {"name": "mistral", "stream": True})
+            body = "\n".join(json.dumps(update) for update in PROGRESS) + "\n"
+            return httpx.Response(200, text=body)
+
+        self.assertEqual(await self.collect(handler), PROGRESS)
+
+    async def test_http_error_becomes_error_update(self):
+        updates = await self.collect(lambda request: httpx.Response(404, json={"error": "pull model manifest: file does not exist"}))
+
+        self.assertEqual(len(updates), 1)
+        self.assertIn("404", updates[0]["error"])
+        self.assertIn("file does not exist", updates[0]["error"])
+
+
+class TestOllamaPullManager(unittest.IsolatedAsyncioTestCase):
+
+    async def test_detached_pull_aggregates_progress(self):
+        manager = OllamaPullManager(history=10)
+        with patch("app.services.ollama_service.stream_pull_ollama", fake_stream(PROGRESS)):
+            pull = manager.start("http://localhost:11434", "mistral")
+            snapshots = [snapshot async for snapshot in manager.events(pull.pull_id)]
+
+        final = snapshots[-1]
+        self.assertEqual(final["state"], "completed")
+        self.assertEqual(final["completed_bytes"], 100)
+        self.assertEqual(final["total_bytes"], 100)
+        self.assertIsNotNone(final["finished_at"])
+
+    async def test_running_pull_is_deduplicated_and_fails_without_success(self):
+        manager = OllamaPullManager(history=10)
+        gate = asyncio.Event()
+        with patch("app.services.ollama_service.stream_pull_ollama", fake_stream(PROGRESS[:2], gate)):
+            first = manager.start("http://localhost:11434", "mistral")
+            second = manager.start("http://localhost:11434", "mistral")
+            self.assertIs(first, second)
+
+            gate.set()
+            snapshots = [snapshot async for snapshot in manager.events(first.pull_id)]
+
+        self.assertEqual(snapshots[-1]["state"], "failed")
+        self.assertIn("closed the pull stream", snapshots[-1]["error"])
+
+    async def test_shutdown_marks_running_pulls_failed(self):
+        manager = OllamaPullManager(history=10)
+        gate = asyncio.Event()
+        with patch("app.services.ollama_service.stream_pull_ollama", fake_stream(PROGRESS, gate)):
+            pull = manager.start("http://localhost:11434", "mistral")
+            await asyncio.sleep(0)
+            await manager.shutdown()
+
+        self.assertEqual(pull.state, "failed")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi import HTTPException
+
+from app.services.ollama_clients import OllamaClientRegistry
+from app.services.ollama_fleet import OllamaFleet
+from app.services.ollama_router import OllamaRouter
+
+
+class TestOllamaRouter(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.running = {"a": [], "b": [], "c": []} # host -> models reported by /api/ps
+
+        def handler(request):
+            self.assertEqual(request.url.path, "/api/ps")
+            return httpx.Response(200, json={"models": [{"name": name} for name in self.running[request.url.host]]})
+
+        self.clients = OllamaClientRegistry(transport=httpx.MockTransport(handler))
+        self.patcher = patch("app.services.ollama_service.ollama_clients", self.clients)
+        self.patcher.start()
+        fleet = OllamaFleet({"a": "a:11434", "b": "b:11434", "c": "c:11434"})
+        self.router = OllamaRouter(fleet=fleet, max_in_flight=1, queue_timeout=1)
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+        await self.clients.aclose()
+
+    async def test_prefers_host_with_model_loaded(self):
+        self.running["b"] = ["mistral:latest"]
+        lease = await self.router.acquire("mistral")
+
+        self.assertEqual(lease.name, "b")
+        self.assertEqual(lease.url, "http://b:11434")
+        lease.release()
+
+    async def test_saturated_loaded_host_spills_over_to_fewest_in_flight(self):
+        self.running["b"] = ["mistral:latest"]
+        first = await self.router.acquire("mistral")
+        second = await self.router.acquire("mistral")
+
+        self.assertEqual(first.name, "b")
+        self.assertNotEqual(second.name, "b")
+        self.assertEqual(self.router.load("b").in_flight, 1)
+
+    async def test_lowest_latency_breaks_ties(self):
+        self.router.observe("a", 0.9)
+        self.router.observe("b", 0.5)
+        self.router.observe("c", 0.2)
+        self.router.observe("c", 2.0) # EWMA: 0.3 * 2.0 + 0.7 * 0.2 = 0.74
+
+        lease = await self.router.acquire("llama3")
+        self.assertEqual(lease.name, "b")
+        lease.release()
+
+    async def test_queues_until_a_slot_frees(self):
+        leases = [await self.router.acquire() for _ in range(3)]
+        waiter = asyncio.ensure_future(self.router.acquire())
+        await asyncio.sleep(0.05)
+        self.assertFalse(waiter.done())
+        self.assertEqual(self.router.queued, 1)
+
+        leases[1].release()
+        lease = await asyncio.wait_for(waiter, 1)
+        self.assertEqual(lease.name, leases[1].name)
+
+    async def test_queue_timeout_returns_503(self):
+        self.router.queue_timeout = 0.05
+        for _ in range(3):
+            await self.router.acquire()
+
+        with self.assertRaises(HTTPException) as ctx:
+            await self.router.acquire()
+        self.assertEqual(ctx.exception.status_code, 503)
+
+    async def test_explicit_unregistered_url_is_not_tracked(self):
+        async with await self.router.acquire("mistral", "http://elsewhere:11434/") as lease:
+            self.assertIsNone(lease.name)
+            self.assertEqual(lease.url, "http://elsewhere:11434")
+        self.assertEqual(sum(load.in_flight for load in self.router.loads.values()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from app.api.endpoints import hf_models as hf_models_endpoints
+from app.core import serialization
+from app.core.serialization import FastJSONResponse, dumps_bytes
+from app.schemas.model_schemas import HFModelResponse
+from app.services.huggingface_service import transform_hub_model
+
+HUB_RECORDS = [
+    {"id": "org/model1", "author": "org", "downloads": 100, "likes": 5, "private": False,
+     "lastModified": "2024-01-01T00:00:00.000Z", "tags": ["pytorch", 1, "é"], "pipeline_tag": "text-generation"},
+    {"id": "org/model2", "author": None, "downloads": None, "likes": None, "private": None,
+     "lastModified": None, "tags": None, "pipeline_tag": None},
+]
+PAGE = {
+    "items": [transform_hub_model(record) for record in HUB_RECORDS],
+    "total": 2, "total_is_estimate": False, "page": 1, "limit": 10, "next_cursor": None, "has_more": False,
+}
+
+
+def response_model_json(content) -> dict:
+    adapter = TypeAdapter(HFModelResponse)
+    return json.loads(adapter.dump_json(adapter.validate_python(content), by_alias=True))
+
+
+class TestFastSerialization(unittest.TestCase):
+
+    def test_fast_path_matches_response_model_output(self):
+        self.assertEqual(json.loads(dumps_bytes(PAGE)), response_model_json(PAGE))
+
+    def test_json_fallback_without_orjson(self):
+        with patch.object(serialization, "ORJSON_AVAILABLE", False):
+            encoded = dumps_bytes(PAGE)
+
+        self.assertEqual(json.loads(encoded), response_model_json(PAGE))
+        self.assertIn("é".encode(), encoded)
+
+    def test_listing_endpoint_uses_fast_path_when_enabled(self):
+        app = FastAPI()
+        app.include_router(hf_models_endpoints.router, prefix="/api/v1/hf-models")
+        client = TestClient(app)
+
+        async def fake_get_hf_models(**kwargs):
+            return PAGE
+
+        with patch.object(hf_models_endpoints, "get_hf_models", fake_get_hf_models):
+            default = client.get("/api/v1/hf-models/")
+            with patch.object(hf_models_endpoints.settings, "FAST_SERIALIZATION", True):
+                fast = client.get("/api/v1/hf-models/")
+
+        self.assertEqual(fast.headers["content-type"], FastJSONResponse.media_type)
+        self.assertEqual(fast.json(), default.json())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from app.core.cache import TTLCache
+from app.core.shared_store import SharedStore
+from app.services.download_jobs import DownloadScheduler, JobState
+from app.services.ollama_fleet import OllamaFleet
+from tests.test_download_jobs import FakeRunner, settle
+
+
+class SharedStoreTestCase(unittest.IsolatedAsyncioTestCase):
+    """Two `SharedStore`s on one file with different worker IDs stand in for two worker processes."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp_dir.name, "shared.sqlite3")
+        self.worker_a = SharedStore(path, worker_id="a")
+        self.worker_b = SharedStore(path, worker_id="b")
+
+    def tearDown(self):
+        self.worker_a.close()
+        self.worker_b.close()
+        self.tmp_dir.cleanup()
+
+
+class TestSharedCache(SharedStoreTestCase):
+
+    def test_values_and_leases_are_shared(self):
+        cache_a, cache_b = self.worker_a.cache("models"), self.worker_b.cache("models")
+        cache_a.set(("bert", 10), {"items": [1, 2]}, ttl=60)
+        stored_at, value = cache_b.get(("bert", 10))
+        self.assertEqual(value, {"items": [1, 2]})
+        self.assertLessEqual(stored_at, time.time())
+        self.assertIsNone(self.worker_b.cache("other").get(("bert", 10)))
+
+        cache_a.set("expired", 1, ttl=-1)
+        self.assertIsNone(cache_b.get("expired"))
+
+        self.assertTrue(cache_a.claim("key"))
+        self.assertTrue(cache_a.claim("key")) # Renewing an own lease
+        self.assertFalse(cache_b.claim("key"))
+        cache_a.release("key")
+        self.assertTrue(cache_b.claim("key"))
+
+    async def test_only_one_worker_fetches_a_key(self):
+        cache_a = TTLCache(ttl=60, shared=self.worker_a.cache("models"))
+        cache_b = TTLCache(ttl=60, shared=self.worker_b.cache("models"))
+        cache_a.shared.poll_interval = cache_b.shared.poll_interval = 0.01
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"page": 1}
+
+        results = await asyncio.gather(cache_a.get_or_fetch("q", fetch), cache_b.get_or_fetch("q", fetch))
+        self.assertEqual(results, [{"page": 1}, {"page": 1}])
+        self.assertEqual(len(calls), 1)
+        # Either worker may win the lease; the other one is served its result
+        self.assertEqual(cache_a.stats()["shared_hits"] + cache_b.stats()["shared_hits"], 1)
+
+        # A third "worker" starting later is served from the shared tier
+        cache_c = TTLCache(ttl=60, shared=self.worker_b.cache("models"))
+        self.assertEqual(await cache_c.get_or_fetch("q", fetch), {"page": 1})
+        self.assertEqual(await cache_c.aget("q"), {"page": 1})
+        self.assertEqual(len(calls), 1)
+
+    async def test_one_waiter_takes_over_a_slow_fetch(self):
+        worker_c = SharedStore(self.worker_a.path, worker_id="c")
+        self.addCleanup(worker_c.close)
+        caches = [TTLCache(ttl=60, shared=store.cache("models")) for store in (self.worker_a, self.worker_b, worker_c)]
+        for cache in caches:
+            cache.shared.lease_seconds, cache.shared.poll_interval = 0.1, 0.01
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.15 if len(calls) == 1 else 0.3) # Outlives the lease
+            return {"page": 1}
+
+        first = asyncio.create_task(caches[0].get_or_fetch("q", fetch))
+        await asyncio.sleep(0.02)
+        results = await asyncio.gather(first, *(cache.get_or_fetch("q", fetch) for cache in caches[1:]))
+        self.assertEqual(results, [{"page": 1}] * 3)
+        self.assertEqual(len(calls), 2) # The first fetch and one takeover after its lease expired, not one per waiter
+
+
+class TestSharedDownloadJobs(SharedStoreTestCase):
+
+    async def asyncSetUp(self):
+        self.runner_a, self.runner_b = FakeRunner(), FakeRunner()
+        self.scheduler_a = DownloadScheduler(runner=self.runner_a, max_concurrent=1, history=10, store=self.worker_a)
+        self.scheduler_b = DownloadScheduler(runner=self.runner_b, max_concurrent=1, history=10, store=self.worker_b)
+
+    async def asyncTearDown(self):
+        await self.scheduler_a.shutdown()
+        await self.scheduler_b.shutdown()
+
+    async def test_jobs_are_visible_deduplicated_and_limited_across_workers(self):
+        job, created = await self.scheduler_a.submit("gpt2")
+        await settle()
+        self.assertTrue(created)
+        self.assertEqual(self.runner_a.started, ["gpt2"])
+
+        same_job, created = await self.scheduler_b.submit("gpt2")
+        self.assertFalse(created)
+        self.assertEqual(same_job.job_id, job.job_id)
+        self.assertEqual((await self.scheduler_b.get(job.job_id)).state, JobState.RUNNING)
+
+        # The global limit counts jobs running in any worker
+        queued, _ = await self.scheduler_b.submit("bert")
+        await settle()
+        self.assertEqual(self.runner_b.started, [])
+        self.assertEqual(queued.state, JobState.QUEUED)
+
+        self.runner_a.finish("gpt2")
+        await settle()
+        await self.scheduler_b.sync()
+        await settle()
+        # The worker whose slot freed up claims the job queued through the other one, exactly once
+        self.assertEqual(self.runner_a.started, ["gpt2", "bert"])
+        self.assertEqual(self.runner_b.started, [])
+        self.assertEqual((await self.scheduler_b.get(job.job_id)).state, JobState.COMPLETED)
+        self.assertEqual((await self.scheduler_b.get(job.job_id)).download_path, "/models/gpt2")
+
+    async def test_pause_requested_by_another_worker(self):
+        job, _ = await self.scheduler_a.submit("gpt2")
+        await settle()
+
+        await self.scheduler_b.pause(job.job_id)
+        self.assertEqual(self.scheduler_a.jobs[job.job_id].state, JobState.RUNNING)
+        await self.scheduler_a.sync()
+        await settle()
+        self.assertEqual(self.scheduler_a.jobs[job.job_id].state, JobState.PAUSED)
+        self.assertEqual((await self.scheduler_b.get(job.job_id)).state, JobState.PAUSED)
+
+    async def test_jobs_of_a_silent_worker_are_requeued(self):
+        job, _ = await self.scheduler_a.submit("gpt2")
+        await settle()
+        self.worker_a.connection().execute("UPDATE download_jobs SET updated_at = 0")
+
+        await self.scheduler_b.sync()
+        await settle()
+        self.assertEqual(self.runner_b.started, ["gpt2"])
+        self.assertEqual((await self.scheduler_b.get(job.job_id)).state, JobState.RUNNING)
+
+        # If the silent worker comes back, it lets go of the job instead of overwriting the new owner
+        await self.scheduler_a.sync()
+        self.assertNotIn(job.job_id, self.scheduler_a._tasks)
+        self.assertEqual((await self.scheduler_a.get(job.job_id)).state, JobState.RUNNING)
+
+    async def test_lock_waits_do_not_block_the_event_loop(self):
+        holder = self.worker_b.connection()
+        holder.execute("BEGIN IMMEDIATE") # Another worker in the middle of a write transaction
+        submit = asyncio.create_task(self.scheduler_a.submit("gpt2"))
+
+        started = time.perf_counter()
+        await asyncio.sleep(0.1)
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertFalse(submit.done())
+
+        holder.execute("ROLLBACK")
+        job, created = await submit
+        self.assertTrue(created)
+
+
+
+class TestSharedOllamaHosts(SharedStoreTestCase):
+
+    async def test_runtime_registrations_reach_other_workers(self):
+        fleet_a = OllamaFleet({"seeded": "seeded:11434"}, store=self.worker_a)
+        fleet_b = OllamaFleet({"seeded": "seeded:11434"}, store=self.worker_b)
+
+        await fleet_a.register("gpu-1", "10.0.0.11:11434")
+        await fleet_b.remove("seeded")
+        await fleet_a.refresh()
+        await fleet_b.refresh()
+
+        self.assertEqual(fleet_a.hosts, {"gpu-1": "http://10.0.0.11:11434"})
+        self.assertEqual(fleet_b.hosts, fleet_a.hosts)
+        # A worker started later applies the same changes on top of its seed
+        fleet_c = OllamaFleet({"seeded": "seeded:11434"}, store=self.worker_b)
+        await fleet_c.refresh()
+        self.assertEqual(fleet_c.hosts, fleet_a.hosts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import gzip
+import os
+import re
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app.core.static_assets import StaticAssets, StaticAssetTable, negotiate_encoding
+
+SCRIPT = "console.log('hello');\n" * 200
+
+
+class TestStaticAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        root = self.tmpdir.name
+        os.makedirs(os.path.join(root, "icons"))
+        files = {
+            "index.html": '<link rel="stylesheet" href="style.css"><script src="script.js"></script><a href="https://example.com">x</a>',
+            "script.js": SCRIPT,
+            "style.css": "body { margin: 0; }\n" * 100,
+            "icons/logo.png": "\x89PNG",
+        }
+        for path, content in files.items():
+            with open(os.path.join(root, path), "w") as f:
+                f.write(content)
+        self.table = StaticAssetTable(root, min_compress_bytes=64).load()
+        self.client = TestClient(StaticAssets(table=self.table))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_index_references_fingerprinted_assets(self):
+        response = self.client.get("/")
+
+        self.assertEqual(response.headers["cache-control"], "no-cache")
+        references = re.findall(r'(?:href|src)="([^"]+)"', response.text)
+        self.assertRegex(references[0], r"^style\.[0-9a-f]{10}\.css$")
+        self.assertRegex(references[1], r"^script\.[0-9a-f]{10}\.js$")
+        self.assertEqual(references[2], "https://example.com")
+
+        asset = self.client.get(f"/{references[1]}")
+        self.assertEqual(asset.text, SCRIPT)
+        self.assertEqual(asset.headers["cache-control"], "public, max-age=31536000, immutable")
+
+    def test_serves_precompressed_gzip(self):
+        response = self.client.get("/script.js", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertEqual(response.text, SCRIPT) # The test client decodes gzip
+        self.assertEqual(self.table.assets["script.js"].bodies["gzip"], gzip.compress(SCRIPT.encode(), 9, mtime=0))
+
+    def test_identity_and_strong_etags_per_encoding(self):
+        identity = self.client.get("/script.js", headers={"Accept-Encoding": "identity"})
+        gzipped = self.client.get("/script.js", headers={"Accept-Encoding": "gzip"})
+
+        self.assertNotIn("content-encoding", identity.headers)
+        self.assertFalse(identity.headers["etag"].startswith("W/"))
+        self.assertNotEqual(identity.headers["etag"], gzipped.headers["etag"])
+
+        not_modified = self.client.get("/script.js", headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_small_and_binary_files_are_not_compressed(self):
+        self.assertEqual(list(self.table.assets["icons/logo.png"].bodies), ["identity"])
+        self.assertEqual(self.client.get("/icons/logo.png").status_code, 200)
+
+    def test_missing_paths_and_methods(self):
+        self.assertEqual(self.client.get("/missing.js").status_code, 404)
+        self.assertEqual(self.client.post("/script.js").status_code, 405)
+        head = self.client.head("/script.js", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(head.headers["content-length"], str(len(SCRIPT)))
+        self.assertEqual(head.content, b"")
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate, br", {"identity", "gzip", "br"}), "br")
+        self.assertEqual(negotiate_encoding("gzip, deflate, br", {"identity", "gzip"}), "gzip")
+        self.assertEqual(negotiate_encoding("br;q=0.5, gzip", {"identity", "gzip", "br"}), "gzip")
+        self.assertEqual(negotiate_encoding("gzip;q=0", {"identity", "gzip"}), "identity")
+        self.assertEqual(negotiate_encoding("*", {"identity", "gzip"}), "gzip")
+        self.assertEqual(negotiate_encoding(None, {"identity", "gzip"}), "identity")
+
+
+if __name__ == '__main__':
+    unittest.main()